@@ -0,0 +1,67 @@
+"""
+Cold-start latency benchmark.
+
+Measures the first burst of concurrent requests after startup, once with
+empty connection pools and once after the lifespan warm-up. Needs the
+database from .env to be reachable.
+
+    python -m benchmarks.cold_start --requests 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from httpx import ASGITransport, AsyncClient
+
+from web_app.db.config import settings
+from web_app.db.db_helper import db_helper
+from web_app.main import app, warm_up_redis
+from web_app.services.auth.config import redis_client
+
+
+async def burst(client: AsyncClient, path: str, requests: int) -> list[float]:
+    async def timed() -> float:
+        started = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    return await asyncio.gather(*(timed() for _ in range(requests)))
+
+
+async def measure(path: str, requests: int, warm: bool) -> list[float]:
+    await db_helper.dispose()
+    await redis_client.connection_pool.disconnect()
+    if warm:
+        await db_helper.warm_up(settings.pool_warmup_connections)
+        await warm_up_redis(settings.redis_warmup_connections)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as c:
+        return await burst(c, path, requests)
+
+
+def report(name: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{name:>5}: p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+        f"p95 {p95 * 1000:7.1f} ms  max {latencies[-1] * 1000:7.1f} ms"
+    )
+
+
+async def main(path: str, requests: int) -> None:
+    for name, warm in (("cold", False), ("warm", True)):
+        report(name, await measure(path, requests, warm))
+    await db_helper.dispose()
+    await redis_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument("--path", default="/api/v1/users/profile/")
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.path, args.requests))
@@ -0,0 +1,150 @@
+"""
+Microbenchmark harness for the pytest suites in benchmarks/.
+
+Measurements are reported after the run. Baselines are machine
+specific, so none are committed: --bench-save records this machine's
+results in benchmarks/baseline.json, which git ignores, and
+--bench-compare then fails a benchmark when ops/sec drops, or peak
+memory per call grows, by more than the threshold.
+
+    python -m pytest benchmarks
+    python -m pytest benchmarks --bench-save
+    python -m pytest benchmarks --bench-compare
+"""
+
+import json
+import time
+import tracemalloc
+import typing as t
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import pytest
+
+BASELINE = Path(__file__).with_name("baseline.json")
+# Peak memory may differ by this many bytes without counting as growth.
+MEMORY_SLACK = 1024
+
+
+@dataclass
+class Result:
+    ops_per_sec: float
+    peak_bytes: int
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bench")
+    group.addoption(
+        "--bench-save",
+        action="store_true",
+        help="Write the results to benchmarks/baseline.json",
+    )
+    group.addoption(
+        "--bench-compare",
+        action="store_true",
+        help="Fail on regressions against benchmarks/baseline.json",
+    )
+    group.addoption(
+        "--bench-threshold",
+        type=float,
+        default=0.25,
+        help="Allowed relative regression before a benchmark fails",
+    )
+    group.addoption(
+        "--bench-time",
+        type=float,
+        default=0.5,
+        help="Minimum seconds spent measuring each benchmark",
+    )
+
+
+def measure(func: t.Callable[[], t.Any], min_time: float, rounds: int = 5):
+    """
+    Returns the best ops/sec over rounds and the peak memory of one call.
+    Iterations per round double until a round lasts min_time / rounds.
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - started >= min_time / rounds:
+            break
+        number *= 2
+
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return Result(round(1 / best, 1), peak - baseline)
+
+
+class Bench:
+    def __init__(self, config, results: dict[str, Result]) -> None:
+        self.config = config
+        self.results = results
+        self.baseline = (
+            json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        )
+
+    def __call__(self, name: str, func: t.Callable[[], t.Any]) -> Result:
+        result = measure(func, self.config.getoption("--bench-time"))
+        self.results[name] = result
+        if self.config.getoption("--bench-compare"):
+            self.check(name, result)
+        return result
+
+    def check(self, name: str, result: Result) -> None:
+        expected = self.baseline.get(name)
+        if expected is None:
+            return
+        threshold = self.config.getoption("--bench-threshold")
+        min_ops = expected["ops_per_sec"] * (1 - threshold)
+        max_bytes = expected["peak_bytes"] * (1 + threshold) + MEMORY_SLACK
+        assert result.ops_per_sec >= min_ops, (
+            f"{name}: {result.ops_per_sec} ops/s, "
+            f"baseline {expected['ops_per_sec']}"
+        )
+        assert result.peak_bytes <= max_bytes, (
+            f"{name}: {result.peak_bytes} bytes peak, "
+            f"baseline {expected['peak_bytes']}"
+        )
+
+
+def pytest_configure(config):
+    config._bench_results = {}
+
+
+@pytest.fixture
+def bench(request) -> Bench:
+    return Bench(request.config, request.config._bench_results)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    results = session.config._bench_results
+    if results and session.config.getoption("--bench-save"):
+        saved = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        saved.update({name: asdict(r) for name, r in results.items()})
+        BASELINE.write_text(json.dumps(saved, indent=2, sort_keys=True) + "\n")
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config._bench_results
+    if not results:
+        return
+    terminalreporter.section("benchmarks")
+    for name, result in sorted(results.items()):
+        terminalreporter.write_line(
+            f"{name:<32} {result.ops_per_sec:>12,.1f} ops/s "
+            f"{result.peak_bytes:>10,} B peak"
+        )
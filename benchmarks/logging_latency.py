@@ -0,0 +1,128 @@
+"""
+Event-loop latency under a flood of failed-login warnings.
+
+Concurrent tasks each log one "Login failed" warning per step, as the
+auth router does per failed login, while a ticker measures how late the
+loop wakes it. The console and rotating file handlers are either called
+directly on the loop or behind the queue handler from
+web_app.logging.logger. Console output goes to /dev/null.
+
+    python -m benchmarks.logging_latency --records 20000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from logging.handlers import QueueListener, RotatingFileHandler
+
+import uvloop
+from rich.console import Console
+from rich.logging import RichHandler
+
+from web_app.cli.bench import summarize
+from web_app.logging.logger import DroppingQueueHandler
+
+TICK = 0.001
+
+
+def output_handlers(directory: str, rich: bool) -> list[logging.Handler]:
+    devnull = open(os.devnull, "w")
+    console = (
+        RichHandler(console=Console(file=devnull, width=120), markup=True)
+        if rich
+        else logging.StreamHandler(devnull)
+    )
+    console.setFormatter(
+        logging.Formatter(
+            "[%(asctime)s] %(levelname)s in %(name)s:%(lineno)d - %(message)s"
+        )
+    )
+    file = RotatingFileHandler(
+        os.path.join(directory, "app.log"),
+        maxBytes=1024 * 1024,
+        backupCount=3,
+        encoding="utf8",
+    )
+    return [console, file]
+
+
+async def flood(logger: logging.Logger, records: int, concurrency: int):
+    """
+    Returns the loop lag samples seen while records warnings are logged.
+    """
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        while not done.is_set():
+            expected = time.perf_counter() + TICK
+            await asyncio.sleep(TICK)
+            lags.append(max(time.perf_counter() - expected, 0))
+
+    numbers = iter(range(records))
+
+    async def attacker() -> None:
+        for number in numbers:
+            logger.warning(
+                f"Login failed for email: user{number}@example.com. "
+                "Incorrect password."
+            )
+            await asyncio.sleep(0)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK)
+    await asyncio.gather(*(attacker() for _ in range(concurrency)))
+    done.set()
+    await tick
+    return lags
+
+
+def run(mode: str, records: int, concurrency: int, rich: bool) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        handlers = output_handlers(directory, rich)
+        logger = logging.Logger(f"bench.{mode}")
+        listener = None
+        queue_handler = None
+        if mode == "queue":
+            queue_handler = DroppingQueueHandler()
+            listener = QueueListener(queue_handler.queue, *handlers)
+            listener.start()
+            logger.addHandler(queue_handler)
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
+
+        started = time.perf_counter()
+        lags = asyncio.run(flood(logger, records, concurrency))
+        elapsed = time.perf_counter() - started
+        if listener is not None:
+            listener.stop()
+        for handler in handlers:
+            handler.close()
+
+    result = summarize(lags, 0, elapsed)
+    return {
+        "records_per_s": round(records / elapsed, 1),
+        "ticks": result["requests"],
+        "loop_lag_ms": result["latency_ms"],
+        "dropped": queue_handler.dropped if queue_handler else 0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Logging loop latency")
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument(
+        "--plain",
+        action="store_true",
+        help="Use a plain stream handler instead of Rich for the console",
+    )
+    args = parser.parse_args()
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    for mode in ("direct", "queue"):
+        result = run(mode, args.records, args.concurrency, not args.plain)
+        print(f"{mode}: {result}")
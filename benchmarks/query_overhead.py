@@ -0,0 +1,48 @@
+"""
+Per-query Python overhead of the hot user lookups.
+
+Compares building a new select() per call with the cached lambda
+statements in web_app.services.users.queries. Each call constructs the
+statement and derives its cache key, which is what SQLAlchemy does per
+execution before it can reuse the compiled SQL. No database is needed.
+
+    python -m benchmarks.query_overhead --number 20000
+"""
+
+import argparse
+import timeit
+
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from web_app.models.user import User
+from web_app.services.users.queries import user_by_email
+
+EMAIL = "alice@example.com"
+
+
+def rebuilt_select() -> None:
+    query = select(User).where(
+        func.lower(User.email) == EMAIL, User.is_deleted.is_(False)
+    )
+    query._generate_cache_key()
+
+
+def cached_lambda() -> None:
+    query = user_by_email(EMAIL)
+    query._generate_cache_key()
+
+
+def main(number: int, repeat: int) -> None:
+    for name, func_ in (("select", rebuilt_select), ("lambda", cached_lambda)):
+        func_()
+        best = min(timeit.repeat(func_, number=number, repeat=repeat))
+        print(f"{name:>6}: {best / number * 1e6:7.2f} us per query")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query overhead benchmark")
+    parser.add_argument("--number", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.number, args.repeat)
@@ -0,0 +1,155 @@
+"""
+Row width and index size report for the users table.
+
+Builds the users layout from before and after the compact columns
+migration in two scratch tables, fills both with the same generated rows
+and prints the average row width, heap size and size of every index.
+Needs the database from .env to be reachable; the scratch tables are
+dropped afterwards unless --keep is given.
+
+    python -m benchmarks.row_width --rows 10000000
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from web_app.db.config import settings
+
+LAYOUTS = {
+    "before": (
+        """
+        CREATE TABLE {table} (
+            id serial PRIMARY KEY,
+            first_name varchar(50),
+            last_name varchar(50),
+            email varchar NOT NULL,
+            password varchar NOT NULL,
+            role varchar NOT NULL,
+            created_at timestamptz NOT NULL,
+            updated_at timestamptz,
+            last_activity_at timestamptz NOT NULL,
+            balance integer NOT NULL,
+            block_status boolean NOT NULL,
+            block_at timestamptz,
+            is_deleted boolean NOT NULL
+        )
+        """,
+        """
+        INSERT INTO {table} (first_name, last_name, email, password, role,
+            created_at, updated_at, last_activity_at, balance,
+            block_status, block_at, is_deleted)
+        SELECT 'First' || g % 1000, 'Last' || g % 997,
+            'user' || g || '@example.com', repeat('x', 60),
+            CASE WHEN g % 1000 = 0 THEN 'admin' ELSE 'user' END,
+            now() - g * interval '1 second', now(),
+            now() - g % 100000 * interval '1 minute', g * 7919 % 100000,
+            g % 50 = 0, CASE WHEN g % 50 = 0 THEN now() END, g % 20 = 0
+        FROM generate_series(1, :rows) AS g
+        """,
+        (
+            "CREATE INDEX ON {table} (role)",
+            "CREATE INDEX ON {table} (block_status)",
+            "CREATE INDEX ON {table} (balance)",
+            "CREATE INDEX ON {table} (last_activity_at)",
+            "CREATE UNIQUE INDEX ON {table} (lower(email)) "
+            "WHERE is_deleted IS false",
+        ),
+    ),
+    "after": (
+        """
+        CREATE TABLE {table} (
+            id serial PRIMARY KEY,
+            first_name varchar(50),
+            last_name varchar(50),
+            email varchar NOT NULL,
+            password varchar NOT NULL,
+            role smallint NOT NULL,
+            created_at timestamptz NOT NULL,
+            updated_at timestamptz,
+            last_activity_at timestamptz NOT NULL,
+            balance bigint NOT NULL,
+            status smallint NOT NULL DEFAULT 0,
+            block_at timestamptz
+        )
+        """,
+        """
+        INSERT INTO {table} (first_name, last_name, email, password, role,
+            created_at, updated_at, last_activity_at, balance,
+            status, block_at)
+        SELECT 'First' || g % 1000, 'Last' || g % 997,
+            'user' || g || '@example.com', repeat('x', 60),
+            CASE WHEN g % 1000 = 0 THEN 1 ELSE 0 END,
+            now() - g * interval '1 second', now(),
+            now() - g % 100000 * interval '1 minute', g * 7919 % 100000,
+            CASE WHEN g % 50 = 0 THEN 1 ELSE 0 END
+            | CASE WHEN g % 20 = 0 THEN 2 ELSE 0 END,
+            CASE WHEN g % 50 = 0 THEN now() END
+        FROM generate_series(1, :rows) AS g
+        """,
+        (
+            "CREATE INDEX ON {table} (balance)",
+            "CREATE INDEX ON {table} (last_activity_at)",
+            "CREATE UNIQUE INDEX ON {table} (lower(email)) "
+            "WHERE ((status & 2) != 0) IS false",
+            "CREATE INDEX ON {table} (id) WHERE (status & 1) != 0",
+        ),
+    ),
+}
+
+
+async def build(conn: AsyncConnection, table: str, layout, rows: int) -> None:
+    create, fill, indexes = layout
+    await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    await conn.execute(text(create.format(table=table)))
+    await conn.execute(text(fill.format(table=table)), {"rows": rows})
+    for index in indexes:
+        await conn.execute(text(index.format(table=table)))
+    await conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+
+async def report(conn: AsyncConnection, name: str, table: str) -> None:
+    result = await conn.execute(
+        text(
+            f"SELECT avg(pg_column_size(t.*)), "
+            f"pg_relation_size('{table}') FROM {table} AS t"
+        )
+    )
+    width, heap = result.one()
+    print(f"{name}: row {width:.1f} bytes, heap {heap / 2**20:.1f} MiB")
+
+    result = await conn.execute(
+        text(
+            "SELECT indexrelid::regclass::text, "
+            "pg_relation_size(indexrelid) FROM pg_index "
+            "WHERE indrelid = CAST(:table AS regclass) ORDER BY 1"
+        ),
+        {"table": table},
+    )
+    total = 0
+    for index, size in result:
+        total += size
+        print(f"  {index:<50} {size / 2**20:9.1f} MiB")
+    print(f"  {'indexes':<50} {total / 2**20:9.1f} MiB")
+
+
+async def main(rows: int, keep: bool) -> None:
+    engine = create_async_engine(settings.url, isolation_level="AUTOCOMMIT")
+    async with engine.connect() as conn:
+        for name, layout in LAYOUTS.items():
+            table = f"users_width_{name}"
+            await build(conn, table, layout, rows)
+            await report(conn, name, table)
+            if not keep:
+                await conn.execute(text(f"DROP TABLE {table}"))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Row width report")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.keep))
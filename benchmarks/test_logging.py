@@ -0,0 +1,44 @@
+"""
+Cost of one failed-login warning on the calling thread.
+"""
+
+import logging
+
+import pytest
+
+from web_app.logging.filters import RequestIdFilter, SamplingFilter
+from web_app.logging.formatters import JsonFormatter
+from web_app.logging.logger import DroppingQueueHandler
+
+MESSAGE = "Login failed for email: %s. Incorrect password."
+RECORD = logging.LogRecord(
+    "app", logging.WARNING, __file__, 1, MESSAGE, ("a@b.c",), None
+)
+RECORD.request_id = "0" * 32
+
+
+@pytest.fixture
+def sampled_logger() -> logging.Logger:
+    handler = DroppingQueueHandler(queue_size=1)
+    handler.addFilter(SamplingFilter(handler.emit, burst=10, period=3600))
+    handler.addFilter(RequestIdFilter())
+    logger = logging.Logger("bench.sampled")
+    logger.addHandler(handler)
+    return logger
+
+
+def test_json_log_format(bench):
+    formatter = JsonFormatter()
+    bench("JsonFormatter.format", lambda: formatter.format(RECORD))
+
+
+def test_sampled_warning(bench, sampled_logger: logging.Logger):
+    bench(
+        "sampled_warning",
+        lambda: sampled_logger.warning(MESSAGE, "a@b.c"),
+    )
+
+
+def test_filtered_warning(bench):
+    logger = logging.Logger("bench.filtered", logging.ERROR)
+    bench("filtered_warning", lambda: logger.warning(MESSAGE, "a@b.c"))
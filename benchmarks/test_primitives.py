@@ -0,0 +1,76 @@
+"""
+CPU cost and peak memory of the primitives behind login and registration.
+"""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from web_app.schemas.user import UserCreateS, UserResponseS
+from web_app.services.auth import utils
+
+EMAIL = "alice@example.com"
+PASSWORD = "dshbhjHH03/"
+PAYLOAD = {"type": "access", "sub": EMAIL, "email": EMAIL}
+NOW = datetime(2024, 9, 6, 10, 53, tzinfo=timezone.utc)
+USER = SimpleNamespace(
+    id=1,
+    first_name="Alice",
+    last_name="Wonderland",
+    role="user",
+    created_at=NOW,
+    updated_at=NOW,
+    last_activity_at=NOW,
+    block_status=False,
+    block_at=None,
+    balance=100,
+)
+
+
+@pytest.fixture(scope="module")
+def token() -> str:
+    return utils.encode_jwt(PAYLOAD)
+
+
+@pytest.fixture(scope="module")
+def hashed_password() -> str:
+    return utils.hash_password(PASSWORD).decode("utf-8")
+
+
+def test_encode_jwt(bench):
+    bench("encode_jwt", lambda: utils.encode_jwt(PAYLOAD))
+
+
+def test_decode_jwt(bench, token: str):
+    bench("decode_jwt", lambda: utils.decode_jwt(token))
+
+
+def test_hash_password(bench):
+    bench("hash_password", lambda: utils.hash_password(PASSWORD))
+
+
+def test_validate_password(bench, hashed_password: str):
+    bench(
+        "validate_password",
+        lambda: utils.validate_password(PASSWORD, hashed_password),
+    )
+
+
+def test_user_create_validation(bench):
+    data = {
+        "first_name": "Alice",
+        "last_name": "Wonderland",
+        "email": " Alice@Example.com ",
+        "password": PASSWORD,
+    }
+    bench(
+        "UserCreateS.model_validate", lambda: UserCreateS.model_validate(data)
+    )
+
+
+def test_user_response_serialization(bench):
+    bench(
+        "UserResponseS.model_dump_json",
+        lambda: UserResponseS.model_validate(USER).model_dump_json(),
+    )
@@ -0,0 +1,5 @@
+from web_app.services.auth.keys import ensure_keypair
+
+# The app reads the JWT keys at import, so test and benchmark modules
+# need them before they are collected. Keys are never committed.
+ensure_keypair()
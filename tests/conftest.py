@@ -5,16 +5,15 @@ import pytest
 from alembic.config import Config
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import (
-    AsyncSession,
-    async_sessionmaker,
-    create_async_engine,
-)
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from web_app.db.config import settings, test_settings
 from web_app.db.db_helper import db_helper
+from web_app.db.sharding import configure_id_sequence
 from web_app.main import app
 from web_app.models.base import Base
+from web_app.models.user import ROLE_CODES
+from web_app.monitoring import request_stats
 from web_app.services.auth import utils
 
 logging.basicConfig(level=logging.INFO)
@@ -27,14 +26,7 @@ async def setup_test_db_and_teardown():
     original_url = settings.url
     settings.url = test_settings.url
 
-    db_helper.engine.url = settings.url
-    db_helper.engine = create_async_engine(settings.url, echo=settings.echo)
-    db_helper.session_factory = async_sessionmaker(
-        bind=db_helper.engine,
-        autoflush=False,
-        autocommit=False,
-        expire_on_commit=False,
-    )
+    db_helper.rebind(settings.url)
 
     async with db_helper.engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -53,16 +45,38 @@ async def setup_test_db_and_teardown():
     await db_helper.dispose()
 
     settings.url = original_url
-    db_helper.engine = create_async_engine(settings.url, echo=settings.echo)
-    db_helper.session_factory = async_sessionmaker(
-        bind=db_helper.engine,
-        autoflush=False,
-        autocommit=False,
-        expire_on_commit=False,
-    )
+    db_helper.rebind(settings.url, settings.shard_urls)
     logger.info("Test database dropped and original DatabaseHelper restored.")
 
 
+@pytest.fixture(scope="function")
+async def setup_sharded_db_and_teardown():
+    if not test_settings.shard_urls:
+        pytest.skip("SHARD_URLS is not set in .env.test")
+
+    logger.info("Setting up the sharded test databases...")
+    original_url = settings.url
+    settings.url = test_settings.url
+    db_helper.rebind(settings.url, test_settings.shard_urls)
+
+    for shard, engine in enumerate(db_helper.shard_engines):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+            await configure_id_sequence(conn, shard, db_helper.shard_count)
+
+    yield db_helper
+
+    logger.info("Tearing down the sharded test databases...")
+    for engine in db_helper.shard_engines:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+    await db_helper.dispose()
+
+    settings.url = original_url
+    db_helper.rebind(settings.url, settings.shard_urls)
+
+
 @pytest.fixture(scope="function")
 async def db_session(setup_test_db_and_teardown) -> AsyncSession:
     async_session_factory = setup_test_db_and_teardown
@@ -118,14 +132,13 @@ async def test_admin_data_users(db_session: AsyncSession):
             "first_name": "AdminName",
             "last_name": "AdminLastName",
             "email": "admin@example.com",
-            "role": "admin",
+            "role": ROLE_CODES["admin"],
             "password": utils.hash_password("adminJHHJHS334/").decode("utf-8"),
             "balance": 0,
-            "block_status": False,
             "created_at": datetime(2024, 9, 6, 10, 53, 18, 967768),
             "updated_at": datetime(2024, 9, 6, 10, 53, 18, 967841),
             "last_activity_at": datetime(2024, 9, 6, 10, 53, 18, 967864),
-            "is_deleted": False,
+            "status": 0,
         }
     ]
 
@@ -133,11 +146,11 @@ async def test_admin_data_users(db_session: AsyncSession):
         await db_session.execute(
             text(
                 "INSERT INTO users (first_name, last_name, email, role, "
-                "password, balance, block_status, "
-                "created_at, updated_at, last_activity_at, is_deleted) "
+                "password, balance, status, "
+                "created_at, updated_at, last_activity_at) "
                 "VALUES (:first_name, :last_name, :email, :role, "
-                ":password, :balance, :block_status, "
-                ":created_at, :updated_at, :last_activity_at, :is_deleted)"
+                ":password, :balance, :status, "
+                ":created_at, :updated_at, :last_activity_at)"
             ),
             user_data,
         )
@@ -161,6 +174,23 @@ async def test_admin_token(
     return response.json().get("access_token")
 
 
+@pytest.fixture(autouse=True)
+def enforce_request_budgets():
+    """
+    Fails the test if a request exceeded its statement or Redis budget.
+    Wall time is not enforced here, CI timings are too noisy.
+    """
+    request_stats.budget_violations = []
+    yield
+    violations = [
+        violation
+        for violation in request_stats.budget_violations
+        if violation[1] != "wall"
+    ]
+    request_stats.budget_violations = None
+    assert not violations, f"Request budgets exceeded: {violations}"
+
+
 @pytest.fixture(scope="function")
 def anyio_backend():
     return "asyncio"
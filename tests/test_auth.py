@@ -1,7 +1,10 @@
+import stat
 from unittest.mock import AsyncMock, patch
 
 import pytest
 
+from web_app.services.auth import keys, utils
+
 pytestmark = pytest.mark.anyio
 
 
@@ -13,6 +16,10 @@ async def mock_redis():
         mock_redis.exists = AsyncMock(return_value=0)
         mock_redis.get = AsyncMock(return_value=(""))
         mock_redis.set = AsyncMock(return_value=True)
+        mock_redis.delete = AsyncMock(return_value=1)
+        mock_redis.hset = AsyncMock(return_value=1)
+        mock_redis.hgetall = AsyncMock(return_value={})
+        mock_redis.expire = AsyncMock(return_value=True)
 
         yield mock_redis
 
@@ -49,6 +56,42 @@ async def test_register_user_existing(client, db_session):
     assert response.status_code == 400
 
 
+async def test_register_user_existing_case_insensitive(client, db_session):
+    await client.post(
+        "/api/v1/auth/register/",
+        json={
+            "email": "CaseUser@Example.com",
+            "password": "dSihhd2dy42/S",
+        },
+    )
+    response = await client.post(
+        "/api/v1/auth/register/",
+        json={
+            "email": "caseuser@example.com",
+            "password": "dSihhd2dy42/S",
+        },
+    )
+    assert response.status_code == 400
+
+
+async def test_login_mixed_case_email(client, db_session, mock_redis):
+    await client.post(
+        "/api/v1/auth/register/",
+        json={
+            "email": "mixedcase@example.com",
+            "password": "dSihhd2dy42/S",
+        },
+    )
+    response = await client.post(
+        "/api/v1/auth/login/",
+        data={
+            "email": "MixedCase@Example.COM",
+            "password": "dSihhd2dy42/S",
+        },
+    )
+    assert response.status_code == 200
+
+
 @pytest.mark.parametrize(
     "current_password, new_password, status",
     [
@@ -89,3 +132,16 @@ async def test_logout_user(client, db_session, test_user_token):
     headers = {"Authorization": f"Bearer {token}"} if token else {}
     response = await client.post("/api/v1/auth/logout/", headers=headers)
     assert response.status_code == 200
+
+
+def test_ensure_keypair(tmp_path):
+    private_path = tmp_path / "certs" / "jwt-private.pem"
+    public_path = tmp_path / "certs" / "jwt-public.pem"
+
+    assert keys.ensure_keypair(private_path, public_path)
+    assert not keys.ensure_keypair(private_path, public_path)
+
+    assert stat.S_IMODE(private_path.stat().st_mode) == 0o600
+    token = utils.encode_jwt({"sub": "1"}, key=private_path.read_text())
+    payload = utils.decode_jwt(token, public_key=public_path.read_text())
+    assert payload["sub"] == "1"
@@ -0,0 +1,39 @@
+import httpx
+import pytest
+
+from web_app.cli import bench
+
+pytestmark = pytest.mark.anyio
+
+
+def test_summarize():
+    latencies = [i / 1000 for i in range(1, 101)]
+    summary = bench.summarize(latencies, errors=2, elapsed=2.0)
+
+    assert summary["requests"] == 100
+    assert summary["errors"] == 2
+    assert summary["throughput_rps"] == 50.0
+    assert summary["latency_ms"]["p50"] == 51.0
+    assert summary["latency_ms"]["p99"] == 100.0
+    assert summary["latency_ms"]["max"] == 100.0
+    assert summary["histogram_ms"]["10"] == 10
+    assert summary["histogram_ms"]["+Inf"] == 100
+
+
+async def test_run_scenario():
+    async def scenario(ctx, i: int) -> httpx.Response:
+        return httpx.Response(500 if i % 10 == 0 else 200)
+
+    ctx = bench.BenchContext(client=None)
+    summary = await bench.run_scenario(
+        ctx, scenario, requests=50, concurrency=4, rate=1000
+    )
+
+    assert summary["requests"] == 50
+    assert summary["errors"] == 5
+    assert summary["elapsed_s"] >= 0.04
+
+
+async def test_unknown_scenario():
+    with pytest.raises(ValueError):
+        await bench.run_bench(["nope"], 1, 1, 0)
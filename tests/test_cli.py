@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web_app.db.config import test_settings
+from web_app.models.user import User
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_cli(*args: str, env: dict | None = None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", "web_app.cli", *args],
+        cwd=ROOT,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+
+def test_populate_logs_progress(tmp_path):
+    path = tmp_path / "users.ndjson"
+    path.write_text('{"email": "a@example.com", "password": "x"}\n')
+    (tmp_path / "users.ndjson.checkpoint").write_text(
+        json.dumps({"records": 1})
+    )
+
+    result = run_cli("populate", "--file", str(path))
+
+    assert result.returncode == 0, result.stderr
+    assert "Resuming after 1 records." in result.stderr
+    assert "Database populated with 0 users." in result.stderr
+
+
+@pytest.mark.anyio
+async def test_export_logs_progress(db_session: AsyncSession, tmp_path):
+    db_session.add(User(email="alice@example.com", password="x"))
+    await db_session.commit()
+    path = tmp_path / "users.ndjson"
+
+    result = run_cli(
+        "export",
+        "--file",
+        str(path),
+        env={
+            "POSTGRES_USER": test_settings.POSTGRES_USER,
+            "POSTGRES_PASSWORD": test_settings.POSTGRES_PASSWORD,
+            "POSTGRES_DB": test_settings.POSTGRES_DB,
+            "POSTGRES_HOST": test_settings.POSTGRES_HOST,
+            "POSTGRES_PORT": test_settings.POSTGRES_PORT,
+            "SHARD_URLS": "[]",
+            "REPLICA_URLS": "[]",
+        },
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "1 users exported" in result.stderr
+    assert "Exported 1 users" in result.stderr
+    assert "alice@example.com" in path.read_text()
@@ -0,0 +1,228 @@
+import asyncio
+import sys
+import threading
+import time
+from contextlib import suppress
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from web_app.monitoring.loop_monitor import LoopMonitor
+from web_app.monitoring.profiler import (
+    DEPTH_TRUNCATED,
+    MAX_DEPTH,
+    ProfilerBusy,
+    collapsed,
+    profiler,
+    speedscope,
+    stack_of,
+)
+from web_app.monitoring.statements import (
+    StatementTimings,
+    normalize_statement,
+    redact,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def mock_redis():
+    with patch(
+        "web_app.api.v1.routers.auth.router.redis", autospec=True
+    ) as mock_redis:
+        mock_redis.exists = AsyncMock(return_value=0)
+        mock_redis.get = AsyncMock(return_value=(""))
+        mock_redis.set = AsyncMock(return_value=True)
+        mock_redis.delete = AsyncMock(return_value=1)
+
+        yield mock_redis
+
+
+test_normalize_statement_cases = [
+    (
+        "SELECT users.id FROM users WHERE users.id IN ($1::INTEGER, "
+        "$2::INTEGER)",
+        "SELECT users.id FROM users WHERE users.id IN (?)",
+    ),
+    (
+        "INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4)",
+        "INSERT INTO t (a, b) VALUES (?)",
+    ),
+    (
+        "SELECT 1\n  FROM users\n WHERE lower(users.email) = $1::VARCHAR",
+        "SELECT 1 FROM users WHERE lower(users.email) = ?",
+    ),
+]
+
+
+@pytest.mark.parametrize("statement, expected", test_normalize_statement_cases)
+def test_normalize_statement(statement: str, expected: str):
+    assert normalize_statement(statement) == expected
+
+
+def test_redact():
+    assert redact(("secret@example.com", 1)) == ("str", "int")
+    assert redact({"email": "secret@example.com"}) == {"email": "str"}
+    assert redact([(1,), (2,)]) == "<2 parameter sets>"
+
+
+def test_statement_timings_slow_log(caplog):
+    timings = StatementTimings(slow_threshold=0.1, max_statements=10)
+
+    timings.record("SELECT $1::VARCHAR", ("secret",), 0.01)
+    timings.record("SELECT $1::VARCHAR", ("secret",), 0.5)
+
+    [(_, stats)] = timings.slowest(5)
+    assert (stats.statement, stats.count, stats.max) == ("SELECT ?", 2, 0.5)
+    assert "Slow statement" in caplog.text
+    assert "secret" not in caplog.text
+
+
+test_get_slowest_statements_cases = [
+    ("admin", 200),
+    ("user", 403),
+]
+
+
+@pytest.mark.parametrize(
+    "role, expected_status", test_get_slowest_statements_cases
+)
+async def test_get_slowest_statements(
+    client,
+    role: str,
+    expected_status: int,
+    test_user_token: str,
+    test_admin_token: str,
+):
+    token = test_admin_token if role == "admin" else test_user_token
+
+    response = await client.get(
+        "/api/v1/debug/statements/?limit=5",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == expected_status
+    if expected_status == 200:
+        statements = response.json()
+        assert 0 < len(statements) <= 5
+        assert statements[0]["max_ms"] >= statements[-1]["max_ms"]
+
+
+def block_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def test_loop_monitor_captures_blocking_call(caplog):
+    monitor = LoopMonitor(threshold=0.05, max_sites=10)
+    task = asyncio.create_task(monitor.run(0.01))
+    await asyncio.sleep(0.05)
+
+    block_loop(0.3)
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with suppress(asyncio.CancelledError):
+        await task
+
+    [(site, stats)] = monitor.slowest(5)
+    assert "in block_loop" in site
+    assert stats.count == 1
+    assert stats.max >= 0.25
+    assert "block_loop" in "".join(stats.stack)
+    assert "Event loop blocked" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "role, expected_status", test_get_slowest_statements_cases
+)
+async def test_get_blocking_call_sites(
+    client,
+    role: str,
+    expected_status: int,
+    test_user_token: str,
+    test_admin_token: str,
+):
+    token = test_admin_token if role == "admin" else test_user_token
+
+    response = await client.get(
+        "/api/v1/debug/loop/",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == expected_status
+
+
+def spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler():
+    stop = threading.Event()
+    thread = threading.Thread(target=spin, args=(stop,), name="spinner")
+    thread.start()
+    try:
+        samples = profiler.sample(0.2, 0.005, {thread.ident})
+    finally:
+        stop.set()
+        thread.join()
+
+    lines = collapsed(samples).splitlines()
+    assert lines
+    assert all(line.startswith("spinner;") for line in lines)
+    assert any("spin (tests/test_debug.py" in line for line in lines)
+
+    profile = speedscope(samples, 0.005, "test")
+    [sampled] = profile["profiles"]
+    assert len(sampled["samples"]) == len(sampled["weights"]) == len(samples)
+    assert sampled["endValue"] == pytest.approx(sum(samples.values()) * 0.005)
+
+
+def test_stack_of_keeps_innermost_frames():
+    def recurse(depth: int):
+        if depth:
+            return recurse(depth - 1)
+        return stack_of(sys._getframe())
+
+    stack = recurse(MAX_DEPTH + 10)
+
+    assert len(stack) == MAX_DEPTH + 1
+    assert stack[0] == DEPTH_TRUNCATED
+    assert stack[-1].startswith("test_stack_of_keeps_innermost_frames.")
+    assert "recurse" in stack[-1]
+
+
+def test_sampling_profiler_busy():
+    with profiler.lock:
+        with pytest.raises(ProfilerBusy):
+            profiler.sample(0.01, 0.005)
+
+
+test_profile_worker_cases = [
+    ("admin", "collapsed", 200),
+    ("admin", "speedscope", 200),
+    ("user", "collapsed", 403),
+]
+
+
+@pytest.mark.parametrize(
+    "role, output, expected_status", test_profile_worker_cases
+)
+async def test_profile_worker(
+    client,
+    role: str,
+    output: str,
+    expected_status: int,
+    test_user_token: str,
+    test_admin_token: str,
+):
+    token = test_admin_token if role == "admin" else test_user_token
+
+    response = await client.get(
+        f"/api/v1/debug/profile/?seconds=0.05&format={output}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == expected_status
+    if output == "speedscope" and expected_status == 200:
+        assert response.json()["profiles"][0]["type"] == "sampled"
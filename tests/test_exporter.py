@@ -0,0 +1,56 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from web_app.schemas.user import UserFilterS
+from web_app.services.users import exporter
+
+CREATED = datetime(2024, 9, 6, 10, 53, tzinfo=timezone.utc)
+# In EXPORT_FIELDS order.
+ROW = (1, "Alice", None, "alice@example.com", "user", 100)
+ROW += (False, None, False, CREATED, None, CREATED)
+
+test_infer_format_cases = [
+    ("users.ndjson", "ndjson"),
+    ("users.ndjson.gz", "ndjson"),
+    ("users.csv", "csv"),
+    ("users.csv.gz", "csv"),
+]
+
+
+@pytest.mark.parametrize("path, expected", test_infer_format_cases)
+def test_infer_format(path: str, expected: str):
+    assert exporter.infer_format(path) == expected
+
+
+def test_ndjson_writer():
+    file = io.StringIO()
+    exporter.NdjsonWriter(file).write([ROW])
+    record = json.loads(file.getvalue())
+    assert record["email"] == "alice@example.com"
+    assert record["created_at"] == "2024-09-06T10:53:00+00:00"
+    assert "password" not in record
+
+
+def test_csv_writer_gzip(tmp_path):
+    path = str(tmp_path / "users.csv.gz")
+    with exporter.open_output(path) as file:
+        exporter.CsvWriter(file).write([ROW])
+    with gzip.open(path, "rt", newline="") as file:
+        header, row = list(csv.reader(file))
+    assert header == exporter.EXPORT_FIELDS
+    assert row[3] == "alice@example.com"
+
+
+def test_export_query():
+    filters = UserFilterS(first_name="Alice", block_status=False)
+    query = str(exporter.export_query(filters, start=10, end=20))
+    assert "users.first_name = " in query
+    assert "users.id >= " in query and "users.id < " in query
+    assert "(users.status & 2) != 0) IS false" in query
+    assert "password" not in query
+    assert query.endswith("ORDER BY users.id")
@@ -0,0 +1,100 @@
+import io
+
+import pytest
+
+from web_app.models.user import ROLE_CODES, UserStatus
+from web_app.services.users import importer
+
+PASSWORD = "dshbhjHH03/"
+USERS = [
+    {"email": "a@example.com", "password": "x"},
+    {"email": "b@example.com", "password": "y", "block_status": True},
+]
+
+test_read_json_array_cases = [
+    '[{"email": "a@example.com", "password": "x"}, '
+    '{"email": "b@example.com", "password": "y", "block_status": true}]',
+    '{"users": [\n  {"email": "a@example.com", "password": "x"},\n'
+    '  {"email": "b@example.com", "password": "y", "block_status": true}\n]}',
+]
+
+
+@pytest.mark.parametrize("document", test_read_json_array_cases)
+@pytest.mark.parametrize("buffer_size", [1, 7, 1 << 16])
+def test_read_json_array(document: str, buffer_size: int):
+    records = importer.read_json_array(io.StringIO(document), buffer_size)
+    assert list(records) == USERS
+
+
+def test_read_json_array_truncated():
+    with pytest.raises(ValueError):
+        list(importer.read_json_array(io.StringIO('[{"email": "a@'), 4))
+
+
+def test_read_ndjson():
+    document = (
+        '{"email": "a@example.com", "password": "x"}\n\n'
+        '{"email": "b@example.com", "password": "y", "block_status": true}\n'
+    )
+    assert list(importer.read_ndjson(io.StringIO(document))) == USERS
+
+
+def test_prepare_rows():
+    record = {
+        "first_name": "Ann",
+        "email": " Ann@Example.com ",
+        "password": PASSWORD,
+        "balance": 5,
+        "block_status": True,
+        "is_deleted": True,
+    }
+    [row] = importer.prepare_rows([record])
+    first_name, last_name, email, password, role, balance, status = row
+    assert (first_name, last_name, email) == ("Ann", None, "ann@example.com")
+    assert password.startswith("$2b$")
+    assert role == ROLE_CODES["user"]
+    assert balance == 5
+    assert status == UserStatus.BLOCKED | UserStatus.DELETED
+
+
+test_prepare_rows_invalid_cases = [
+    {"email": "a@example.com"},
+    {"email": "not-an-email", "password": PASSWORD},
+    {"email": "a@example.com", "password": "weak"},
+    {"email": "a@example.com", "password": PASSWORD, "first_name": "A" * 51},
+    {"email": "a@example.com", "password": PASSWORD, "first_name": "Ann1"},
+    {"email": "a@example.com", "password": PASSWORD, "last_name": 5},
+    {"email": ["a@example.com"], "password": PASSWORD},
+    {"email": "a@example.com", "password": PASSWORD, "role": "owner"},
+    {"email": "a@example.com", "password": PASSWORD, "balance": "5"},
+    {"email": "a@example.com", "password": PASSWORD, "balance": -5},
+    {"email": "a@example.com", "password": PASSWORD, "balance": 2**63},
+    {
+        "email": "a@example.com",
+        "password": PASSWORD,
+        "role": "admin",
+        "balance": 5,
+    },
+]
+
+
+@pytest.mark.parametrize("record", test_prepare_rows_invalid_cases)
+def test_prepare_rows_skips_invalid(record: dict):
+    valid = {"email": "b@example.com", "password": PASSWORD, "role": "admin"}
+
+    rows = importer.prepare_rows([record, valid])
+
+    assert rows[0] is None
+    assert rows[1][2] == "b@example.com"
+    assert rows[1][4:6] == (ROLE_CODES["admin"], 0)
+
+
+def test_checkpoint(tmp_path):
+    path = str(tmp_path / "users.json.checkpoint")
+    assert importer.load_checkpoint(path) == 0
+    importer.save_checkpoint(path, 5000)
+    assert importer.load_checkpoint(path) == 5000
+
+
+def test_batched():
+    assert list(importer.batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
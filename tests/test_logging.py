@@ -0,0 +1,121 @@
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from web_app.api.middleware import RequestIdMiddleware
+from web_app.logging.filters import SamplingFilter, request_id
+from web_app.logging.formatters import JsonFormatter
+from web_app.logging.logger import (
+    SINK_LOGGER,
+    DroppingQueueHandler,
+    setup_logger,
+    stop_logger,
+)
+
+pytestmark = pytest.mark.anyio
+
+LOGGERS = ("", "app", "uvicorn", "sqlalchemy.engine", SINK_LOGGER)
+
+
+@pytest.fixture
+def restore_logging(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    saved = {
+        name: (
+            logging.getLogger(name).handlers[:],
+            logging.getLogger(name).level,
+        )
+        for name in LOGGERS
+    }
+    yield tmp_path
+    stop_logger()
+    for name, (handlers, level) in saved.items():
+        logger = logging.getLogger(name)
+        for handler in logger.handlers:
+            handler.close()
+        logger.handlers = handlers
+        logger.setLevel(level)
+
+
+def test_queue_handler_drops_when_full():
+    handler = DroppingQueueHandler(queue_size=2)
+    logger = logging.Logger("test_queue_handler")
+    logger.addHandler(handler)
+
+    for number in range(5):
+        logger.warning(f"Login failed for email: {number}@example.com.")
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+test_setup_logger_cases = ["local", "dev"]
+
+
+@pytest.mark.parametrize("env_mode", test_setup_logger_cases)
+def test_setup_logger(restore_logging, env_mode: str):
+    setup_logger(env_mode)
+    handlers = logging.getLogger("app").handlers
+
+    logging.getLogger("app").warning("Login failed for email: a@b.c.")
+    stop_logger()
+
+    assert [type(handler) for handler in handlers] == [DroppingQueueHandler]
+    log = (restore_logging / "app.log").read_text()
+    assert "Login failed for email: a@b.c." in log
+
+
+def test_sampling_filter_reports_suppressed():
+    reported = []
+    sampling = SamplingFilter(reported.append, burst=2, period=60)
+    records = [
+        logging.LogRecord(
+            "app", logging.WARNING, __file__, 1, "Login failed: %s.", (n,), None
+        )
+        for n in range(5)
+    ]
+
+    passed = [sampling.filter(record) for record in records]
+    with sampling.lock:
+        sampling.flush()
+
+    assert passed == [True, True, False, False, False]
+    assert [record.getMessage() for record in reported] == [
+        "Suppressed 3 messages like: Login failed: %s."
+    ]
+
+
+def test_json_formatter():
+    record = logging.LogRecord(
+        "app", logging.WARNING, __file__, 7, "Login failed: %s.", ("a",), None
+    )
+    record.request_id = "abc"
+    record.suppressed = 3
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "Login failed: a."
+    assert entry["request_id"] == "abc"
+    assert entry["suppressed"] == 3
+    assert entry["lineno"] == 7
+
+
+async def test_request_id_middleware():
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/request-id/")
+    async def current_request_id():
+        return {"request_id": request_id.get()}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        given = await ac.get("/request-id/", headers={"X-Request-ID": "r-1"})
+        generated = await ac.get("/request-id/")
+
+    assert given.json() == {"request_id": "r-1"}
+    assert given.headers["X-Request-ID"] == "r-1"
+    assert generated.json()["request_id"] == generated.headers["X-Request-ID"]
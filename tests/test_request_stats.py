@@ -0,0 +1,120 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from prometheus_client import REGISTRY
+
+from web_app.api.v1.routers.metrics.router import router as metrics_router
+from web_app.monitoring import request_stats
+from web_app.monitoring.request_stats import (
+    RequestStatsMiddleware,
+    RouteBudget,
+    record_statement,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def budget_client(monkeypatch):
+    app = FastAPI()
+    app.add_middleware(RequestStatsMiddleware)
+
+    @app.get("/error/")
+    async def fail():
+        raise RuntimeError("boom")
+
+    @app.get("/statements/{count}/")
+    async def run_statements(count: int):
+        for _ in range(count):
+            record_statement(0.001)
+        return {"count": count}
+
+    monkeypatch.setattr(
+        request_stats,
+        "ROUTE_BUDGETS",
+        {("GET", "/statements/{count}/"): RouteBudget(db=2, wall=None)},
+    )
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+test_request_budget_cases = [
+    (2, []),
+    (3, [("GET /statements/{count}/", "db", 3, 2)]),
+]
+
+
+@pytest.mark.parametrize(
+    "count, expected_violations", test_request_budget_cases
+)
+async def test_request_budget(budget_client, count: int, expected_violations):
+    response = await budget_client.get(f"/statements/{count}/")
+
+    assert response.status_code == 200
+    assert f'db;dur={count:.1f};desc="{count}"' in (
+        response.headers["Server-Timing"]
+    )
+    assert request_stats.budget_violations == expected_violations
+    request_stats.budget_violations.clear()
+
+
+async def test_request_metrics(budget_client):
+    labels = {"method": "GET", "route": "/statements/{count}/"}
+    before = REGISTRY.get_sample_value(
+        "http_requests_total", {**labels, "status": "200"}
+    )
+
+    await budget_client.get("/statements/1/")
+    await budget_client.get("/missing/")
+
+    after = REGISTRY.get_sample_value(
+        "http_requests_total", {**labels, "status": "200"}
+    )
+    assert after == (before or 0) + 1
+    assert REGISTRY.get_sample_value(
+        "http_request_duration_seconds_count", labels
+    )
+    assert REGISTRY.get_sample_value(
+        "http_requests_total",
+        {"method": "GET", "route": "unmatched", "status": "404"},
+    )
+
+
+async def test_request_metrics_unhandled_error(budget_client):
+    labels = {"method": "GET", "route": "/error/"}
+    before = REGISTRY.get_sample_value(
+        "http_requests_total", {**labels, "status": "500"}
+    )
+
+    response = await budget_client.get("/error/")
+
+    assert response.status_code == 500
+    after = REGISTRY.get_sample_value(
+        "http_requests_total", {**labels, "status": "500"}
+    )
+    assert after == (before or 0) + 1
+    assert REGISTRY.get_sample_value(
+        "http_request_duration_seconds_count", labels
+    )
+
+
+async def test_metrics_endpoint():
+    app = FastAPI()
+    app.include_router(metrics_router)
+    transport = ASGITransport(app=app)
+
+    with patch(
+        "web_app.api.v1.routers.metrics.router.redis", autospec=True
+    ) as mock_redis:
+        mock_redis.ping = AsyncMock(return_value=True)
+        async with AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as ac:
+            response = await ac.get("/metrics")
+
+    assert response.status_code == 200
+    assert "redis_ping_latency_seconds" in response.text
+    assert "login_attempts_total" in response.text
@@ -0,0 +1,151 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import text
+
+from web_app.db.db_helper import db_helper
+from web_app.db.sharding import (
+    check_shard_count,
+    configure_id_sequence,
+    shard_for_email,
+)
+
+pytestmark = pytest.mark.anyio
+
+PASSWORD = "dshbhjHH03/"
+EMAILS = [f"shard{index}@example.com" for index in range(8)]
+
+
+@pytest.fixture
+async def mock_redis():
+    with patch(
+        "web_app.api.v1.routers.auth.router.redis", autospec=True
+    ) as mock_redis:
+        mock_redis.exists = AsyncMock(return_value=0)
+        mock_redis.get = AsyncMock(return_value=(""))
+        mock_redis.set = AsyncMock(return_value=True)
+        mock_redis.delete = AsyncMock(return_value=1)
+
+        yield mock_redis
+
+
+@pytest.fixture
+async def sharded_users(client, setup_sharded_db_and_teardown, mock_redis):
+    helper = setup_sharded_db_and_teardown
+    for email in EMAILS + ["shardadmin@example.com"]:
+        response = await client.post(
+            "/api/v1/auth/register/",
+            json={
+                "first_name": "Shard",
+                "last_name": "User",
+                "email": email,
+                "password": PASSWORD,
+            },
+        )
+        assert response.status_code == 201
+
+    admin_shard = shard_for_email("shardadmin@example.com", helper.shard_count)
+    async with helper.shard_engines[admin_shard].begin() as conn:
+        await conn.execute(
+            text(
+                "UPDATE users SET role = 1 "
+                "WHERE email = 'shardadmin@example.com'"
+            )
+        )
+    yield helper
+
+
+async def login(client, email: str) -> str:
+    response = await client.post(
+        "/api/v1/auth/login/", data={"email": email, "password": PASSWORD}
+    )
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+
+async def test_users_routed_by_email(sharded_users):
+    helper = sharded_users
+    shards = set()
+
+    for email in EMAILS:
+        shard = shard_for_email(email, helper.shard_count)
+        shards.add(shard)
+        for index, engine in enumerate(helper.shard_engines):
+            async with engine.connect() as conn:
+                result = await conn.execute(
+                    text("SELECT id FROM users WHERE email = :email"),
+                    {"email": email},
+                )
+                user_id = result.scalar()
+            if index == shard:
+                assert user_id % helper.shard_count == shard
+            else:
+                assert user_id is None
+
+    assert len(shards) > 1
+
+
+async def test_point_lookups(client, sharded_users):
+    for email in EMAILS:
+        token = await login(client, email)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = await client.get(
+            "/api/v1/users/profile/me/", headers=headers
+        )
+        assert response.status_code == 200
+
+        response = await client.post("/api/v1/users/", json={}, headers=headers)
+        assert response.status_code == 403
+
+
+async def test_get_users_scatter_gather(client, sharded_users):
+    token = await login(client, "shardadmin@example.com")
+
+    response = await client.post(
+        "/api/v1/users/",
+        json={"sort_by": "id", "sort_order": "desc"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    ids = [user["id"] for user in response.json()]
+    assert len(ids) == len(EMAILS) + 1
+    assert ids == sorted(ids, reverse=True)
+
+    for user_id in ids:
+        response = await client.get(
+            f"/api/v1/users/{user_id}/balance/",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200
+
+
+async def test_shard_count_change_refused(db_session):
+    async with db_helper.engine.begin() as conn:
+        await configure_id_sequence(conn, 0, 1)
+        await conn.execute(
+            text(
+                "INSERT INTO users (email, password) "
+                "VALUES ('legacy@example.com', 'x')"
+            )
+        )
+
+    async with db_helper.engine.begin() as conn:
+        await check_shard_count(conn, 0, 1)
+        with pytest.raises(RuntimeError, match="placed for 1 shard"):
+            await check_shard_count(conn, 0, 2)
+        with pytest.raises(RuntimeError, match="placed for 1 shard"):
+            await configure_id_sequence(conn, 0, 2)
+
+
+async def test_unconfigured_shard_refused(sharded_users):
+    helper = sharded_users
+    async with helper.shard_engines[1].begin() as conn:
+        await conn.execute(text("DELETE FROM users"))
+        await conn.execute(text("ALTER SEQUENCE users_id_seq INCREMENT BY 1"))
+
+        with pytest.raises(RuntimeError, match="not configured"):
+            await check_shard_count(conn, 1, helper.shard_count)
+        await configure_id_sequence(conn, 1, helper.shard_count)
+        await check_shard_count(conn, 1, helper.shard_count)
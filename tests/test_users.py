@@ -1,14 +1,27 @@
-from datetime import datetime
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, patch
 
 import pytest
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from web_app.db.db_helper import db_helper
+from web_app.models.user import ROLE_CODES, UserStatus
+from web_app.schemas.user import UserCreateResultS
 from web_app.services.auth import utils
+from web_app.services.balance import ledger
+from web_app.services.users import bulk, sweeper
+from web_app.services.users.activity import ActivityTracker
 
 pytestmark = pytest.mark.anyio
 
+logger = logging.getLogger(__name__)
+
 
 @pytest.fixture
 async def mock_redis():
@@ -18,6 +31,10 @@ async def mock_redis():
         mock_redis.exists = AsyncMock(return_value=0)
         mock_redis.get = AsyncMock(return_value=(""))
         mock_redis.set = AsyncMock(return_value=True)
+        mock_redis.delete = AsyncMock(return_value=1)
+        mock_redis.hset = AsyncMock(return_value=1)
+        mock_redis.hgetall = AsyncMock(return_value={})
+        mock_redis.expire = AsyncMock(return_value=True)
 
         yield mock_redis
 
@@ -29,40 +46,37 @@ async def populate_users(db_session: AsyncSession):
             "first_name": "Alice",
             "last_name": "Wonderland",
             "email": "alice@example.com",
-            "role": "user",
+            "role": ROLE_CODES["user"],
             "password": utils.hash_password("dshbhjHH03/").decode("utf-8"),
             "balance": 100,
-            "block_status": False,
             "created_at": datetime(2024, 9, 6, 10, 53, 18, 967768),
             "updated_at": datetime(2024, 9, 6, 10, 53, 18, 967841),
             "last_activity_at": datetime(2024, 9, 6, 10, 53, 18, 967864),
-            "is_deleted": False,
+            "status": 0,
         },
         {
             "first_name": None,
             "last_name": None,
             "email": "bob@example.com",
-            "role": "user",
+            "role": ROLE_CODES["user"],
             "password": utils.hash_password("dshbhjHH03/").decode("utf-8"),
             "balance": 200,
-            "block_status": False,
             "created_at": datetime(2024, 9, 6, 10, 53, 18, 967768),
             "updated_at": datetime(2024, 9, 6, 10, 53, 18, 967841),
             "last_activity_at": datetime(2024, 9, 6, 10, 53, 18, 967864),
-            "is_deleted": False,
+            "status": 0,
         },
         {
             "first_name": "Charlie",
             "last_name": "Brown",
             "email": "charlie@example.com",
-            "role": "user",
+            "role": ROLE_CODES["user"],
             "password": utils.hash_password("dshbhjHH03/").decode("utf-8"),
             "balance": 300,
-            "block_status": True,
             "created_at": datetime(2024, 9, 6, 10, 53, 18, 967768),
             "updated_at": datetime(2024, 9, 6, 10, 53, 18, 967841),
             "last_activity_at": datetime(2024, 9, 6, 10, 53, 18, 967864),
-            "is_deleted": True,
+            "status": UserStatus.BLOCKED | UserStatus.DELETED,
         },
     ]
 
@@ -70,11 +84,11 @@ async def populate_users(db_session: AsyncSession):
         await db_session.execute(
             text(
                 "INSERT INTO users (first_name, last_name, email, role, "
-                "password, balance, block_status, "
-                "created_at, updated_at, last_activity_at, is_deleted) "
+                "password, balance, status, "
+                "created_at, updated_at, last_activity_at) "
                 "VALUES (:first_name, :last_name, :email, :role, "
-                ":password, :balance, :block_status, "
-                ":created_at, :updated_at, :last_activity_at, :is_deleted)"
+                ":password, :balance, :status, "
+                ":created_at, :updated_at, :last_activity_at)"
             ),
             user_data,
         )
@@ -172,7 +186,8 @@ test_update_profile_cases = [
     ({"first_name": "Jane", "last_name": "Doe"}, 200),
     ({"first_name": "Jane", "last_name": "Doe", "balance": -10}, 422),
     ({"first_name": ""}, 200),
-    ({"balance": 10}, 200),
+    ({"balance": 0}, 200),
+    ({"balance": 10}, 403),
 ]
 
 
@@ -201,38 +216,276 @@ async def test_update_profile(
 
 
 test_update_balance_cases = [
-    (1, {"balance": 100}, 200),
-    (999, {"balance": 100}, 404),
-    (1, {"balance": -50}, 422),
+    ("admin", 1, 100, 200),
+    ("admin", 1, 5_000_000_000, 200),
+    ("admin", 999, 100, 404),
+    ("user", 1, -50, 422),
+    ("user", 1, 0, 200),
+    ("user", 1, 100, 403),
+    ("user", 999, 0, 403),
 ]
 
 
 @pytest.mark.parametrize(
-    "user_id, update_data, expected_status", test_update_balance_cases
+    "role, user_id, balance, expected_status", test_update_balance_cases
 )
 async def test_update_balance(
     client,
+    role: str,
     user_id: int,
-    update_data: dict,
+    balance: int,
     expected_status: int,
     test_user_token: str,
+    test_admin_token: str,
 ):
+    token = test_admin_token if role == "admin" else test_user_token
     response = await client.put(
         f"/api/v1/users/{user_id}/balance/",
-        json=update_data,
-        headers={"Authorization": f"Bearer {test_user_token}"},
+        json={"balance": balance},
+        headers={"Authorization": f"Bearer {token}"},
     )
     assert response.status_code == expected_status
 
     if expected_status == 200:
         updated_user = response.json()
-        assert updated_user["balance"] == update_data["balance"]
+        assert updated_user["balance"] == balance
     elif expected_status == 404:
         assert response.json().get("detail") == "User not found"
     elif expected_status == 422:
         assert response.json().get("detail")
 
 
+async def test_update_balance_if_match(
+    client, test_user_token: str, test_admin_token: str
+):
+    headers = {"Authorization": f"Bearer {test_admin_token}"}
+    response = await client.put(
+        "/api/v1/users/1/balance/", json={"balance": 100}, headers=headers
+    )
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = await client.put(
+        "/api/v1/users/1/balance/",
+        json={"balance": 50},
+        headers={**headers, "If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.json()["balance"] == 50
+
+    response = await client.put(
+        "/api/v1/users/1/balance/",
+        json={"balance": 10},
+        headers={**headers, "If-Match": etag},
+    )
+    assert response.status_code == 412
+
+
+test_adjust_balance_cases = [
+    ("admin", 1, 100, 200, 100),
+    ("user", 1, -50, 409, None),
+    ("admin", 999, 10, 404, None),
+    ("user", 1, 0, 422, None),
+    ("user", 1, 10, 403, None),
+    ("user", 999, -10, 403, None),
+]
+
+
+@pytest.mark.parametrize(
+    "role, user_id, delta, expected_status, expected_balance",
+    test_adjust_balance_cases,
+)
+async def test_adjust_balance(
+    client,
+    role: str,
+    user_id: int,
+    delta: int,
+    expected_status: int,
+    expected_balance: int | None,
+    test_user_token: str,
+    test_admin_token: str,
+):
+    token = test_admin_token if role == "admin" else test_user_token
+    response = await client.post(
+        f"/api/v1/users/{user_id}/balance/adjust/",
+        json={"delta": delta},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == expected_status
+
+    if expected_status == 200:
+        assert response.json()["balance"] == expected_balance
+
+
+async def test_adjust_balance_concurrently(
+    client, test_user_token: str, test_admin_token: str
+):
+    headers = {"Authorization": f"Bearer {test_admin_token}"}
+    tasks, delta = 50, 3
+
+    async def adjust():
+        return await client.post(
+            "/api/v1/users/1/balance/adjust/",
+            json={"delta": delta},
+            headers=headers,
+        )
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(adjust() for _ in range(tasks)))
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"{tasks} concurrent balance adjustments in {elapsed:.3f}s "
+        f"({tasks / elapsed:.1f} req/s)"
+    )
+
+    assert all(response.status_code == 200 for response in responses)
+
+    response = await client.get("/api/v1/users/1/balance/", headers=headers)
+    assert response.json() == tasks * delta
+
+
+async def test_set_balance_waits_for_credit(
+    db_session: AsyncSession, populate_users
+):
+    factory = db_helper.session_factory
+    async with factory() as credit_session, factory() as set_session:
+        await ledger.adjust_balance(1, 30, "adjust", credit_session)
+        setting = asyncio.create_task(ledger.set_balance(1, 100, set_session))
+        await asyncio.sleep(0.2)
+        assert not setting.done()
+
+        await credit_session.commit()
+        await setting
+        await set_session.commit()
+
+    assert await ledger.get_balance(1, db_session) == 100
+
+
+async def test_balance_snapshot_refresh(
+    client,
+    db_session: AsyncSession,
+    test_user_token: str,
+    test_admin_token: str,
+):
+    headers = {"Authorization": f"Bearer {test_admin_token}"}
+    for delta in (70, -20):
+        response = await client.post(
+            "/api/v1/users/1/balance/adjust/",
+            json={"delta": delta},
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+    assert await ledger.refresh_snapshots(100, db_session) == 2
+
+    snapshot = await db_session.execute(
+        text("SELECT balance FROM users WHERE id = 1")
+    )
+    assert snapshot.scalar() == 50
+
+    response = await client.get("/api/v1/users/1/balance/", headers=headers)
+    assert response.json() == 50
+
+
+async def test_balance_snapshot_refresh_skips_failing_user(
+    db_session: AsyncSession, populate_users
+):
+    await ledger.append_transactions(
+        [
+            {"user_id": 1, "delta": 50, "reason": "adjust"},
+            {"user_id": 2, "delta": 10, "reason": "adjust"},
+        ],
+        db_session,
+    )
+    # Alice becomes an admin with pending credits, so her snapshot
+    # violates user_admin_balance.
+    await db_session.execute(
+        text("UPDATE users SET role = 1, balance = 0 WHERE id = 1")
+    )
+    await db_session.commit()
+    skipped: set[int] = set()
+
+    assert await ledger.refresh_snapshots(100, db_session, skipped) == 1
+    assert skipped == {1}
+    assert await ledger.refresh_snapshots(100, db_session, skipped) == 0
+
+    result = await db_session.execute(
+        text("SELECT id, balance FROM users WHERE id IN (1, 2) ORDER BY id")
+    )
+    assert result.all() == [(1, 0), (2, 210)]
+    assert await ledger.get_balance(1, db_session) == 50
+
+
+async def test_activity_flush(
+    client, db_session: AsyncSession, test_user_token: str
+):
+    tracker = ActivityTracker()
+    tracker.touch(1)
+    tracker.touch(999)
+
+    assert await tracker.flush(db_session, batch_size=1) == 2
+    assert await tracker.flush(db_session, batch_size=1) == 0
+
+    result = await db_session.execute(
+        text("SELECT last_activity_at FROM users WHERE id = 1")
+    )
+    last_activity_at = result.scalar()
+    assert last_activity_at > datetime.now(timezone.utc) - timedelta(minutes=1)
+
+
+async def test_updated_at_trigger(db_session: AsyncSession, populate_users):
+    query = text("SELECT updated_at FROM users WHERE id = 1")
+    before = (await db_session.execute(query)).scalar()
+
+    await db_session.execute(
+        text(
+            "UPDATE users SET last_activity_at = now(), "
+            "balance = balance + 1 WHERE id = 1"
+        )
+    )
+    assert (await db_session.execute(query)).scalar() == before
+
+    await db_session.execute(
+        text("UPDATE users SET first_name = 'Alicia' WHERE id = 1")
+    )
+    assert (await db_session.execute(query)).scalar() > before
+
+
+async def test_admin_balance_constraint(
+    db_session: AsyncSession, populate_users
+):
+    with pytest.raises(IntegrityError):
+        await db_session.execute(
+            text("UPDATE users SET role = :role WHERE id = 1"),
+            {"role": ROLE_CODES["admin"]},
+        )
+    await db_session.rollback()
+
+
+async def test_sweep_users(
+    db_session: AsyncSession, populate_users, mock_redis
+):
+    archived = await sweeper.sweep_users(
+        db_session,
+        inactive_days=3650,
+        deleted_days=30,
+        batch_size=1,
+        max_rate=1000,
+    )
+    assert archived == 1
+
+    result = await db_session.execute(
+        text("SELECT email FROM users_archive WHERE archived_at IS NOT NULL")
+    )
+    assert result.scalars().all() == ["charlie@example.com"]
+    mock_redis.delete.assert_awaited_once_with("charlie@example.com")
+
+    result = await db_session.execute(
+        text("SELECT 1 FROM users WHERE email = 'charlie@example.com'")
+    )
+    assert result.scalar() is None
+
+
 test_delete_account_cases = [
     (1, 204, "user"),
     (999, 403, "user"),
@@ -331,3 +584,195 @@ async def test_block_unblock_user(
     if expected_status == 200:
         user_response = response.json()
         assert user_response["block_status"] != block_status
+
+
+test_bulk_action_cases = [
+    ("block", {"ids": [1, 2, 3]}, 200, 2),
+    ("unblock", {"ids": [3]}, 200, 0),
+    ("delete", {"ids": [1, 2]}, 200, 2),
+    ("block", {}, 422, None),
+    ("block", {"ids": [1], "filters": {}}, 422, None),
+]
+
+
+@pytest.mark.parametrize(
+    "action, selection, expected_status, expected_processed",
+    test_bulk_action_cases,
+)
+async def test_bulk_action(
+    client,
+    populate_users,
+    action: str,
+    selection: dict,
+    expected_status: int,
+    expected_processed: int | None,
+    test_admin_token: str,
+):
+    response = await client.post(
+        f"/api/v1/users/bulk/{action}/",
+        json=selection,
+        headers={"Authorization": f"Bearer {test_admin_token}"},
+    )
+    assert response.status_code == expected_status
+
+    if expected_status == 200:
+        job = response.json()
+        assert job["status"] == "completed"
+        assert job["processed"] == expected_processed
+
+
+async def test_bulk_action_by_filters(
+    client,
+    populate_users,
+    db_session: AsyncSession,
+    test_admin_token: str,
+):
+    response = await client.post(
+        "/api/v1/users/bulk/block/",
+        json={"filters": {"first_name": "Alice"}},
+        headers={"Authorization": f"Bearer {test_admin_token}"},
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["job_id"]
+    assert job["total"] == 1
+
+    result = await db_session.execute(
+        text("SELECT status FROM users WHERE first_name = 'Alice'")
+    )
+    assert result.scalar() == UserStatus.BLOCKED
+
+
+async def test_bulk_create_users(
+    client, populate_users, test_admin_token: str, test_user_token: str
+):
+    users = [
+        {"email": "new1@example.com", "password": "dshbhjHH03/"},
+        {"email": "ALICE@example.com", "password": "dshbhjHH03/"},
+        {"email": "new1@example.com", "password": "dshbhjHH03/"},
+        {"email": "not-an-email", "password": "dshbhjHH03/"},
+        {"email": "new2@example.com", "password": "weak"},
+    ]
+    body = "\n".join(json.dumps(user) for user in users)
+
+    response = await client.post(
+        "/api/v1/users/bulk/",
+        content=body,
+        headers={
+            "Authorization": f"Bearer {test_user_token}",
+            "Content-Type": "application/x-ndjson",
+        },
+    )
+    assert response.status_code == 403
+
+    response = await client.post(
+        "/api/v1/users/bulk/",
+        content=body,
+        headers={
+            "Authorization": f"Bearer {test_admin_token}",
+            "Content-Type": "application/x-ndjson",
+        },
+    )
+    assert response.status_code == 207
+    results = response.json()
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert [result["status"] for result in results] == [
+        "created",
+        "exists",
+        "duplicate",
+        "invalid",
+        "invalid",
+    ]
+    assert results[0]["id"] is not None
+
+    response = await client.post(
+        "/api/v1/auth/login/",
+        data={"email": "new1@example.com", "password": "dshbhjHH03/"},
+    )
+    assert response.status_code == 200
+
+
+async def test_bulk_create_users_limit(client, test_admin_token: str):
+    users = [
+        {"email": f"new{index}@example.com", "password": "dshbhjHH03/"}
+        for index in range(bulk.BULK_CREATE_LIMIT + 1)
+    ]
+
+    response = await client.post(
+        "/api/v1/users/bulk/",
+        json=users,
+        headers={"Authorization": f"Bearer {test_admin_token}"},
+    )
+    assert response.status_code == 413
+
+
+async def test_bulk_create_users_job(
+    client,
+    populate_users,
+    mock_redis,
+    monkeypatch,
+    test_admin_token: str,
+):
+    monkeypatch.setattr(bulk, "BULK_CREATE_SYNC_LIMIT", 2)
+    mock_redis.rpush = AsyncMock(return_value=3)
+    users = [
+        {"email": "new1@example.com", "password": "dshbhjHH03/"},
+        {"email": "ALICE@example.com", "password": "dshbhjHH03/"},
+        {"email": "new2@example.com", "password": "weak"},
+    ]
+
+    response = await client.post(
+        "/api/v1/users/bulk/",
+        json=users,
+        headers={"Authorization": f"Bearer {test_admin_token}"},
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["action"] == "create"
+    assert job["total"] == 3
+
+    key = bulk.job_key(job["job_id"])
+    mock_redis.hset.assert_any_await(key, "processed", 3)
+    mock_redis.hset.assert_awaited_with(key, "status", "completed")
+    _, *results = mock_redis.rpush.await_args.args
+    statuses = [UserCreateResultS.model_validate_json(r) for r in results]
+    assert [result.status for result in statuses] == [
+        "created",
+        "exists",
+        "invalid",
+    ]
+
+    response = await client.post(
+        "/api/v1/auth/login/",
+        data={"email": "new1@example.com", "password": "dshbhjHH03/"},
+    )
+    assert response.status_code == 200
+
+
+async def test_bulk_create_users_cancels_hashing_on_error():
+    users = [
+        {"email": f"new{index}@example.com", "password": "dshbhjHH03/"}
+        for index in range(bulk.BULK_CREATE_CHUNK_SIZE + 1)
+    ]
+    cancelled = []
+
+    async def hash_chunk(chunk):
+        if len(chunk) == 1:
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(chunk)
+                raise
+        return ["hash"] * len(chunk)
+
+    async def insert_new_users(users, hashes, session):
+        await asyncio.sleep(0)
+        raise RuntimeError("insert failed")
+
+    with patch.object(bulk, "hash_chunk", hash_chunk), patch.object(
+        bulk, "insert_new_users", insert_new_users
+    ):
+        with pytest.raises(RuntimeError):
+            await bulk.create_users(users, None)
+
+    assert len(cancelled) == 1
@@ -0,0 +1,84 @@
+import asyncio
+import time
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from web_app.logging.filters import request_id
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+class InFlightRequests:
+    """
+    Counts HTTP requests that are being served.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """
+        Waits until no requests are in flight or timeout seconds pass.
+        Returns True if the app became idle.
+        """
+        deadline = time.monotonic() + timeout
+        while self.count and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return not self.count
+
+
+in_flight = InFlightRequests()
+
+
+class InFlightMiddleware:
+    """
+    Tracks in-flight requests so shutdown can drain them
+    before the connection pools are disposed.
+    """
+
+    def __init__(self, app: ASGIApp, tracker: InFlightRequests) -> None:
+        self.app = app
+        self.tracker = tracker
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.tracker.count += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.tracker.count -= 1
+
+
+class RequestIdMiddleware:
+    """
+    Takes the request id from the X-Request-ID header, or generates one,
+    for the log records of the request and echoes it in the response.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = Headers(scope=scope).get(REQUEST_ID_HEADER)
+        if not value or len(value) > 64:
+            value = uuid.uuid4().hex
+        token = request_id.set(value)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = value
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
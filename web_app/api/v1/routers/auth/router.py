@@ -5,12 +5,14 @@ from aiocache.decorators import cached
 from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
 from fastapi.security import HTTPBearer
 from redis.asyncio import Redis
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
 from web_app.db.db_helper import db_helper
 from web_app.models.user import User
+from web_app.monitoring.metrics import CACHE_REQUESTS, LOGIN_ATTEMPTS
 from web_app.schemas.user import UserCreateS
 from web_app.services.auth import utils
 from web_app.services.auth.config import (
@@ -26,6 +28,9 @@ from web_app.services.auth.jwt_helper import (
     create_access_token,
     create_refresh_token,
 )
+from web_app.services.balance import ledger
+from web_app.services.users.activity import activity_tracker
+from web_app.services.users.queries import user_by_email
 
 router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
 
@@ -63,8 +68,10 @@ async def get_user_from_redis(email: str) -> User | None:
     """
     user_data = await redis.get(email)
     if user_data:
+        CACHE_REQUESTS.labels("user", "hit").inc()
         user_dict = json.loads(user_data)
         return User(**user_dict)
+    CACHE_REQUESTS.labels("user", "miss").inc()
     return None
 
 
@@ -76,6 +83,14 @@ async def set_user_to_redis(email: str, user: User) -> None:
     await redis.set(email, json.dumps(user_dict), ex=300)
 
 
+async def delete_users_from_redis(emails: list[str]) -> None:
+    """
+    Removes cached users from Redis in one call.
+    """
+    if emails:
+        await redis.delete(*emails)
+
+
 @cached(ttl=BLOCK_TIME_SECONDS)
 async def check_block(ip: str) -> bool:
     """
@@ -142,22 +157,26 @@ async def validate_auth_user(
     if await check_block(ip):
         if not ip == "127.0.0.1":
             logger.warning(
-                f"IP {ip} is blocked due to too many failed login attempts."
+                "IP %s is blocked due to too many failed login attempts.", ip
             )
+            LOGIN_ATTEMPTS.labels("ip_blocked").inc()
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Too many failed login attempts. Try again later.",
             )
 
+    email = utils.normalize_email(email)
+    db_helper.route_by_email(session, email)
     user = await get_user_from_redis(email)
     if not user:
-        query = select(User).where(User.email == email)
+        query = user_by_email(email)
         result = await session.execute(query)
         user = result.scalars().first()
         if user:
             await set_user_to_redis(email, user)
         else:
-            logger.warning(f"Login failed for email: {email}. User not found.")
+            logger.warning("Login failed for email: %s. User not found.", email)
+            LOGIN_ATTEMPTS.labels("unknown_user").inc()
             await increment_attempts(ip)
             raise unauthed_exc
 
@@ -165,18 +184,21 @@ async def validate_auth_user(
         password=password,
         hashed_password=user.password,
     ):
-        logger.warning(f"Login failed for email: {email}. Incorrect password.")
+        logger.warning("Login failed for email: %s. Incorrect password.", email)
+        LOGIN_ATTEMPTS.labels("wrong_password").inc()
         await increment_attempts(ip)
         raise unauthed_exc
 
     if user.is_deleted:
-        logger.warning(f"Login failed for deleted account: {user.email}.")
+        logger.warning("Login failed for deleted account: %s.", user.email)
+        LOGIN_ATTEMPTS.labels("deleted").inc()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="This account has been deleted",
         )
     if user.block_status:
-        logger.warning(f"Login failed for blocked account: {user.email}.")
+        logger.warning("Login failed for blocked account: %s.", user.email)
+        LOGIN_ATTEMPTS.labels("blocked").inc()
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Your account is blocked",
@@ -193,29 +215,35 @@ async def register_user(
     Registers a new user.
     Raises HTTP 400 if user already exists.
     """
-    query = select(User).where(
-        User.email == user.email, User.is_deleted.is_(False)
+    hashed_password = utils.hash_password(user.password).decode("utf-8")
+    db_helper.route_by_email(session, user.email)
+    query = (
+        insert(User)
+        .values(
+            first_name=user.first_name,
+            last_name=user.last_name,
+            email=user.email,
+            password=hashed_password,
+        )
+        .on_conflict_do_nothing(
+            index_elements=[func.lower(User.email)],
+            index_where=User.is_deleted.is_(False),
+        )
+        .returning(User.id)
     )
     result = await session.execute(query)
-    existing_user = result.scalars().first()
+    new_user_id = result.scalar_one_or_none()
 
-    if existing_user:
+    if new_user_id is None:
         logger.warning(
-            f"Registration failed. User with email {user.email} already exists."
+            "Registration failed. User with email %s already exists.",
+            user.email,
         )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User with this email already exists",
         )
 
-    hashed_password = utils.hash_password(user.password).decode("utf-8")
-    new_user = User(
-        first_name=user.first_name,
-        last_name=user.last_name,
-        email=user.email,
-        password=hashed_password,
-    )
-    session.add(new_user)
     await session.commit()
 
     return {"detail": "User successfully registered"}
@@ -230,12 +258,23 @@ async def login(
     Logs in a user and returns access and refresh tokens.
     """
     if user.first_name and user.last_name and user.role != "admin":
-        user.balance += LOGIN_BONUS
-        session.add(user)
+        db_helper.route_by_id(session, user.id)
+        await ledger.lock_user_balance(user.id, session, shared=True)
+        await ledger.append_transactions(
+            [
+                {
+                    "user_id": user.id,
+                    "delta": LOGIN_BONUS,
+                    "reason": "login_bonus",
+                }
+            ],
+            session,
+        )
         await session.commit()
 
     access_token = create_access_token(user.email)
     refresh_token = create_refresh_token(user.email)
+    LOGIN_ATTEMPTS.labels("success").inc()
     return Token(access_token=access_token, refresh_token=refresh_token)
 
 
@@ -249,7 +288,7 @@ async def logout(
     token = token.credentials
     if await is_token_blacklisted(token):
         logger.warning(
-            f"Logout attempt with already blacklisted token: {token}"
+            "Logout attempt with already blacklisted token: %s", token
         )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -293,7 +332,7 @@ async def auth_refresh_jwt(token: str = Depends(http_bearer)) -> Token:
             return Token(access_token=new_access_token, refresh_token=token)
 
     except Exception as e:
-        logger.error(f"Token refresh failed: {str(e)}")
+        logger.error("Token refresh failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
@@ -312,7 +351,7 @@ async def get_current_user(
     """
     token = token.credentials
     if await is_token_blacklisted(token):
-        logger.warning(f"Token is blacklisted: {token}")
+        logger.warning("Token is blacklisted: %s", token)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token is blacklisted",
@@ -321,6 +360,7 @@ async def get_current_user(
     if cached_payload := await get_cached_token(token):
         if user_email := cached_payload.get("email"):
             if cached_user := await get_user_from_redis(user_email):
+                activity_tracker.touch(cached_user.id)
                 return cached_user
         logger.warning("Token validation failed. Invalid token payload.")
         raise HTTPException(
@@ -339,11 +379,13 @@ async def get_current_user(
             detail="Invalid token",
         )
 
-    query = select(User).where(User.email == user_email)
+    user_email = utils.normalize_email(user_email)
+    db_helper.route_by_email(session, user_email)
+    query = user_by_email(user_email)
     result = await session.execute(query)
     user = result.scalars().first()
     if not user:
-        logger.warning(f"User not found for email: {user_email}")
+        logger.warning("User not found for email: %s", user_email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
@@ -351,6 +393,7 @@ async def get_current_user(
 
     await set_user_to_redis(user_email, user)
     await cache_token(token, payload)
+    activity_tracker.touch(user.id)
 
     return user
 
@@ -370,8 +413,8 @@ async def change_password(
         password=current_password, hashed_password=user.password
     ):
         logger.warning(
-            f"Password change failed for user: {user.email}."
-            f" Incorrect current password."
+            "Password change failed for user: %s. Incorrect current password.",
+            user.email,
         )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -379,6 +422,7 @@ async def change_password(
         )
 
     hashed_new_password = utils.hash_password(new_password).decode("utf-8")
+    db_helper.route_by_id(session, user.id)
     try:
         user.password = hashed_new_password
         await session.flush()
@@ -387,13 +431,13 @@ async def change_password(
         logger.error("IntegrityError occurred while changing password.")
         await session.rollback()
 
-        query = select(User).where(User.email == user.email)
+        query = user_by_email(utils.normalize_email(user.email))
         result = await session.execute(query)
         user = result.scalars().first()
 
         if not user:
             logger.error(
-                f"User with email {user.email} not found after rollback."
+                "User with email %s not found after rollback.", user.email
             )
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+from typing import List, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from web_app.models.user import User
+from web_app.monitoring.loop_monitor import loop_monitor
+from web_app.monitoring.profiler import (
+    ProfilerBusy,
+    collapsed,
+    profiler,
+    speedscope,
+)
+from web_app.monitoring.statements import statement_timings
+from web_app.schemas.debug import BlockedCallSiteS, StatementStatsS
+from web_app.services.auth.permissions import admin_permission
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1/debug", tags=["debug"])
+
+
+@router.get("/statements/", response_model=List[StatementStatsS])
+async def get_slowest_statements(
+    limit: int = Query(default=10, ge=1, le=100),
+    user: User = Depends(admin_permission),
+):
+    """
+    Lists the statements with the highest latency in this process.
+    Requires admin role.
+    """
+    return [
+        StatementStatsS(
+            fingerprint=key,
+            statement=stats.statement,
+            count=stats.count,
+            mean_ms=stats.mean * 1000,
+            max_ms=stats.max * 1000,
+            total_ms=stats.total * 1000,
+        )
+        for key, stats in statement_timings.slowest(limit)
+    ]
+
+
+@router.delete("/statements/", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_statement_stats(
+    user: User = Depends(admin_permission),
+) -> None:
+    """
+    Clears statement latency aggregates. Requires admin role.
+    """
+    statement_timings.reset()
+
+
+@router.get("/loop/", response_model=List[BlockedCallSiteS])
+async def get_blocking_call_sites(
+    limit: int = Query(default=10, ge=1, le=100),
+    user: User = Depends(admin_permission),
+):
+    """
+    Lists the call sites that blocked the event loop of this process
+    the longest, with a captured stack. Requires admin role.
+    """
+    return [
+        BlockedCallSiteS(
+            site=site,
+            count=stats.count,
+            mean_ms=stats.mean * 1000,
+            max_ms=stats.max * 1000,
+            total_ms=stats.total * 1000,
+            stack=stats.stack,
+        )
+        for site, stats in loop_monitor.slowest(limit)
+    ]
+
+
+@router.delete("/loop/", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_blocking_call_sites(
+    user: User = Depends(admin_permission),
+) -> None:
+    """
+    Clears the event loop block aggregates. Requires admin role.
+    """
+    loop_monitor.reset()
+
+
+@router.get("/profile/")
+async def profile_worker(
+    seconds: float = Query(default=5.0, gt=0, le=60),
+    interval_ms: float = Query(default=10.0, ge=1, le=1000),
+    output: Literal["collapsed", "speedscope"] = Query(
+        default="collapsed", alias="format"
+    ),
+    all_threads: bool = False,
+    user: User = Depends(admin_permission),
+) -> Response:
+    """
+    Samples the stacks of the worker serving the request for seconds
+    and returns collapsed stacks or a speedscope profile. Only the event
+    loop thread is sampled unless all_threads is set.
+    Requires admin role. Raises HTTP 409 while another profile runs.
+    """
+    thread_ids = None if all_threads else {threading.get_ident()}
+    interval = interval_ms / 1000
+    try:
+        samples = await run_in_threadpool(
+            profiler.sample, seconds, interval, thread_ids
+        )
+    except ProfilerBusy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running",
+        )
+    if output == "speedscope":
+        return JSONResponse(speedscope(samples, interval, f"pid {os.getpid()}"))
+    return PlainTextResponse(collapsed(samples))
@@ -0,0 +1,32 @@
+import logging
+import time
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from redis.exceptions import RedisError
+from starlette.concurrency import run_in_threadpool
+
+from web_app.monitoring.metrics import REDIS_PING_LATENCY, render_metrics
+from web_app.services.auth.config import redis_client as redis
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """
+    Exposes Prometheus metrics of all workers.
+    Pings Redis first to update its latency gauge.
+    """
+    started = time.perf_counter()
+    try:
+        await redis.ping()
+    except (RedisError, OSError):
+        logger.warning("Redis ping failed during metrics scrape.")
+    else:
+        REDIS_PING_LATENCY.set(time.perf_counter() - started)
+    # Reading every worker's files is blocking I/O.
+    body = await run_in_threadpool(render_metrics)
+    return Response(body, media_type=CONTENT_TYPE_LATEST)
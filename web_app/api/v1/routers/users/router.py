@@ -1,23 +1,51 @@
+import json
 import logging
+from itertools import chain
 from typing import List
-
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import asc, desc
+from uuid import uuid4
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from sqlalchemy import asc, desc, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from web_app.api.v1.routers.auth.router import get_current_user
+from web_app.api.v1.routers.auth.router import (
+    delete_users_from_redis,
+    get_current_user,
+)
 from web_app.db.db_helper import db_helper
 from web_app.models.user import User
 from web_app.schemas.user import (
+    BalanceAdjustS,
     BalanceUpdateS,
+    BulkJobS,
+    UserBulkActionS,
+    UserCreateResultS,
     UserFilterS,
     UserProfileS,
     UserResponseS,
     UserUpdateS,
 )
 from web_app.services.auth.permissions import admin_permission, user_permission
+from web_app.services.auth.utils import normalize_email
+from web_app.services.balance import ledger
+from web_app.services.users import bulk
+from web_app.services.users.queries import (
+    apply_user_filters,
+    merge_sorted,
+    profile_by_email,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -27,42 +55,49 @@ router = APIRouter(prefix="/api/v1/users", tags=["users"])
 @router.post("/", response_model=List[UserResponseS])
 async def get_users(
     filters: UserFilterS,
-    session: AsyncSession = Depends(db_helper.session_getter),
+    request: Request,
     user: User = Depends(admin_permission),
 ):
+    """
+    Gets users from every shard, merged in the requested order.
+    Requires admin role.
+    """
     order_func = asc if filters.sort_order == "asc" else desc
 
     query = select(User).where(User.is_deleted.is_(False))
-
-    if filters.id is not None:
-        query = query.where(User.id == filters.id)
-    if filters.first_name is not None:
-        query = query.where(User.first_name == filters.first_name)
-    if filters.last_name is not None:
-        query = query.where(User.last_name == filters.last_name)
-    if filters.block_status is not None:
-        query = query.where(User.block_status == filters.block_status)
+    query = apply_user_filters(query, filters)
 
     sort_field = getattr(User, filters.sort_by)
-    query = query.order_by(order_func(sort_field))
+    query = query.order_by(order_func(sort_field), order_func(User.id))
 
-    result = await session.execute(query)
-    users = result.scalars().all()
+    async def fetch(session: AsyncSession) -> list[User]:
+        result = await session.execute(query)
+        return result.scalars().all()
 
-    return users
+    chunks = await db_helper.for_each_shard(
+        fetch, read_key=db_helper.client_key(request)
+    )
+
+    return merge_sorted(
+        chunks, filters.sort_by, descending=filters.sort_order == "desc"
+    )
 
 
 @router.get("/profile/", response_model=List[UserProfileS])
-async def retrieve_profiles(
-    session: AsyncSession = Depends(db_helper.session_getter),
-):
+async def retrieve_profiles(request: Request):
     query = select(User).where(
         User.first_name.isnot(None), User.last_name.isnot(None)
     )
-    result = await session.execute(query)
-    profiles = result.scalars().all()
 
-    return profiles
+    async def fetch(session: AsyncSession) -> list[User]:
+        result = await session.execute(query)
+        return result.scalars().all()
+
+    chunks = await db_helper.for_each_shard(
+        fetch, read_key=db_helper.client_key(request)
+    )
+
+    return list(chain.from_iterable(chunks))
 
 
 @router.get("/profile/me/", response_model=UserProfileS)
@@ -70,11 +105,9 @@ async def retrieve_profile(
     user: User = Depends(get_current_user),
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
-    query = select(User).where(
-        User.email == user.email,
-        User.first_name.isnot(None),
-        User.last_name.isnot(None),
-    )
+    email = normalize_email(user.email)
+    db_helper.route_by_email(session, email)
+    query = profile_by_email(email)
     result = await session.execute(query)
     user_profile = result.scalars().first()
 
@@ -92,42 +125,63 @@ async def update_profile(
     user: User = Depends(get_current_user),
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
-    async with session:
-        query = select(User).where(User.email == user.email)
+    db_helper.route_by_id(session, user.id)
+    updated_fields = update_data.model_dump(exclude_unset=True)
+    balance = updated_fields.pop("balance", None)
+
+    if updated_fields:
+        query = (
+            update(User)
+            .where(User.id == user.id, User.is_deleted.is_(False))
+            .values(**updated_fields)
+            .returning(User.first_name, User.last_name)
+        )
+    else:
+        query = select(User.first_name, User.last_name).where(
+            User.id == user.id, User.is_deleted.is_(False)
+        )
+
+    try:
         result = await session.execute(query)
-        user_profile = result.scalars().first()
+        profile = result.first()
 
-        if not user_profile:
+        if not profile:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
             )
 
-        updated_fields = update_data.model_dump(exclude_unset=True)
+        if balance is not None:
+            _, balance, _ = await ledger.set_balance(
+                user.id, balance, session, allow_credit=user.role == "admin"
+            )
+        else:
+            balance = await ledger.get_balance(user.id, session)
+        await session.commit()
+    except SQLAlchemyError as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while updating the profile",
+        ) from e
 
-        for field, value in updated_fields.items():
-            setattr(user_profile, field, value)
+    if updated_fields:
+        await delete_users_from_redis([normalize_email(user.email)])
 
-        try:
-            await session.commit()
-        except SQLAlchemyError as e:
-            await session.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="An error occurred while updating the profile",
-            ) from e
-
-        return user_profile
+    return UserUpdateS(
+        first_name=profile.first_name,
+        last_name=profile.last_name,
+        balance=balance,
+    )
 
 
 @router.get("/{id}/balance/", response_model=int)
 async def get_balance(
     id: int,
     user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(db_helper.session_getter),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
 ):
-    query = select(User.balance).where(User.id == id)
-    result = await session.execute(query)
-    balance = result.scalar()
+    db_helper.route_by_id(session, id)
+    balance = await ledger.get_balance(id, session)
 
     if balance is None:
         raise HTTPException(
@@ -137,28 +191,88 @@ async def get_balance(
     return balance
 
 
+def parse_version(if_match: str | None) -> int | None:
+    """
+    Extracts the expected row version from an If-Match header.
+    Returns None if the header is absent or matches any version.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip().removeprefix("W/").strip('"')
+    if not value.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="If-Match must contain a version number",
+        )
+    return int(value)
+
+
 @router.put("/{id}/balance/", response_model=UserResponseS)
 async def update_balance(
     id: int,
     update_data: BalanceUpdateS,
+    response: Response,
+    if_match: str | None = Header(default=None),
     user: User = Depends(get_current_user),
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
-    query = select(User).where(User.id == id)
-    result = await session.execute(query)
-    user_profile = result.scalars().first()
-
-    if not user_profile:
+    """
+    Sets the user's balance to an absolute value.
+    With If-Match the update only applies to the given balance version.
+    Like adjustments, users may only lower their own balance.
+    """
+    if user.role != "admin" and user.id != id:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action",
         )
 
-    user_profile.balance = update_data.balance
+    db_helper.route_by_id(session, id)
+    user_profile, balance, version = await ledger.set_balance(
+        id,
+        update_data.balance,
+        session,
+        parse_version(if_match),
+        allow_credit=user.role == "admin",
+    )
+    await session.commit()
+
+    response.headers["ETag"] = f'"{version}"'
+    return UserResponseS.model_validate(user_profile).model_copy(
+        update={"balance": balance}
+    )
+
+
+@router.post("/{id}/balance/adjust/", response_model=UserResponseS)
+async def adjust_balance(
+    id: int,
+    adjust_data: BalanceAdjustS,
+    response: Response,
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    """
+    Appends a signed delta to the user's balance ledger.
+    Users may only debit their own balance; credits and changes to
+    other accounts require admin role.
+    Raises HTTP 409 if the balance would become negative.
+    """
+    if user.role != "admin" and (user.id != id or adjust_data.delta > 0):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action",
+        )
 
-    await session.merge(user_profile)
+    db_helper.route_by_id(session, id)
+    user_profile, balance, version = await ledger.adjust_balance(
+        id, adjust_data.delta, "adjust", session
+    )
     await session.commit()
 
-    return user_profile
+    response.headers["ETag"] = f'"{version}"'
+    return UserResponseS.model_validate(user_profile).model_copy(
+        update={"balance": balance}
+    )
 
 
 @router.delete("/{id}/delete/", status_code=status.HTTP_204_NO_CONTENT)
@@ -176,25 +290,30 @@ async def delete_account(
             detail="You do not have permission to perform this action",
         )
 
-    query = select(User).where(User.id == id)
+    db_helper.route_by_id(session, id)
+    query = (
+        update(User)
+        .where(User.id == id, User.is_deleted.is_(False))
+        .values(is_deleted=True)
+        .returning(User.email)
+    )
     result = await session.execute(query)
-    user_obj = result.scalars().first()
-
-    if not user_obj:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
+    email = result.scalar_one_or_none()
 
-    if user_obj.is_deleted:
+    if email is None:
+        query = select(User.id).where(User.id == id)
+        result = await session.execute(query)
+        if result.scalar() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User account is already deleted",
         )
 
-    user_obj.is_deleted = True
-
-    session.add(user_obj)
     await session.commit()
+    await delete_users_from_redis([email])
 
 
 @router.get(
@@ -206,21 +325,27 @@ async def get_deleted_users(
     limit: int = Query(default=10, ge=1),
     offset: int = Query(default=0, ge=0),
     user: User = Depends(admin_permission),
-    session: AsyncSession = Depends(db_helper.session_getter),
 ):
     """
-    Gets deleted users. Requires admin role.
+    Gets deleted users from every shard, ordered by id.
+    Requires admin role.
     """
     query = (
         select(User)
         .where(User.is_deleted.is_(True))
-        .limit(limit)
-        .offset(offset)
+        .order_by(User.id)
+        .limit(offset + limit)
     )
-    result = await session.execute(query)
-    users = result.scalars().all()
 
-    return users
+    async def fetch(session: AsyncSession) -> list[User]:
+        result = await session.execute(query)
+        return result.scalars().all()
+
+    chunks = await db_helper.for_each_shard(fetch)
+    users = merge_sorted(chunks, "id")
+
+    end = offset + limit
+    return users[offset:end]
 
 
 async def change_block_status(
@@ -229,17 +354,24 @@ async def change_block_status(
     """
     Helper function to change block status for a user.
     """
-    query = select(User).where(User.id == user_id)
+    action = "block" if block_status else "unblock"
+    db_helper.route_by_id(session, user_id)
+    query = (
+        update(User)
+        .where(User.id == user_id, User.is_deleted.is_(False))
+        .values(**bulk.action_values(action))
+        .returning(User)
+    )
     result = await session.execute(query)
     user_to_update = result.scalar_one_or_none()
 
-    if not user_to_update or user_to_update.is_deleted:
+    if not user_to_update:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    user_to_update.block_status = block_status
     await session.commit()
+    await delete_users_from_redis([user_to_update.email])
 
     return user_to_update
 
@@ -274,3 +406,182 @@ async def unblock_user(
     Unblocks a user by ID. Requires admin role.
     """
     return await change_block_status(user_id, False, session)
+
+
+async def start_bulk_action(
+    action: bulk.BulkAction,
+    selection: UserBulkActionS,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession,
+) -> BulkJobS:
+    """
+    Helper function to run small id lists inline and everything else
+    as a background job with progress.
+    """
+    ids, filters = selection.ids, selection.filters
+    if ids is not None and len(ids) <= bulk.BULK_SYNC_LIMIT:
+        processed = await bulk.run_bulk_action(action, session, ids=ids)
+        return BulkJobS(
+            action=action,
+            status="completed",
+            total=len(ids),
+            processed=processed,
+        )
+
+    if ids is not None:
+        total = len(ids)
+    else:
+        total = await bulk.count_matching(filters, session)
+    job = await bulk.create_job(uuid4().hex, action, total)
+    background_tasks.add_task(
+        bulk.run_bulk_job, job["job_id"], action, ids=ids, filters=filters
+    )
+
+    response.status_code = status.HTTP_202_ACCEPTED
+    return BulkJobS(**job)
+
+
+@router.post(
+    "/bulk/",
+    response_model=List[UserCreateResultS] | BulkJobS,
+    status_code=status.HTTP_207_MULTI_STATUS,
+)
+async def bulk_create_users(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    user: User = Depends(admin_permission),
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    """
+    Registers a JSON array or NDJSON body of users with per-item results.
+    Existing emails are reported, not overwritten. Batches above
+    BULK_CREATE_SYNC_LIMIT run as a background job whose results are
+    served by /bulk/jobs/{job_id}/results/. Requires admin role.
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith(
+            "application/x-ndjson"
+        ):
+            items = bulk.parse_ndjson(body)
+        else:
+            items = json.loads(body)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array or NDJSON",
+        )
+
+    if not isinstance(items, list) or not items:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Body must contain at least one user",
+        )
+    if len(items) > bulk.BULK_CREATE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {bulk.BULK_CREATE_LIMIT} users per request",
+        )
+
+    if len(items) <= bulk.BULK_CREATE_SYNC_LIMIT:
+        return await bulk.create_users(items, session)
+
+    job = await bulk.create_job(uuid4().hex, "create", len(items))
+    background_tasks.add_task(bulk.run_bulk_create_job, job["job_id"], items)
+
+    response.status_code = status.HTTP_202_ACCEPTED
+    return BulkJobS(**job)
+
+
+@router.post("/bulk/block/", response_model=BulkJobS)
+async def bulk_block_users(
+    selection: UserBulkActionS,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    user: User = Depends(admin_permission),
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    """
+    Blocks users by ids or filters. Requires admin role.
+    """
+    return await start_bulk_action(
+        "block", selection, response, background_tasks, session
+    )
+
+
+@router.post("/bulk/unblock/", response_model=BulkJobS)
+async def bulk_unblock_users(
+    selection: UserBulkActionS,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    user: User = Depends(admin_permission),
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    """
+    Unblocks users by ids or filters. Requires admin role.
+    """
+    return await start_bulk_action(
+        "unblock", selection, response, background_tasks, session
+    )
+
+
+@router.post("/bulk/delete/", response_model=BulkJobS)
+async def bulk_delete_users(
+    selection: UserBulkActionS,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    user: User = Depends(admin_permission),
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    """
+    Marks users selected by ids or filters as deleted. Requires admin role.
+    """
+    return await start_bulk_action(
+        "delete", selection, response, background_tasks, session
+    )
+
+
+@router.get("/bulk/jobs/{job_id}/", response_model=BulkJobS)
+async def get_bulk_job(
+    job_id: str,
+    user: User = Depends(admin_permission),
+):
+    """
+    Gets progress of a background bulk job. Requires admin role.
+    """
+    job = await bulk.get_job(job_id)
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+
+    return job
+
+
+@router.get(
+    "/bulk/jobs/{job_id}/results/", response_model=List[UserCreateResultS]
+)
+async def get_bulk_job_results(
+    job_id: str,
+    user: User = Depends(admin_permission),
+):
+    """
+    Gets the per-item results of a completed bulk create job.
+    Requires admin role.
+    """
+    job = await bulk.get_job(job_id)
+
+    if not job or job["action"] != "create":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+    if job["status"] != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job['status']}",
+        )
+
+    return await bulk.get_job_results(job_id)
@@ -2,24 +2,26 @@ import argparse
 import asyncio
 import json
 import logging
-from datetime import datetime
+import time
 from getpass import getpass
 
 from alembic.config import Config
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
 
-from web_app.bl.auth import utils
+from web_app.cli import bench
 from web_app.db.config import settings
+from web_app.db.db_helper import db_helper
+from web_app.db.sharding import configure_id_sequence
 from web_app.models.base import Base
 from web_app.models.user import User
+from web_app.schemas.user import UserFilterS
+from web_app.services.auth import utils
+from web_app.services.users import exporter, importer, sweeper
 
 logger = logging.getLogger(__name__)
 
-engine = create_async_engine(settings.url, echo=settings.echo)
-AsyncSessionLocal = sessionmaker(
-    engine, expire_on_commit=False, class_=AsyncSession
-)
+LOG_FORMAT = "[%(asctime)s] %(levelname)s in %(name)s - %(message)s"
+
+AsyncSessionLocal = db_helper.session_factory
 
 
 def create_db() -> None:
@@ -29,8 +31,10 @@ def create_db() -> None:
     logger.info("Creating database...")
 
     async def async_create():
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        for shard, engine in enumerate(db_helper.shard_engines):
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await configure_id_sequence(conn, shard, db_helper.shard_count)
 
     asyncio.run(async_create())
     logger.info("Database created.")
@@ -38,16 +42,23 @@ def create_db() -> None:
 
 def run_migrations() -> None:
     """
-    Run Alembic migrations.
+    Run Alembic migrations on every shard.
     """
-    logger.info("Running migrations...")
-    alembic_cfg = Config("web_app/alembic.ini")
-    alembic_cfg.set_main_option("sqlalchemy.url", settings.url)
-    alembic_cfg.set_main_option("script_location", "web_app/migrations")
-
     from alembic import command
 
-    command.upgrade(alembic_cfg, "head")
+    for shard, url in enumerate([settings.url, *settings.shard_urls]):
+        logger.info(f"Running migrations on shard {shard}...")
+        alembic_cfg = Config("web_app/alembic.ini")
+        alembic_cfg.set_main_option("sqlalchemy.url", url)
+        alembic_cfg.set_main_option("script_location", "web_app/migrations")
+        command.upgrade(alembic_cfg, "head")
+
+    async def async_configure():
+        for shard, engine in enumerate(db_helper.shard_engines):
+            async with engine.begin() as conn:
+                await configure_id_sequence(conn, shard, db_helper.shard_count)
+
+    asyncio.run(async_configure())
     logger.info("Migrations completed.")
 
 
@@ -58,46 +69,90 @@ def drop_db() -> None:
     logger.info("Dropping database...")
 
     async def async_drop():
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.drop_all)
+        for engine in db_helper.shard_engines:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
 
     asyncio.run(async_drop())
     logger.info("Database dropped.")
 
 
-def populate_db(file_path: str) -> None:
+def populate_db(file_path: str, chunk_size: int, workers: int | None) -> None:
     """
-    Populate the database with initial data from a JSON file.
+    Populate the database with users streamed from a JSON or NDJSON file.
     """
     logger.info("Populating database with sample data...")
+    inserted = asyncio.run(
+        importer.import_users(file_path, chunk_size, workers)
+    )
+    logger.info(f"Database populated with {inserted} users.")
 
-    async def async_populate():
-        with open(file_path, "r") as f:
-            data = json.load(f)
 
-        async with AsyncSessionLocal() as session:
-            async with session.begin():
-                users = [
-                    User(
-                        first_name=user["first_name"],
-                        last_name=user["last_name"],
-                        email=user["email"],
-                        password=utils.hash_password(user["password"]).decode(
-                            "utf-8"
-                        ),
-                        created_at=datetime.now(),
-                        updated_at=datetime.now(),
-                        last_activity_at=datetime.now(),
-                        balance=user["balance"],
-                        block_status=user["block_status"],
-                    )
-                    for user in data.get("users", [])
-                ]
-                session.add_all(users)
-                await session.commit()
+def export_users(
+    file_path: str,
+    filters: UserFilterS,
+    export_format: str | None,
+    partitions: int,
+    fetch_size: int,
+    include_deleted: bool,
+) -> None:
+    """
+    Export users to an NDJSON or CSV file, gzip-compressed for .gz paths.
+    """
+    logger.info("Exporting users...")
+    started = time.perf_counter()
+    exported = asyncio.run(
+        exporter.export_users(
+            file_path,
+            filters,
+            export_format or exporter.infer_format(file_path),
+            partitions,
+            fetch_size,
+            include_deleted,
+        )
+    )
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Exported {exported} users in {elapsed:.1f} s "
+        f"({exported / max(elapsed, 1e-9):.0f} rows/s)."
+    )
+
 
-    asyncio.run(async_populate())
-    logger.info("Database populated with sample data.")
+def run_bench(
+    scenarios: list[str],
+    requests: int,
+    concurrency: int,
+    rate: float,
+    url: str | None,
+    users: int,
+    admin_email: str | None,
+    output: str | None,
+) -> None:
+    """
+    Load test scenarios and write throughput and latency as JSON.
+    """
+    admin_password = (
+        getpass("Enter admin's password: ") if admin_email else None
+    )
+    results = asyncio.run(
+        bench.run_bench(
+            scenarios,
+            requests,
+            concurrency,
+            rate,
+            url,
+            users,
+            admin_email,
+            admin_password,
+        )
+    )
+    report = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as file:
+            file.write(report + "\n")
+        logger.info(f"Benchmark results written to {output}.")
+    else:
+        print(report)
 
 
 def create_admin_user(
@@ -109,11 +164,12 @@ def create_admin_user(
 
     async def async_create_admin():
         async with AsyncSessionLocal() as session:
+            db_helper.route_by_email(session, utils.normalize_email(email))
             async with session.begin():
                 user = User(
                     first_name=first_name,
                     last_name=last_name,
-                    email=email,
+                    email=utils.normalize_email(email),
                     password=utils.hash_password(password).decode("utf-8"),
                 )
                 session.add(user)
@@ -123,22 +179,158 @@ def create_admin_user(
     logger.info(f"Admin user with {email} successfully created.")
 
 
+def sweep_users(
+    inactive_days: int, deleted_days: int, batch_size: int, max_rate: float
+) -> None:
+    """
+    Archive inactive and soft-deleted users past the retention threshold.
+    """
+    logger.info("Sweeping expired users...")
+
+    async def async_sweep():
+        async with AsyncSessionLocal() as session:
+            return await sweeper.sweep_users(
+                session, inactive_days, deleted_days, batch_size, max_rate
+            )
+
+    archived = asyncio.run(async_sweep())
+    logger.info(f"Archived {archived} users.")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Manage the database.")
     parser.add_argument(
         "command",
         type=str,
-        choices=["create", "drop", "migrate", "populate", "create-admin"],
-        help="Command to run: create, drop, migrate, populate, or create-admin",
+        choices=[
+            "create",
+            "drop",
+            "migrate",
+            "populate",
+            "create-admin",
+            "sweep",
+            "export",
+            "bench",
+        ],
+        help="Command to run: create, drop, migrate, populate, create-admin, "
+        "sweep, export or bench",
     )
     parser.add_argument(
         "--file",
         type=str,
-        help="Path to the JSON file for populating the database",
+        help="Path to the JSON or NDJSON file for populating the database, "
+        "or of the export output",
         required=False,
     )
 
+    populate = parser.add_argument_group("populate")
+    populate.add_argument(
+        "--chunk-size",
+        type=int,
+        default=5000,
+        help="Users hashed and copied per chunk",
+    )
+    populate.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Password hashing processes, one per CPU by default",
+    )
+
+    sweep = parser.add_argument_group("sweep")
+    sweep.add_argument(
+        "--inactive-days",
+        type=int,
+        default=settings.sweep_inactive_days,
+        help="Archive users inactive for this many days",
+    )
+    sweep.add_argument(
+        "--deleted-days",
+        type=int,
+        default=settings.sweep_deleted_days,
+        help="Archive deleted users inactive for this many days",
+    )
+    sweep.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.sweep_batch_size,
+        help="Users moved per transaction",
+    )
+    sweep.add_argument(
+        "--max-rate",
+        type=float,
+        default=settings.sweep_max_rate,
+        help="Maximum users archived per second",
+    )
+
+    export = parser.add_argument_group("export")
+    export.add_argument(
+        "--format",
+        choices=exporter.FORMATS,
+        default=None,
+        help="Output format, inferred from the file extension by default",
+    )
+    export.add_argument(
+        "--partitions",
+        type=int,
+        default=1,
+        help="Id ranges exported concurrently per shard",
+    )
+    export.add_argument(
+        "--fetch-size",
+        type=int,
+        default=10_000,
+        help="Rows fetched per cursor round trip",
+    )
+    export.add_argument("--include-deleted", action="store_true")
+    export.add_argument("--id", type=int, default=None)
+    export.add_argument("--first-name", default=None)
+    export.add_argument("--last-name", default=None)
+    export.add_argument(
+        "--block-status",
+        choices=("true", "false"),
+        default=None,
+    )
+
+    bench_group = parser.add_argument_group("bench")
+    bench_group.add_argument(
+        "--scenarios",
+        default="register,login,refresh,profile_me",
+        help=f"Comma-separated scenarios of: {', '.join(bench.SCENARIOS)}",
+    )
+    bench_group.add_argument(
+        "--requests", type=int, default=1000, help="Requests per scenario"
+    )
+    bench_group.add_argument(
+        "--concurrency", type=int, default=10, help="Concurrent clients"
+    )
+    bench_group.add_argument(
+        "--rate",
+        type=float,
+        default=0,
+        help="Target requests per second, unlimited when 0",
+    )
+    bench_group.add_argument(
+        "--url",
+        default=None,
+        help="Server to load, the app in-process if unset",
+    )
+    bench_group.add_argument(
+        "--bench-users", type=int, default=10, help="Accounts to log in as"
+    )
+    bench_group.add_argument(
+        "--admin-email",
+        default=None,
+        help="Admin account for admin_listing and balance_adjust",
+    )
+    bench_group.add_argument(
+        "--output", default=None, help="JSON results file, stdout if unset"
+    )
+
     args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format=LOG_FORMAT, datefmt="%Y-%m-%d %H:%M:%S"
+    )
 
     if args.command == "create":
         create_db()
@@ -152,7 +344,7 @@ def main() -> None:
                 "JSON file path is required for populating the database."
             )
         else:
-            populate_db(args.file)
+            populate_db(args.file, args.chunk_size, args.workers)
     elif args.command == "create-admin":
         first_name = input("Enter admin's first name: ")
         last_name = input("Enter admin's last name: ")
@@ -165,6 +357,46 @@ def main() -> None:
             return
 
         create_admin_user(first_name, last_name, email, password)
+    elif args.command == "sweep":
+        sweep_users(
+            args.inactive_days,
+            args.deleted_days,
+            args.batch_size,
+            args.max_rate,
+        )
+    elif args.command == "export":
+        if not args.file:
+            logger.error("Output file path is required for exporting users.")
+            return
+        filters = UserFilterS(
+            id=args.id,
+            first_name=args.first_name,
+            last_name=args.last_name,
+            block_status=(
+                None
+                if args.block_status is None
+                else args.block_status == "true"
+            ),
+        )
+        export_users(
+            args.file,
+            filters,
+            args.format,
+            args.partitions,
+            args.fetch_size,
+            args.include_deleted,
+        )
+    elif args.command == "bench":
+        run_bench(
+            args.scenarios.split(","),
+            args.requests,
+            args.concurrency,
+            args.rate,
+            args.url,
+            args.bench_users,
+            args.admin_email,
+            args.output,
+        )
     else:
         logger.error(f"Unknown command: {args.command}")
 
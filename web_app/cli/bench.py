@@ -0,0 +1,270 @@
+import asyncio
+import itertools
+import random
+import string
+import time
+import typing as t
+from dataclasses import dataclass, field
+
+import httpx
+
+PASSWORD = "BenchPass1!"
+# Upper bounds of the latency histogram buckets in milliseconds.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+@dataclass
+class BenchContext:
+    """
+    Accounts and tokens shared by the scenarios of one run.
+    """
+
+    client: httpx.AsyncClient
+    tag: str = field(
+        default_factory=lambda: "".join(
+            random.choices(string.ascii_lowercase, k=8)
+        )
+    )
+    users: list[dict] = field(default_factory=list)
+    user_ids: list[int] = field(default_factory=list)
+    admin_token: str | None = None
+    registered: t.Iterator[int] = field(default_factory=itertools.count)
+
+    def email(self, number: int | str) -> str:
+        return f"bench-{self.tag}-{number}@example.com"
+
+    @staticmethod
+    def bearer(token: str) -> dict:
+        return {"Authorization": f"Bearer {token}"}
+
+
+Scenario = t.Callable[[BenchContext, int], t.Awaitable[httpx.Response]]
+
+
+async def register(ctx: BenchContext, i: int) -> httpx.Response:
+    return await ctx.client.post(
+        "/api/v1/auth/register/",
+        json={
+            "first_name": "Bench",
+            "last_name": ctx.tag,
+            "email": ctx.email(f"r{next(ctx.registered)}"),
+            "password": PASSWORD,
+        },
+    )
+
+
+async def login(ctx: BenchContext, i: int) -> httpx.Response:
+    user = ctx.users[i % len(ctx.users)]
+    return await ctx.client.post(
+        "/api/v1/auth/login/",
+        data={"email": user["email"], "password": PASSWORD},
+    )
+
+
+async def refresh(ctx: BenchContext, i: int) -> httpx.Response:
+    user = ctx.users[i % len(ctx.users)]
+    return await ctx.client.post(
+        "/api/v1/auth/refresh/", headers=ctx.bearer(user["refresh_token"])
+    )
+
+
+async def profile_me(ctx: BenchContext, i: int) -> httpx.Response:
+    user = ctx.users[i % len(ctx.users)]
+    return await ctx.client.get(
+        "/api/v1/users/profile/me/", headers=ctx.bearer(user["access_token"])
+    )
+
+
+async def admin_listing(ctx: BenchContext, i: int) -> httpx.Response:
+    return await ctx.client.post(
+        "/api/v1/users/", json={}, headers=ctx.bearer(ctx.admin_token)
+    )
+
+
+async def balance_adjust(ctx: BenchContext, i: int) -> httpx.Response:
+    user_id = ctx.user_ids[i % len(ctx.user_ids)]
+    return await ctx.client.post(
+        f"/api/v1/users/{user_id}/balance/adjust/",
+        json={"delta": 1},
+        headers=ctx.bearer(ctx.admin_token),
+    )
+
+
+# Scenario and whether it needs an admin account.
+SCENARIOS: dict[str, tuple[Scenario, bool]] = {
+    "register": (register, False),
+    "login": (login, False),
+    "refresh": (refresh, False),
+    "profile_me": (profile_me, False),
+    "admin_listing": (admin_listing, True),
+    "balance_adjust": (balance_adjust, True),
+}
+
+
+async def prepare(
+    ctx: BenchContext,
+    users: int,
+    admin_email: str | None,
+    admin_password: str | None,
+) -> None:
+    """
+    Registers and logs in the bench users, and with admin credentials
+    logs in the admin and looks up the bench user ids.
+    """
+    for number in range(users):
+        email = ctx.email(number)
+        response = await ctx.client.post(
+            "/api/v1/auth/register/",
+            json={
+                "first_name": "Bench",
+                "last_name": ctx.tag,
+                "email": email,
+                "password": PASSWORD,
+            },
+        )
+        response.raise_for_status()
+        response = await ctx.client.post(
+            "/api/v1/auth/login/", data={"email": email, "password": PASSWORD}
+        )
+        response.raise_for_status()
+        ctx.users.append({"email": email, **response.json()})
+
+    if admin_email is None:
+        return
+    response = await ctx.client.post(
+        "/api/v1/auth/login/",
+        data={"email": admin_email, "password": admin_password},
+    )
+    response.raise_for_status()
+    ctx.admin_token = response.json()["access_token"]
+    response = await ctx.client.post(
+        "/api/v1/users/",
+        json={"last_name": ctx.tag},
+        headers=ctx.bearer(ctx.admin_token),
+    )
+    response.raise_for_status()
+    ctx.user_ids = [user["id"] for user in response.json()]
+
+
+async def run_scenario(
+    ctx: BenchContext,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    rate: float,
+) -> dict:
+    """
+    Sends requests from concurrency workers. With a rate, request i is
+    scheduled at i / rate seconds and its latency counts from then, so
+    time queued behind a slow server is not hidden.
+    """
+    latencies: list[float] = []
+    errors = 0
+    numbers = iter(range(requests))
+    started = time.perf_counter()
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in numbers:
+            if rate:
+                begin = started + i / rate
+                await asyncio.sleep(max(begin - time.perf_counter(), 0))
+            else:
+                begin = time.perf_counter()
+            try:
+                response = await scenario(ctx, i)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - begin)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    """
+    Returns throughput, latency percentiles and a cumulative latency
+    histogram, in milliseconds.
+    """
+    latencies = sorted(seconds * 1000 for seconds in latencies)
+    count = len(latencies)
+
+    def percentile(q: float) -> float:
+        return round(latencies[min(int(q * count), count - 1)], 2)
+
+    histogram = {
+        str(bound): sum(1 for ms in latencies if ms <= bound)
+        for bound in BUCKETS_MS
+    }
+    histogram["+Inf"] = count
+    return {
+        "requests": count,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": (
+            {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1], 2),
+                "mean": round(sum(latencies) / count, 2),
+            }
+            if count
+            else {}
+        ),
+        "histogram_ms": histogram,
+    }
+
+
+def make_client(url: str | None) -> httpx.AsyncClient:
+    """
+    Returns a client for url, or for the app in this process when None.
+    """
+    if url is not None:
+        return httpx.AsyncClient(base_url=url, timeout=30)
+    from web_app.main import app
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://bench",
+        timeout=30,
+    )
+
+
+async def run_bench(
+    scenarios: list[str],
+    requests: int,
+    concurrency: int,
+    rate: float,
+    url: str | None = None,
+    users: int = 10,
+    admin_email: str | None = None,
+    admin_password: str | None = None,
+) -> dict:
+    """
+    Runs each scenario in turn and returns their results by name.
+    """
+    missing = [name for name in scenarios if name not in SCENARIOS]
+    if missing:
+        raise ValueError(f"Unknown scenarios: {', '.join(missing)}")
+    if admin_email is None and any(SCENARIOS[name][1] for name in scenarios):
+        raise ValueError("Admin scenarios need --admin-email")
+
+    async with make_client(url) as client:
+        ctx = BenchContext(client)
+        await prepare(ctx, max(users, 1), admin_email, admin_password)
+        results = {
+            "target": url or "in-process",
+            "concurrency": concurrency,
+            "rate": rate,
+            "scenarios": {},
+        }
+        for name in scenarios:
+            scenario, _ = SCENARIOS[name]
+            results["scenarios"][name] = await run_scenario(
+                ctx, scenario, requests, concurrency, rate
+            )
+    return results
@@ -10,7 +10,44 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str
     ENV_MODE: str
 
-    echo: bool = True
+    echo: bool = False
+    slow_statement_threshold: float = 0.2
+    statement_stats_limit: int = 1000
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval: float = 0.05
+    loop_block_threshold: float = 0.1
+    loop_monitor_sites: int = 100
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = -1
+    pool_pre_ping: bool = False
+    query_cache_size: int = 500
+    prepared_statement_cache_size: int = 256
+    pgbouncer: bool = False
+    pool_warmup_connections: int = 5
+    redis_warmup_connections: int = 5
+    shutdown_drain_timeout: float = 10.0
+
+    shard_urls: list[str] = []
+    replica_urls: list[str] = []
+    replica_max_lag: float = 5.0
+    replica_check_interval: float = 1.0
+    read_your_writes_window: float = 5.0
+
+    balance_snapshot_interval: float = 5.0
+    balance_snapshot_batch_size: int = 5000
+
+    activity_flush_interval: float = 10.0
+    activity_flush_batch_size: int = 1000
+
+    sweep_enabled: bool = False
+    sweep_interval: float = 3600.0
+    sweep_inactive_days: int = 730
+    sweep_deleted_days: int = 30
+    sweep_batch_size: int = 500
+    sweep_max_rate: float = 1000.0
 
     model_config = ConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -1,5 +1,14 @@
+import asyncio
+import functools
+import hashlib
+import itertools
+import logging
+import time
 import typing as t
+from uuid import uuid4
 
+from fastapi import Request
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -8,6 +17,57 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from web_app.db.config import settings
+from web_app.db.pool import InstrumentedPool, instrument_pool, warm_up_pool
+from web_app.db.sharding import (
+    ShardedSession,
+    check_shard_count,
+    shard_for_email,
+    shard_for_id,
+)
+from web_app.monitoring.statements import statement_timings
+
+logger = logging.getLogger(__name__)
+
+T = t.TypeVar("T")
+
+# Seconds a replica is behind the primary; 0 when it has replayed all WAL
+# it received, so an idle primary does not look like lag.
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "THEN 0 ELSE COALESCE(EXTRACT(EPOCH FROM "
+    "now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+@event.listens_for(ShardedSession, "after_commit")
+def mark_committed_write(session: ShardedSession) -> None:
+    """
+    Calls the read-your-writes marker that session_getter stored in
+    info["mark_write"], if any.
+    """
+    mark_write = session.info.get("mark_write")
+    if mark_write is not None:
+        mark_write()
+
+
+def unique_statement_name() -> str:
+    return f"__asyncpg_{uuid4().hex}__"
+
+
+def connect_args(prepared_statement_cache_size: int, pgbouncer: bool) -> dict:
+    """
+    Returns asyncpg connect arguments.
+    Behind pgbouncer in transaction mode a server connection can change
+    between statements, so prepared statements are not cached and each
+    gets a unique name to avoid clashes with other clients.
+    """
+    if pgbouncer:
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": unique_statement_name,
+        }
+    return {"prepared_statement_cache_size": prepared_statement_cache_size}
 
 
 class DatabaseHelper:
@@ -18,29 +78,268 @@ class DatabaseHelper:
         echo_pool: bool = False,
         pool_size: int = 5,
         max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = -1,
+        pool_pre_ping: bool = False,
+        query_cache_size: int = 500,
+        prepared_statement_cache_size: int = 256,
+        pgbouncer: bool = False,
+        replica_urls: t.Sequence[str] = (),
+        replica_max_lag: float = 5.0,
+        read_your_writes_window: float = 5.0,
+        shard_urls: t.Sequence[str] = (),
     ) -> None:
-        self.engine: AsyncEngine = create_async_engine(
-            url=url,
-            echo=echo,
-            echo_pool=echo_pool,
-            pool_size=pool_size,
-            max_overflow=max_overflow,
+        self.engine_options = {
+            "echo": echo,
+            "echo_pool": echo_pool,
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout,
+            "pool_recycle": pool_recycle,
+            "pool_pre_ping": pool_pre_ping,
+            "query_cache_size": query_cache_size,
+            "connect_args": connect_args(
+                prepared_statement_cache_size, pgbouncer
+            ),
+        }
+        self.replica_engines: list[AsyncEngine] = [
+            self.create_engine(replica_url, f"replica{index}")
+            for index, replica_url in enumerate(replica_urls)
+        ]
+        self.replica_max_lag = replica_max_lag
+        self.read_your_writes_window = read_your_writes_window
+        # None until the first lag check, so unchecked replicas get no reads.
+        self.replica_lag: list[float | None] = [None] * len(replica_urls)
+        self._replica_cycle = itertools.count()
+        self._recent_writes: dict[str, float] = {}
+
+        self.rebind(url, shard_urls)
+
+    def create_engine(self, url: str, label: str) -> AsyncEngine:
+        engine = create_async_engine(
+            url=url, poolclass=InstrumentedPool, **self.engine_options
+        )
+        instrument_pool(engine, label)
+        statement_timings.instrument(engine)
+        return engine
+
+    def create_session_factory(
+        self, engine: AsyncEngine, shard: int = 0
+    ) -> async_sessionmaker[AsyncSession]:
+        """
+        Returns a session factory bound to engine, which serves shard,
+        that can be routed to other shards with use_shard().
+        """
+        shard_engines = [e.sync_engine for e in self.shard_engines]
+        shard_engines[shard] = engine.sync_engine
+        return async_sessionmaker(
+            bind=engine,
+            sync_session_class=ShardedSession,
+            info={"shard_engines": shard_engines},
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False,
         )
+
+    def rebind(self, url: str, shard_urls: t.Sequence[str] = ()) -> None:
+        """
+        Points the primary engine, which is also shard 0, and the other
+        shards at other databases. Previous engines are not disposed.
+        """
+        self.engine: AsyncEngine = self.create_engine(url, "primary")
+        self.shard_engines: list[AsyncEngine] = [self.engine] + [
+            self.create_engine(shard_url, f"shard{index}")
+            for index, shard_url in enumerate(shard_urls, start=1)
+        ]
         self.session_factory: async_sessionmaker[AsyncSession] = (
-            async_sessionmaker(
-                bind=self.engine,
-                autoflush=False,
-                autocommit=False,
-                expire_on_commit=False,
-            )
+            self.create_session_factory(self.engine)
+        )
+        self.shard_session_factories: list[async_sessionmaker[AsyncSession]] = [
+            self.create_session_factory(engine, shard)
+            for shard, engine in enumerate(self.shard_engines)
+        ]
+        self.replica_session_factories: list[
+            async_sessionmaker[AsyncSession]
+        ] = [self.create_session_factory(e) for e in self.replica_engines]
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.shard_engines)
+
+    @staticmethod
+    def use_shard(session: AsyncSession, shard: int) -> None:
+        """
+        Routes the following statements of session to shard.
+        """
+        session.info["shard"] = shard
+
+    def route_by_email(self, session: AsyncSession, email: str) -> None:
+        self.use_shard(session, shard_for_email(email, self.shard_count))
+
+    def route_by_id(self, session: AsyncSession, user_id: int) -> None:
+        self.use_shard(session, shard_for_id(user_id, self.shard_count))
+
+    async def for_each_shard(
+        self,
+        work: t.Callable[[AsyncSession], t.Awaitable[T]],
+        read_key: str | None = None,
+    ) -> list[T]:
+        """
+        Runs work concurrently with one session per shard and returns
+        the results in shard order. With read_key, shard 0 is read
+        through read_session_factory.
+        """
+        factories = list(self.shard_session_factories)
+        if read_key is not None:
+            factories[0] = self.read_session_factory(read_key)
+
+        async def run(
+            shard: int, factory: async_sessionmaker[AsyncSession]
+        ) -> T:
+            async with factory() as session:
+                self.use_shard(session, shard)
+                return await work(session)
+
+        return await asyncio.gather(
+            *(run(shard, factory) for shard, factory in enumerate(factories))
         )
 
     async def dispose(self) -> None:
-        await self.engine.dispose()
+        for engine in self.shard_engines + self.replica_engines:
+            await engine.dispose()
+
+    async def warm_up(self, connections: int) -> None:
+        """
+        Fills the pools with validated connections before serving.
+        Raises if a shard is unreachable or was set up for another
+        shard count; replicas that fail are left to the lag monitor.
+        """
+        for shard, engine in enumerate(self.shard_engines):
+            opened = await warm_up_pool(engine, connections)
+            logger.info(f"Opened {opened} connections to shard {shard}.")
+            async with engine.connect() as conn:
+                await check_shard_count(conn, shard, self.shard_count)
+        for index, engine in enumerate(self.replica_engines):
+            try:
+                await warm_up_pool(engine, connections)
+            except Exception:
+                logger.warning(f"Replica {index} warm-up failed.")
+
+    @staticmethod
+    def client_key(request: Request) -> str:
+        """
+        Identifies the client for read-your-writes stickiness:
+        a digest of the bearer token if present, so tokens are not kept
+        in memory, otherwise the client address.
+        """
+        authorization = request.headers.get("authorization")
+        if authorization:
+            return hashlib.blake2b(
+                authorization.encode(), digest_size=16
+            ).hexdigest()
+        return request.client.host if request.client else ""
+
+    def mark_write(self, key: str) -> None:
+        """
+        Pins reads of the client to the primary for the
+        read-your-writes window.
+        """
+        now = time.monotonic()
+        if len(self._recent_writes) > 10_000:
+            self._recent_writes = {
+                client: until
+                for client, until in self._recent_writes.items()
+                if until > now
+            }
+        self._recent_writes[key] = now + self.read_your_writes_window
+
+    def wrote_recently(self, key: str) -> bool:
+        until = self._recent_writes.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            self._recent_writes.pop(key, None)
+            return False
+        return True
 
-    async def session_getter(self) -> t.AsyncGenerator[AsyncSession, None]:
+    def read_session_factory(
+        self, key: str
+    ) -> async_sessionmaker[AsyncSession]:
+        """
+        Picks a replica round-robin among those within the lag threshold.
+        Falls back to the primary when there are none or the client
+        wrote within the read-your-writes window.
+        """
+        if not self.replica_session_factories or self.wrote_recently(key):
+            return self.session_factory
+
+        healthy = [
+            factory
+            for factory, lag in zip(
+                self.replica_session_factories, self.replica_lag
+            )
+            if lag is not None and lag <= self.replica_max_lag
+        ]
+        if not healthy:
+            return self.session_factory
+        return healthy[next(self._replica_cycle) % len(healthy)]
+
+    async def check_replicas(self) -> None:
+        """
+        Measures the replication lag of every replica.
+        Unreachable replicas are excluded from reads until the next check.
+        """
+        for index, engine in enumerate(self.replica_engines):
+            try:
+                async with engine.connect() as conn:
+                    result = await conn.execute(REPLICA_LAG_QUERY)
+                    self.replica_lag[index] = float(result.scalar())
+            except Exception:
+                logger.warning(f"Replica {index} lag check failed.")
+                self.replica_lag[index] = None
+
+    async def monitor_replicas(self, interval: float) -> None:
+        """
+        Checks replica lag every interval seconds until cancelled.
+        """
+        while True:
+            await self.check_replicas()
+            await asyncio.sleep(interval)
+
+    async def session_getter(
+        self, request: Request
+    ) -> t.AsyncGenerator[AsyncSession, None]:
         async with self.session_factory() as session:
+            session.info["mark_write"] = functools.partial(
+                self.mark_write, self.client_key(request)
+            )
+            yield session
+
+    async def read_session_getter(
+        self, request: Request
+    ) -> t.AsyncGenerator[AsyncSession, None]:
+        """
+        Yields a session for read-only endpoints, served by a replica
+        when one is healthy. Stickiness is per process.
+        """
+        factory = self.read_session_factory(self.client_key(request))
+        async with factory() as session:
             yield session
 
 
-db_helper = DatabaseHelper(url=settings.url, echo=settings.echo)
+db_helper = DatabaseHelper(
+    url=settings.url,
+    echo=settings.echo,
+    pool_size=settings.pool_size,
+    max_overflow=settings.max_overflow,
+    pool_timeout=settings.pool_timeout,
+    pool_recycle=settings.pool_recycle,
+    pool_pre_ping=settings.pool_pre_ping,
+    query_cache_size=settings.query_cache_size,
+    prepared_statement_cache_size=settings.prepared_statement_cache_size,
+    pgbouncer=settings.pgbouncer,
+    replica_urls=settings.replica_urls,
+    replica_max_lag=settings.replica_max_lag,
+    read_your_writes_window=settings.read_your_writes_window,
+    shard_urls=settings.shard_urls,
+)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack
+
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from web_app.monitoring.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_OVERFLOW,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUTS,
+    DB_POOL_WAIT,
+)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long checkouts wait
+    and how often they time out.
+    """
+
+    label = "primary"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except sa_exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(self.label).inc()
+            raise
+        finally:
+            DB_POOL_WAIT.labels(self.label).observe(
+                time.perf_counter() - started
+            )
+
+    def recreate(self) -> "InstrumentedPool":
+        pool = super().recreate()
+        pool.label = self.label
+        return pool
+
+
+def instrument_pool(engine: AsyncEngine, label: str) -> None:
+    """
+    Labels the engine's pool and keeps the pool gauges current
+    from checkout and checkin events.
+    """
+    sync_engine = engine.sync_engine
+    sync_engine.pool.label = label
+    DB_POOL_SIZE.labels(label).set(sync_engine.pool.size())
+
+    def update_gauges(*_) -> None:
+        pool = sync_engine.pool
+        DB_POOL_CHECKED_OUT.labels(label).set(pool.checkedout())
+        DB_POOL_OVERFLOW.labels(label).set(max(pool.overflow(), 0))
+
+    event.listen(sync_engine, "checkout", update_gauges)
+    event.listen(sync_engine, "checkin", update_gauges)
+
+
+async def warm_up_pool(engine: AsyncEngine, connections: int) -> int:
+    """
+    Opens up to pool_size connections at once and validates each with
+    SELECT 1, so they are idle in the pool before the first request.
+    Returns the number of connections opened.
+    """
+    connections = min(connections, engine.sync_engine.pool.size())
+    async with AsyncExitStack() as stack:
+        opened = await asyncio.gather(
+            *(
+                stack.enter_async_context(engine.connect())
+                for _ in range(connections)
+            )
+        )
+        await asyncio.gather(
+            *(conn.execute(text("SELECT 1")) for conn in opened)
+        )
+    return len(opened)
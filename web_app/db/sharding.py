@@ -0,0 +1,94 @@
+import zlib
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.orm import Session
+
+# The shard count the ids of a shard were issued for: configure_id_sequence
+# makes users_id_seq step by it.
+SEQUENCE_INCREMENT = text(
+    "SELECT increment_by FROM pg_sequences "
+    "WHERE schemaname = current_schema() AND sequencename = 'users_id_seq'"
+)
+HAS_USERS = text("SELECT EXISTS (SELECT 1 FROM users)")
+
+
+def shard_for_email(email: str, shard_count: int) -> int:
+    """
+    Returns the shard owning a normalized email.
+    crc32 is stable across processes, unlike hash().
+    """
+    return zlib.crc32(email.encode()) % shard_count
+
+
+def shard_for_id(user_id: int, shard_count: int) -> int:
+    """
+    Returns the shard owning a user id. Every shard hands out ids
+    congruent to its index modulo the shard count.
+    """
+    return user_id % shard_count
+
+
+class ShardedSession(Session):
+    """
+    Session that runs statements on the shard selected in
+    info["shard"], or on its own bind when none is selected.
+    info["shard_engines"] holds one engine per shard.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        shard = self.info.get("shard")
+        if shard is not None:
+            return self.info["shard_engines"][shard]
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+async def check_shard_count(
+    conn: AsyncConnection,
+    shard: int,
+    shard_count: int,
+    configured: bool = True,
+) -> None:
+    """
+    Raises RuntimeError if the users of a shard were placed for another
+    shard count, so lookups would be routed to the wrong shard.
+    With configured, a shard whose id sequence was not set up for
+    shard_count is an error even without users.
+    """
+    increment = (await conn.execute(SEQUENCE_INCREMENT)).scalar()
+    if increment is None or increment == shard_count:
+        return
+    if (await conn.execute(HAS_USERS)).scalar():
+        raise RuntimeError(
+            f"Shard {shard} holds users placed for {increment} shard(s), "
+            f"but {shard_count} are configured. Their lookups would go to "
+            "the wrong shard; the shard count must not change once users "
+            "exist."
+        )
+    if configured:
+        raise RuntimeError(
+            f"The id sequence of shard {shard} is not configured for "
+            f"{shard_count} shards. Run `python -m web_app.cli migrate`."
+        )
+
+
+async def configure_id_sequence(
+    conn: AsyncConnection, shard: int, shard_count: int
+) -> None:
+    """
+    Makes users_id_seq of a shard step by shard_count from the next id
+    congruent to the shard index, above every existing id.
+    Raises RuntimeError if the shard already holds users placed for
+    another shard count.
+    """
+    await check_shard_count(conn, shard, shard_count, configured=False)
+    result = await conn.execute(text("SELECT coalesce(max(id), 0) FROM users"))
+    next_id = result.scalar() + 1
+    next_id += (shard - next_id) % shard_count
+    await conn.execute(
+        text(f"ALTER SEQUENCE users_id_seq INCREMENT BY {int(shard_count)}")
+    )
+    await conn.execute(
+        text("SELECT setval('users_id_seq', :next_id, false)"),
+        {"next_id": next_id},
+    )
@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+import typing as t
+from contextvars import ContextVar
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Adds the id of the request being served, or "-", to every record.
+    Runs in the thread that logs, where the context is still set.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through at most burst records per message template, logger and
+    level in every period seconds; errors are never sampled. Records
+    past the burst are counted, and when the period ends a
+    "suppressed N" summary is reported for each template.
+    Messages logged with f-strings have no shared template, so only
+    call sites that pass their arguments separately are sampled.
+    """
+
+    def __init__(
+        self,
+        report: t.Callable[[logging.LogRecord], t.Any],
+        burst: int = 10,
+        period: float = 60.0,
+        max_keys: int = 1000,
+    ) -> None:
+        super().__init__()
+        self.report = report
+        self.burst = burst
+        self.period = period
+        self.max_keys = max_keys
+        self.counts: dict[tuple, int] = {}
+        self.window_end = time.monotonic() + period
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        with self.lock:
+            if time.monotonic() >= self.window_end:
+                self.flush()
+            key = (record.name, record.levelno, record.msg)
+            count = self.counts.get(key)
+            if count is None:
+                if len(self.counts) >= self.max_keys:
+                    return True
+                count = 0
+            self.counts[key] = count + 1
+        return count < self.burst
+
+    def flush(self) -> None:
+        """
+        Reports the records suppressed in the current window and starts
+        a new one. Callers hold the lock.
+        """
+        counts, self.counts = self.counts, {}
+        self.window_end = time.monotonic() + self.period
+        for (name, level, msg), count in counts.items():
+            if count > self.burst:
+                self.report(summary(name, level, msg, count - self.burst))
+
+
+def summary(name: str, level: int, msg, suppressed: int) -> logging.LogRecord:
+    record = logging.LogRecord(
+        name,
+        level,
+        __file__,
+        0,
+        "Suppressed %d messages like: %s",
+        (suppressed, msg),
+        None,
+    )
+    record.request_id = "-"
+    record.suppressed = suppressed
+    return record
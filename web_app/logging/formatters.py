@@ -0,0 +1,39 @@
+import logging
+from datetime import datetime, timezone
+
+import orjson
+
+# Attributes every LogRecord has; anything else was passed as extra.
+RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", None, None))
+) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line with orjson. Keys match
+    the previous python-json-logger output, plus request_id and extras.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "asctime": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "levelname": record.levelname,
+            "name": record.name,
+            "lineno": record.lineno,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
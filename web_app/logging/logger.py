@@ -1,10 +1,59 @@
+import logging
+import queue
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
 
+from web_app.logging.filters import RequestIdFilter, SamplingFilter
+from web_app.logging.formatters import JsonFormatter
+from web_app.monitoring.metrics import LOG_RECORDS_DROPPED
 
-def setup_logger(env_mode: str):
+# Records waiting for the listener thread; beyond this they are dropped.
+QUEUE_SIZE = 10_000
+# Holds the output handlers; records reach them only via the listener.
+SINK_LOGGER = "web_app.logging.sink"
+# Records with the same template allowed per sampling period.
+SAMPLE_BURST = 10
+SAMPLE_PERIOD = 60.0
+
+_listener: QueueListener | None = None
+_sampling: SamplingFilter | None = None
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that never blocks: when the bounded queue is full the
+    record is dropped and counted.
+    """
+
+    def __init__(self, queue_size: int = QUEUE_SIZE) -> None:
+        super().__init__(queue.Queue(queue_size))
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+
+def setup_logger(env_mode: str, queue_size: int = QUEUE_SIZE) -> QueueListener:
     """
     Sets up logging configuration based on the environment mode.
+    Loggers only put records on a bounded queue; a listener thread
+    formats them and does the console and file I/O. Rich rendering is
+    used in local mode only. Repeated messages are sampled and every
+    record gets the current request id. Returns the started listener.
     """
+    global _listener, _sampling
+    stop_logger()
+    queue_handler = DroppingQueueHandler(queue_size)
+    _sampling = SamplingFilter(
+        queue_handler.emit, burst=SAMPLE_BURST, period=SAMPLE_PERIOD
+    )
+    queue_handler.addFilter(_sampling)
+    queue_handler.addFilter(RequestIdFilter())
+
     log_config = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -13,16 +62,12 @@ def setup_logger(env_mode: str):
                 "class": "logging.Formatter",
                 "datefmt": "%Y-%m-%d %H:%M:%S",
                 "format": "[%(asctime)s] %(levelname)s in "
-                "%(name)s:%(lineno)d - %(message)s",
-            },
-            "file": {
-                "class": "pythonjsonlogger.jsonlogger.JsonFormatter",
-                "datefmt": "%Y-%m-%d %H:%M:%S",
-                "format": "%(asctime)s.%(msecs)03dZ %(levelname)s "
-                "%(name)s:%(lineno)d %(message)s",
+                "%(name)s:%(lineno)d [%(request_id)s] - %(message)s",
             },
+            "file": {"()": JsonFormatter},
         },
         "handlers": {
+            "queue": {"()": lambda: queue_handler},
             "console": {
                 "class": "rich.logging.RichHandler",
                 "formatter": "console",
@@ -43,27 +88,39 @@ def setup_logger(env_mode: str):
         },
         "loggers": {
             "app": {
-                "handlers": ["console", "rotating_file"],
+                "handlers": ["queue"],
                 "level": "DEBUG",
                 "propagate": False,
             },
             "uvicorn": {
-                "handlers": ["console", "rotating_file"],
+                "handlers": ["queue"],
                 "level": "DEBUG",
                 "propagate": False,
             },
             "sqlalchemy.engine": {
-                "handlers": ["console", "rotating_file"],
+                "handlers": ["queue"],
                 "level": "INFO",
                 "propagate": False,
             },
+            SINK_LOGGER: {
+                "handlers": ["console", "rotating_file"],
+                "propagate": False,
+            },
         },
         "root": {
-            "handlers": ["console", "rotating_file"],
+            "handlers": ["queue"],
             "level": "DEBUG",
         },
     }
 
+    if env_mode != "local":
+        log_config["handlers"]["console"] = {
+            "class": "logging.StreamHandler",
+            "formatter": "console",
+            "level": "DEBUG",
+            "stream": "ext://sys.stderr",
+        }
+
     if env_mode == "local":
         log_config["loggers"]["app"]["level"] = "INFO"
         log_config["loggers"]["uvicorn"]["level"] = "INFO"
@@ -84,3 +141,25 @@ def setup_logger(env_mode: str):
         log_config["root"]["level"] = "ERROR"
 
     dictConfig(log_config)
+    _listener = QueueListener(
+        queue_handler.queue,
+        *logging.getLogger(SINK_LOGGER).handlers,
+        respect_handler_level=True,
+    )
+    _listener.start()
+    return _listener
+
+
+def stop_logger() -> None:
+    """
+    Reports suppressed messages and stops the listener after it has
+    written every queued record.
+    """
+    global _listener, _sampling
+    if _sampling is not None:
+        with _sampling.lock:
+            _sampling.flush()
+        _sampling = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,33 +1,119 @@
 import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
 import uvloop
 from fastapi import FastAPI
 
+from web_app.api.middleware import (
+    InFlightMiddleware,
+    RequestIdMiddleware,
+    in_flight,
+)
 from web_app.api.v1.routers.auth.router import router as auth_router
+from web_app.api.v1.routers.debug.router import router as debug_router
+from web_app.api.v1.routers.metrics.router import router as metrics_router
 from web_app.api.v1.routers.users.router import router as users_router
 from web_app.db.config import settings
-from web_app.logging.logger import setup_logger
+from web_app.db.db_helper import db_helper
+from web_app.logging.logger import setup_logger, stop_logger
+from web_app.monitoring.loop_monitor import loop_monitor
+from web_app.monitoring.metrics import mark_worker_dead
+from web_app.monitoring.request_stats import RequestStatsMiddleware
 from web_app.services.auth.config import redis_client
+from web_app.services.balance import ledger
+from web_app.services.users.activity import activity_tracker
+from web_app.services.users.sweeper import run_sweeper
 
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 logger = logging.getLogger(__name__)
 
 
+async def warm_up_redis(connections: int) -> None:
+    """
+    Opens and pings Redis connections so they are idle in the pool
+    before the first request.
+    """
+    pool = redis_client.connection_pool
+    opened = await asyncio.gather(
+        *(pool.get_connection("PING") for _ in range(connections))
+    )
+    try:
+        for connection in opened:
+            await connection.send_command("PING")
+            await connection.read_response()
+    finally:
+        for connection in opened:
+            await pool.release(connection)
+    logger.info(f"Opened {len(opened)} Redis connections.")
+
+
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     setup_logger(settings.ENV_MODE)
     logger.info("Starting up...")
+    await db_helper.warm_up(settings.pool_warmup_connections)
+    await warm_up_redis(settings.redis_warmup_connections)
+    snapshot_refresher = asyncio.create_task(
+        ledger.run_snapshot_refresher(
+            settings.balance_snapshot_interval,
+            settings.balance_snapshot_batch_size,
+        )
+    )
+    activity_flusher = asyncio.create_task(
+        activity_tracker.run(
+            settings.activity_flush_interval,
+            settings.activity_flush_batch_size,
+        )
+    )
+    background_tasks = [snapshot_refresher, activity_flusher]
+    if settings.loop_monitor_enabled:
+        background_tasks.append(
+            asyncio.create_task(
+                loop_monitor.run(settings.loop_monitor_interval)
+            )
+        )
+    if db_helper.replica_engines:
+        background_tasks.append(
+            asyncio.create_task(
+                db_helper.monitor_replicas(settings.replica_check_interval)
+            )
+        )
+    if settings.sweep_enabled:
+        background_tasks.append(
+            asyncio.create_task(
+                run_sweeper(
+                    settings.sweep_interval,
+                    settings.sweep_inactive_days,
+                    settings.sweep_deleted_days,
+                    settings.sweep_batch_size,
+                    settings.sweep_max_rate,
+                )
+            )
+        )
     yield
-    await redis_client.close()
     logger.info("Shutting down...")
+    if not await in_flight.wait_idle(settings.shutdown_drain_timeout):
+        logger.warning(f"Shutting down with {in_flight.count} requests.")
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await redis_client.close()
+    await db_helper.dispose()
+    mark_worker_dead()
+    stop_logger()
 
 
 app = FastAPI(title="Fox project", lifespan=lifespan)
+app.add_middleware(InFlightMiddleware, tracker=in_flight)
+app.add_middleware(RequestStatsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 app.include_router(auth_router)
 app.include_router(users_router)
+app.include_router(debug_router)
+app.include_router(metrics_router)
 
 
 @app.get("/")
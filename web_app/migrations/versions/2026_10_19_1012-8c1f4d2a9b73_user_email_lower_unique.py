@@ -0,0 +1,64 @@
+"""user email lower unique
+
+Revision ID: 8c1f4d2a9b73
+Revises: 5491ef71a937
+Create Date: 2026-10-19 10:12:41.204518
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8c1f4d2a9b73"
+down_revision: Union[str, None] = "5491ef71a937"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Active users whose emails differ only by case or surrounding spaces.
+DUPLICATE_EMAILS = sa.text(
+    "SELECT lower(trim(email)), array_agg(id ORDER BY id) FROM users "
+    "WHERE is_deleted IS false GROUP BY lower(trim(email)) "
+    "HAVING count(*) > 1 ORDER BY 1"
+)
+
+
+def check_duplicate_emails() -> None:
+    """
+    Fails before anything is changed when normalizing emails would
+    break the unique index, listing the users to merge or rename.
+    """
+    duplicates = op.get_bind().execute(DUPLICATE_EMAILS).all()
+    if duplicates:
+        listed = "\n".join(
+            f"  {email}: users {', '.join(map(str, ids))}"
+            for email, ids in duplicates
+        )
+        raise RuntimeError(
+            f"{len(duplicates)} emails are used by several active users "
+            f"when compared case-insensitively. Merge, rename or delete "
+            f"them and run the migration again:\n{listed}"
+        )
+
+
+def upgrade() -> None:
+    check_duplicate_emails()
+    op.execute("UPDATE users SET email = lower(trim(email))")
+    op.drop_index("user_email", table_name="users")
+    op.drop_index(op.f("ix_users_email"), table_name="users")
+    op.create_index(
+        "user_email_lower_active",
+        "users",
+        [sa.text("lower(email)")],
+        unique=True,
+        postgresql_where=sa.text("is_deleted IS false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("user_email_lower_active", table_name="users")
+    op.create_index(op.f("ix_users_email"), "users", ["email"], unique=False)
+    op.create_index("user_email", "users", ["email"], unique=False)
@@ -0,0 +1,66 @@
+"""balance transactions
+
+Revision ID: b52d7e81c4a0
+Revises: 8c1f4d2a9b73
+Create Date: 2026-10-19 14:05:33.871046
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b52d7e81c4a0"
+down_revision: Union[str, None] = "8c1f4d2a9b73"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "balance_transactions",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("delta", sa.Integer(), nullable=False),
+        sa.Column("reason", sa.String(length=32), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("applied_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "balance_transaction_user_id",
+        "balance_transactions",
+        ["user_id", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "balance_transaction_pending",
+        "balance_transactions",
+        ["user_id"],
+        unique=False,
+        postgresql_include=["delta"],
+        postgresql_where=sa.text("applied_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        "UPDATE users SET balance = users.balance + pending.delta "
+        "FROM (SELECT user_id, sum(delta) AS delta "
+        "FROM balance_transactions WHERE applied_at IS NULL "
+        "GROUP BY user_id) AS pending WHERE users.id = pending.user_id"
+    )
+    op.drop_index(
+        "balance_transaction_pending", table_name="balance_transactions"
+    )
+    op.drop_index(
+        "balance_transaction_user_id", table_name="balance_transactions"
+    )
+    op.drop_table("balance_transactions")
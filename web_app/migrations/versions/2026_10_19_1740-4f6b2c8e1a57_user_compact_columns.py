@@ -0,0 +1,93 @@
+"""user compact columns
+
+Revision ID: 4f6b2c8e1a57
+Revises: d09a6e3f15b8
+Create Date: 2026-10-19 17:40:12.418306
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4f6b2c8e1a57"
+down_revision: Union[str, None] = "d09a6e3f15b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("users", "users_archive")
+
+
+def upgrade() -> None:
+    op.drop_index("user_email_lower_active", table_name="users")
+    op.drop_index("user_block_status", table_name="users")
+    op.drop_index("ix_users_role", table_name="users")
+    for table in TABLES:
+        # One ALTER TABLE so the table is rewritten once.
+        op.execute(
+            f"ALTER TABLE {table} "
+            "ALTER COLUMN role TYPE smallint "
+            "USING CASE role WHEN 'admin' THEN 1 ELSE 0 END, "
+            "ALTER COLUMN balance TYPE bigint, "
+            "ALTER COLUMN block_status TYPE smallint "
+            "USING CASE WHEN block_status THEN 1 ELSE 0 END "
+            "| CASE WHEN is_deleted THEN 2 ELSE 0 END"
+        )
+        op.drop_column(table, "is_deleted")
+        op.alter_column(table, "block_status", new_column_name="status")
+    op.alter_column("users", "status", server_default="0")
+    op.create_index(
+        "user_email_lower_active",
+        "users",
+        [sa.text("lower(email)")],
+        unique=True,
+        postgresql_where=sa.text("((status & 2) != 0) IS false"),
+    )
+    op.create_index(
+        "user_blocked",
+        "users",
+        ["id"],
+        unique=False,
+        postgresql_where=sa.text("(status & 1) != 0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("user_blocked", table_name="users")
+    op.drop_index("user_email_lower_active", table_name="users")
+    op.alter_column("users", "status", server_default=None)
+    for table in TABLES:
+        op.alter_column(table, "status", new_column_name="block_status")
+        op.add_column(
+            table,
+            sa.Column(
+                "is_deleted",
+                sa.Boolean(),
+                server_default=sa.false(),
+                nullable=False,
+            ),
+        )
+        op.execute(
+            f"ALTER TABLE {table} "
+            "ALTER COLUMN role TYPE varchar "
+            "USING CASE role WHEN 1 THEN 'admin' ELSE 'user' END, "
+            "ALTER COLUMN balance TYPE integer, "
+            "ALTER COLUMN is_deleted TYPE boolean "
+            "USING (block_status & 2) != 0, "
+            "ALTER COLUMN block_status TYPE boolean "
+            "USING (block_status & 1) != 0"
+        )
+        op.alter_column(table, "is_deleted", server_default=None)
+    op.create_index(op.f("ix_users_role"), "users", ["role"], unique=False)
+    op.create_index(
+        "user_block_status", "users", ["block_status"], unique=False
+    )
+    op.create_index(
+        "user_email_lower_active",
+        "users",
+        [sa.text("lower(email)")],
+        unique=True,
+        postgresql_where=sa.text("is_deleted IS false"),
+    )
@@ -0,0 +1,59 @@
+"""user server defaults
+
+Revision ID: 7a3d91c4e2b6
+Revises: 4f6b2c8e1a57
+Create Date: 2026-10-19 18:55:31.702915
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7a3d91c4e2b6"
+down_revision: Union[str, None] = "4f6b2c8e1a57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TIMESTAMPS = ("created_at", "updated_at", "last_activity_at")
+
+
+def upgrade() -> None:
+    for name in TIMESTAMPS:
+        op.alter_column("users", name, server_default=sa.text("now()"))
+
+    # NOT VALID skips the scan, so ADD CONSTRAINT holds its ACCESS
+    # EXCLUSIVE lock only briefly; the scan is validated below.
+    op.execute(
+        "ALTER TABLE users ADD CONSTRAINT user_admin_balance "
+        "CHECK (role != 1 OR balance <= 0) NOT VALID"
+    )
+
+    op.execute(
+        "CREATE OR REPLACE FUNCTION users_touch_updated_at() "
+        "RETURNS trigger LANGUAGE plpgsql AS $$ "
+        "BEGIN NEW.updated_at := now(); RETURN NEW; END $$"
+    )
+    op.execute(
+        "CREATE TRIGGER users_updated_at BEFORE UPDATE OF "
+        "first_name, last_name, email, password, role, status, block_at "
+        "ON users FOR EACH ROW "
+        "WHEN (NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at) "
+        "EXECUTE FUNCTION users_touch_updated_at()"
+    )
+
+    # Commits the changes above first: VALIDATE only takes a SHARE UPDATE
+    # EXCLUSIVE lock, but in the same transaction the scan would run
+    # under the ACCESS EXCLUSIVE lock of ADD CONSTRAINT and block writes.
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE users VALIDATE CONSTRAINT user_admin_balance")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER users_updated_at ON users")
+    op.execute("DROP FUNCTION users_touch_updated_at()")
+    op.drop_constraint("user_admin_balance", "users", type_="check")
+    for name in TIMESTAMPS:
+        op.alter_column("users", name, server_default=None)
@@ -0,0 +1,40 @@
+"""balance transaction bigint delta
+
+Revision ID: c6e2f9a4d173
+Revises: 7a3d91c4e2b6
+Create Date: 2026-10-19 19:30:08.215634
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c6e2f9a4d173"
+down_revision: Union[str, None] = "7a3d91c4e2b6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Absolute sets append target - current, which can exceed int4
+    # now that users.balance is a bigint.
+    op.alter_column(
+        "balance_transactions",
+        "delta",
+        type_=sa.BigInteger(),
+        existing_type=sa.Integer(),
+        existing_nullable=False,
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        "balance_transactions",
+        "delta",
+        type_=sa.Integer(),
+        existing_type=sa.BigInteger(),
+        existing_nullable=False,
+    )
@@ -1,7 +1,11 @@
 __all__ = (
+    "BalanceTransaction",
     "Base",
     "User",
+    "UserArchive",
 )
 
+from .balance_transaction import BalanceTransaction
 from .base import Base
 from .user import User
+from .user_archive import UserArchive
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class BalanceTransaction(Base):
+    """
+    Model representing an append-only balance ledger entry.
+    Entries with empty applied_at are not yet folded into users.balance.
+    """
+
+    __tablename__ = "balance_transactions"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    delta: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    reason: Mapped[str] = mapped_column(String(32), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    applied_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    __table_args__ = (
+        Index("balance_transaction_user_id", "user_id", "id"),
+        Index(
+            "balance_transaction_pending",
+            "user_id",
+            postgresql_include=["delta"],
+            postgresql_where=text("applied_at IS NULL"),
+        ),
+    )
+
+    def __repr__(self) -> str:
+        return f"BalanceTransaction(user_id={self.user_id}, delta={self.delta})"
@@ -1,14 +1,78 @@
+import enum
 import typing as t
-from datetime import datetime, timezone
+from datetime import datetime
 
-from fastapi import HTTPException
-from sqlalchemy import Boolean, DateTime, Index, Integer, String, event
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    CheckConstraint,
+    DateTime,
+    FetchedValue,
+    Index,
+    SmallInteger,
+    String,
+    TypeDecorator,
+    event,
+    func,
+    literal_column,
+)
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base
 
 Role = t.Literal["user", "admin"]
 
+# Stored codes of roles. Append only, codes are persisted.
+ROLE_CODES: dict[str, int] = {"user": 0, "admin": 1}
+ROLES: dict[int, str] = {code: role for role, code in ROLE_CODES.items()}
+
+
+class RoleType(TypeDecorator):
+    """
+    Stores a Role as its smallint code.
+    """
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else ROLE_CODES[value]
+
+    def process_literal_param(self, value, dialect):
+        return str(ROLE_CODES[value])
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else ROLES[value]
+
+
+class UserStatus(enum.IntFlag):
+    """
+    Bits of User.status.
+    """
+
+    BLOCKED = 1
+    DELETED = 2
+
+
+def status_flag(flag: UserStatus):
+    """
+    Returns the SQL test of a status bit. Literals, not bind parameters,
+    so that partial index predicates match generic plans.
+    """
+    return User.status.op("&")(literal_column(str(int(flag)))) != (
+        literal_column("0")
+    )
+
+
+def status_update(flag: UserStatus, value: bool):
+    """
+    Returns the SQL value of status with flag set to value.
+    """
+    if value:
+        return User.status.op("|")(literal_column(str(int(flag))))
+    return User.status.op("&")(literal_column(str(~int(flag))))
+
 
 class User(Base):
     """
@@ -17,45 +81,90 @@ class User(Base):
 
     first_name: Mapped[str] = mapped_column(String(50), nullable=True)
     last_name: Mapped[str] = mapped_column(String(50), nullable=True)
-    email: Mapped[str] = mapped_column(String, index=True, nullable=False)
+    email: Mapped[str] = mapped_column(String, nullable=False)
     password: Mapped[str] = mapped_column(String, nullable=False)
-    role: Mapped[Role] = mapped_column(
-        String, index=True, nullable=False, default="user"
-    )
+    role: Mapped[Role] = mapped_column(RoleType, nullable=False, default="user")
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
-        default=datetime.now(timezone.utc),
+        server_default=func.now(),
     )
+    # Bumped by the users_updated_at trigger.
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=True,
-        default=datetime.now(timezone.utc),
-        onupdate=datetime.now(timezone.utc),
+        server_default=func.now(),
+        server_onupdate=FetchedValue(),
     )
     last_activity_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
-        default=datetime.now(timezone.utc),
-    )
-    balance: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
-    block_status: Mapped[bool] = mapped_column(
-        Boolean, nullable=False, default=False
+        server_default=func.now(),
     )
+    # Snapshot of the balance ledger, see BalanceTransaction.
+    balance: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
     block_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=True,
     )
-    is_deleted: Mapped[bool] = mapped_column(
-        Boolean, nullable=False, default=False
+    # UserStatus bits, exposed as block_status and is_deleted.
+    status: Mapped[int] = mapped_column(
+        SmallInteger, nullable=False, default=0, server_default="0"
     )
 
     __table_args__ = (
-        Index("user_email", "email"),
         Index("user_last_activity_at", "last_activity_at"),
-        Index("user_block_status", "block_status"),
         Index("user_balance", "balance"),
+        CheckConstraint(
+            f"role != {ROLE_CODES['admin']} OR balance <= 0",
+            name="user_admin_balance",
+        ),
     )
+    # Server generated columns are returned by the INSERT or UPDATE itself.
+    __mapper_args__ = {"eager_defaults": True}
+
+    def has_status(self, flag: UserStatus) -> bool:
+        return bool((self.status or 0) & flag)
+
+    def set_status(self, flag: UserStatus, value: bool) -> None:
+        status = self.status or 0
+        self.status = status | flag if value else status & ~flag
+
+    @hybrid_property
+    def block_status(self) -> bool:
+        return self.has_status(UserStatus.BLOCKED)
+
+    @block_status.inplace.setter
+    def _block_status_setter(self, value: bool) -> None:
+        self.set_status(UserStatus.BLOCKED, value)
+
+    @block_status.inplace.expression
+    @classmethod
+    def _block_status_expression(cls):
+        return status_flag(UserStatus.BLOCKED)
+
+    @block_status.inplace.update_expression
+    @classmethod
+    def _block_status_update(cls, value: bool):
+        return [(cls.status, status_update(UserStatus.BLOCKED, value))]
+
+    @hybrid_property
+    def is_deleted(self) -> bool:
+        return self.has_status(UserStatus.DELETED)
+
+    @is_deleted.inplace.setter
+    def _is_deleted_setter(self, value: bool) -> None:
+        self.set_status(UserStatus.DELETED, value)
+
+    @is_deleted.inplace.expression
+    @classmethod
+    def _is_deleted_expression(cls):
+        return status_flag(UserStatus.DELETED)
+
+    @is_deleted.inplace.update_expression
+    @classmethod
+    def _is_deleted_update(cls, value: bool):
+        return [(cls.status, status_update(UserStatus.DELETED, value))]
 
     def __repr__(self) -> str:
         """
@@ -66,41 +175,38 @@ class User(Base):
     def as_dict(self):
         """
         Converts the User object to a dictionary representation,
-        including email, password, and role.
+        including id, email, password, and role.
         """
         return {
+            "id": self.id,
             "email": self.email,
             "password": self.password,
             "role": self.role,
         }
 
-    @staticmethod
-    def update_timestamp(mapper, connection, target):
-        """
-        Updates the updated_at timestamp before the User object
-        is updated in the database.
-        """
-        target.updated_at = datetime.now(timezone.utc)
 
-    @staticmethod
-    def check_admin_balance(user):
-        """
-        Ensure admins cannot have an active balance.
-        """
-        if user.role == "admin" and user.balance > 0:
-            raise HTTPException(
-                status_code=400, detail="Admins cannot have an active balance"
-            )
+Index(
+    "user_email_lower_active",
+    func.lower(User.email),
+    unique=True,
+    postgresql_where=User.is_deleted.is_(False),
+)
 
-    @staticmethod
-    def before_insert_or_update(mapper, connection, target):
-        """
-        Validates before inserting or updating a User object.
-        Ensures that an admin cannot have an active balance.
-        """
-        User.check_admin_balance(target)
+Index("user_blocked", User.id, postgresql_where=User.block_status)
 
+# Bumps updated_at when a statement changes profile or status columns
+# without setting it, so ledger snapshots and activity flushes keep it.
+UPDATED_AT_FUNCTION = DDL(
+    "CREATE OR REPLACE FUNCTION users_touch_updated_at() RETURNS trigger "
+    "LANGUAGE plpgsql AS $$ BEGIN NEW.updated_at := now(); RETURN NEW; END $$"
+)
+UPDATED_AT_TRIGGER = DDL(
+    "CREATE TRIGGER users_updated_at BEFORE UPDATE OF "
+    "first_name, last_name, email, password, role, status, block_at "
+    "ON users FOR EACH ROW "
+    "WHEN (NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at) "
+    "EXECUTE FUNCTION users_touch_updated_at()"
+)
 
-event.listen(User, "before_update", User.before_insert_or_update)
-event.listen(User, "before_insert", User.before_insert_or_update)
-event.listen(User, "before_update", User.update_timestamp)
+event.listen(User.__table__, "after_create", UPDATED_AT_FUNCTION)
+event.listen(User.__table__, "after_create", UPDATED_AT_TRIGGER)
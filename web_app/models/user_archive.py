@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Integer, SmallInteger, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+from .user import Role, RoleType
+
+
+class UserArchive(Base):
+    """
+    Model representing a user moved out of the users table
+    by the retention sweep
+    """
+
+    __tablename__ = "users_archive"
+
+    id: Mapped[int] = mapped_column(
+        Integer, primary_key=True, autoincrement=False
+    )
+    first_name: Mapped[str] = mapped_column(String(50), nullable=True)
+    last_name: Mapped[str] = mapped_column(String(50), nullable=True)
+    email: Mapped[str] = mapped_column(String, nullable=False)
+    password: Mapped[str] = mapped_column(String, nullable=False)
+    role: Mapped[Role] = mapped_column(RoleType, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    last_activity_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    balance: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    block_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    status: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+    def __repr__(self) -> str:
+        return f"UserArchive(email={self.email})"
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+
+from web_app.db.config import settings
+from web_app.monitoring.metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(APP_ROOT)
+# Frames kept from the innermost end of a captured stack.
+STACK_DEPTH = 20
+
+
+@dataclass
+class BlockedSite:
+    stack: list[str] = field(default_factory=list)
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+def short_path(path: str) -> str:
+    if path.startswith(PROJECT_ROOT):
+        return os.path.relpath(path, PROJECT_ROOT)
+    return path
+
+
+def call_site(stack: list[traceback.FrameSummary]) -> str:
+    """
+    Names the innermost frame of app code in stack, or the innermost
+    frame when no app code is on it, as "path:line in function".
+    """
+    for frame in reversed(stack):
+        if frame.filename.startswith(APP_ROOT):
+            break
+    else:
+        frame = stack[-1]
+    return f"{short_path(frame.filename)}:{frame.lineno} in {frame.name}"
+
+
+class LoopMonitor:
+    """
+    Measures event loop lag with a ticker task. A watchdog thread checks
+    that the ticker wakes up on time; when it is late by threshold the
+    loop is blocked, and the watchdog captures the stack of the loop
+    thread. Blocks are aggregated by the call site on that stack.
+    """
+
+    def __init__(self, threshold: float, max_sites: int) -> None:
+        self.threshold = threshold
+        self.max_sites = max_sites
+        self.sites: dict[str, BlockedSite] = {}
+        # When the ticker should wake up next, and the stack captured
+        # while it was overdue.
+        self._deadline = time.monotonic()
+        self._captured: tuple[float, traceback.StackSummary] | None = None
+
+    def _watch(self, thread_id: int, stop: threading.Event) -> None:
+        captured_for = None
+        while not stop.wait(self.threshold / 2):
+            deadline = self._deadline
+            overdue = time.monotonic() - deadline >= self.threshold
+            if not overdue or captured_for == deadline:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            self._captured = (deadline, traceback.extract_stack(frame))
+            captured_for = deadline
+            del frame
+
+    def _record(self, lag: float) -> None:
+        captured, self._captured = self._captured, None
+        if captured is not None and captured[0] == self._deadline:
+            stack = captured[1][-STACK_DEPTH:]
+            site = call_site(stack)
+        else:
+            # The block ended before the watchdog looked.
+            stack, site = [], "unknown"
+
+        stats = self.sites.get(site)
+        if stats is None:
+            if len(self.sites) >= self.max_sites:
+                site = "other"
+                stats = self.sites.setdefault(site, BlockedSite())
+            else:
+                stats = self.sites[site] = BlockedSite(
+                    traceback.format_list(stack)
+                )
+        stats.count += 1
+        stats.total += lag
+        stats.max = max(stats.max, lag)
+        EVENT_LOOP_BLOCKED.labels(site).inc()
+        logger.warning("Event loop blocked for %.0f ms at %s", lag * 1000, site)
+
+    async def run(self, interval: float) -> None:
+        """
+        Wakes up every interval seconds and records how late it was,
+        until cancelled.
+        """
+        stop = threading.Event()
+        watchdog = threading.Thread(
+            target=self._watch,
+            args=(threading.get_ident(), stop),
+            name="loop-watchdog",
+            daemon=True,
+        )
+        watchdog.start()
+        try:
+            while True:
+                self._deadline = time.monotonic() + interval
+                await asyncio.sleep(interval)
+                lag = max(time.monotonic() - self._deadline, 0.0)
+                EVENT_LOOP_LAG.observe(lag)
+                if lag >= self.threshold:
+                    self._record(lag)
+        finally:
+            stop.set()
+
+    def slowest(self, limit: int) -> list[tuple[str, BlockedSite]]:
+        """
+        Returns the limit call sites that blocked the loop the longest.
+        """
+        ranked = sorted(
+            self.sites.items(), key=lambda item: item[1].total, reverse=True
+        )
+        return ranked[:limit]
+
+    def reset(self) -> None:
+        self.sites.clear()
+
+
+loop_monitor = LoopMonitor(
+    settings.loop_block_threshold, settings.loop_monitor_sites
+)
@@ -0,0 +1,154 @@
+"""
+Prometheus metrics of the app.
+
+With PROMETHEUS_MULTIPROC_DIR set before the app starts, every uvicorn
+worker writes its values to files in that directory and /metrics
+aggregates all workers; gauges declare how their values combine.
+"""
+
+import os
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+ACTIVITY_FLUSH_BATCH_SIZE = Histogram(
+    "activity_flush_batch_size",
+    "Users whose last_activity_at is written by one flush statement.",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+ACTIVITY_FLUSH_INTERVAL = Gauge(
+    "activity_flush_interval_seconds",
+    "Configured interval between last_activity_at flushes.",
+    multiprocess_mode="max",
+)
+ACTIVITY_FLUSH_LAG = Histogram(
+    "activity_flush_lag_seconds",
+    "Age of the oldest activity timestamp when it reaches Postgres.",
+    buckets=(0.5, 1, 2.5, 5, 10, 15, 30, 60, 120, 300),
+)
+
+DB_POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Configured number of persistent connections in the pool.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Overflow connections currently open beyond pool_size.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent getting a connection from the pool.",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Checkouts that gave up after pool_timeout seconds.",
+    ["pool"],
+)
+
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "Cursor execution time per normalized statement fingerprint.",
+    ["statement"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records discarded because the logging queue was full.",
+)
+
+BCRYPT_QUEUE_DEPTH = Gauge(
+    "bcrypt_queue_depth",
+    "Passwords waiting to be hashed by the bcrypt thread pool.",
+    multiprocess_mode="livesum",
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Redis cache lookups by cache and result.",
+    ["cache", "result"],
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "How late the loop monitor woke up after each sleep.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "event_loop_blocked_total",
+    "Times the event loop was blocked past the threshold, by call site.",
+    ["site"],
+)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "Served HTTP requests by method, route template and status.",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response is sent, by method and route template.",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+LOGIN_ATTEMPTS = Counter(
+    "login_attempts_total",
+    "Login attempts by result.",
+    ["result"],
+)
+
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round trip time by command.",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1),
+)
+REDIS_PING_LATENCY = Gauge(
+    "redis_ping_latency_seconds",
+    "Round trip time of a PING sent when metrics are scraped.",
+    multiprocess_mode="mostrecent",
+)
+
+
+def multiprocess_dir() -> str | None:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def render_metrics() -> bytes:
+    """
+    Returns every metric in the text exposition format, combined over
+    all workers in multiprocess mode.
+    """
+    if multiprocess_dir() is None:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def mark_worker_dead() -> None:
+    """
+    Drops the live gauges of this worker when it shuts down.
+    """
+    if multiprocess_dir() is not None:
+        multiprocess.mark_process_dead(os.getpid())
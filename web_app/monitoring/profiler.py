@@ -0,0 +1,144 @@
+import sys
+import threading
+import time
+import typing as t
+from collections import Counter
+
+from web_app.monitoring.loop_monitor import short_path
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+# Frames kept from the innermost end of a sampled stack; deeper stacks
+# get DEPTH_TRUNCATED as their root.
+MAX_DEPTH = 128
+DEPTH_TRUNCATED = "<truncated>"
+# Distinct stacks kept; samples of further stacks are counted together.
+MAX_STACKS = 10_000
+TRUNCATED = ("[truncated]",)
+
+Stack = tuple[str, ...]
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_qualname} ({short_path(code.co_filename)}:"
+        f"{code.co_firstlineno})"
+    )
+
+
+def stack_of(frame) -> Stack:
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    if frame is not None:
+        names.append(DEPTH_TRUNCATED)
+    names.reverse()
+    return tuple(names)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler of this process. A sampling thread reads the
+    stacks of the profiled threads every interval seconds; the profiled
+    threads are not instrumented, so the cost is one stack walk per
+    thread and sample. One profile runs at a time.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+
+    def sample(
+        self,
+        seconds: float,
+        interval: float,
+        thread_ids: t.Collection[int] | None = None,
+    ) -> Counter[Stack]:
+        """
+        Samples the given threads, or all other threads, for seconds
+        and returns the number of samples per stack, rooted at the
+        thread name. Raises ProfilerBusy while another profile runs.
+        """
+        if not self.lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            return self._sample(seconds, interval, thread_ids)
+        finally:
+            self.lock.release()
+
+    @staticmethod
+    def _sample(
+        seconds: float,
+        interval: float,
+        thread_ids: t.Collection[int] | None,
+    ) -> Counter[Stack]:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        samples: Counter[Stack] = Counter()
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while next_sample < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if thread_ids is not None and ident not in thread_ids:
+                    continue
+                root = names.get(ident, f"thread-{ident}")
+                stack = (root, *stack_of(frame))
+                if stack not in samples and len(samples) >= MAX_STACKS:
+                    stack = (root, *TRUNCATED)
+                samples[stack] += 1
+            del frame
+            next_sample += interval
+            time.sleep(max(next_sample - time.monotonic(), 0))
+        return samples
+
+
+def collapsed(samples: Counter[Stack]) -> str:
+    """
+    Formats samples as collapsed stacks, one "frame;frame count" line
+    per stack, as read by flamegraph.pl and speedscope.
+    """
+    return "".join(
+        f"{';'.join(stack)} {count}\n"
+        for stack, count in sorted(samples.items())
+    )
+
+
+def speedscope(samples: Counter[Stack], interval: float, name: str) -> dict:
+    """
+    Formats samples as a speedscope sampled profile weighted in seconds.
+    """
+    frames: list[dict] = []
+    indexes: dict[str, int] = {}
+    stacks, weights = [], []
+    for stack, count in samples.items():
+        for frame in stack:
+            if frame not in indexes:
+                indexes[frame] = len(frames)
+                frames.append({"name": frame})
+        stacks.append([indexes[frame] for frame in stack])
+        weights.append(count * interval)
+    return {
+        "$schema": SPEEDSCOPE_SCHEMA,
+        "name": name,
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": stacks,
+                "weights": weights,
+            }
+        ],
+    }
+
+
+profiler = SamplingProfiler()
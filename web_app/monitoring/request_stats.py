@@ -0,0 +1,217 @@
+import logging
+import time
+import typing as t
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+
+from redis.asyncio import Redis
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from web_app.monitoring.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+    REDIS_COMMAND_DURATION,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestStats:
+    """
+    Statements, Redis calls and time spent in each during one request.
+    """
+
+    started: float = field(default_factory=time.perf_counter)
+    finished: float | None = None
+    db_count: int = 0
+    db_time: float = 0.0
+    redis_count: int = 0
+    redis_time: float = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_count}", '
+            f"redis;dur={self.redis_time * 1000:.1f};"
+            f'desc="{self.redis_count}", '
+            f"app;dur={self.elapsed * 1000:.1f}"
+        )
+
+
+current_request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def record_statement(duration: float) -> None:
+    if stats := current_request_stats.get():
+        stats.db_count += 1
+        stats.db_time += duration
+
+
+# Metric children by label values. Looking them up here avoids the lock
+# that labels() takes on every call.
+_redis_metrics: dict[str, t.Any] = {}
+_http_metrics: dict[tuple[str, str, int], tuple] = {}
+
+
+def record_redis_call(command: str, duration: float) -> None:
+    histogram = _redis_metrics.get(command)
+    if histogram is None:
+        histogram = _redis_metrics[command] = REDIS_COMMAND_DURATION.labels(
+            command
+        )
+    histogram.observe(duration)
+    if stats := current_request_stats.get():
+        stats.redis_count += 1
+        stats.redis_time += duration
+
+
+class InstrumentedRedis(Redis):
+    """
+    Redis client that counts commands against the current request
+    and records their latency.
+    """
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            record_redis_call(args[0], time.perf_counter() - started)
+
+
+@dataclass(frozen=True)
+class RouteBudget:
+    """
+    Upper bounds for one request. None means unbounded.
+    """
+
+    db: int | None = 10
+    redis: int | None = 10
+    wall: float | None = 1.0
+
+
+DEFAULT_BUDGET = RouteBudget()
+
+# Keyed by method and route path template.
+ROUTE_BUDGETS: dict[tuple[str, str], RouteBudget] = {
+    ("GET", "/api/v1/users/profile/me/"): RouteBudget(db=2, redis=3),
+    ("PUT", "/api/v1/users/profile/"): RouteBudget(db=5, redis=4),
+    ("GET", "/api/v1/users/{id}/balance/"): RouteBudget(db=2, redis=3),
+    ("PUT", "/api/v1/users/{id}/balance/"): RouteBudget(db=5, redis=3),
+    ("POST", "/api/v1/users/{id}/balance/adjust/"): RouteBudget(db=4, redis=3),
+    ("DELETE", "/api/v1/users/{id}/delete/"): RouteBudget(db=3, redis=4),
+    ("PATCH", "/api/v1/users/{user_id}/block/"): RouteBudget(db=2, redis=4),
+    ("PATCH", "/api/v1/users/{user_id}/unblock/"): RouteBudget(db=2, redis=4),
+    # Statements and hashing time grow with the number of users sent.
+    ("POST", "/api/v1/users/bulk/"): RouteBudget(db=None, wall=None),
+    # Takes as long as the profile that was asked for.
+    ("GET", "/api/v1/debug/profile/"): RouteBudget(wall=None),
+}
+
+# Set to a list to collect violations instead of only logging them.
+budget_violations: list[tuple[str, str, float, float]] | None = None
+
+
+def check_budget(route: str, budget: RouteBudget, stats: RequestStats):
+    """
+    Logs, and collects when enabled, every limit the request exceeded.
+    """
+    measured = (
+        ("db", stats.db_count, budget.db),
+        ("redis", stats.redis_count, budget.redis),
+        ("wall", stats.elapsed, budget.wall),
+    )
+    for kind, value, limit in measured:
+        if limit is None or value <= limit:
+            continue
+        logger.warning(
+            "%s exceeded its %s budget: %s/%s", route, kind, value, limit
+        )
+        if budget_violations is not None:
+            budget_violations.append((route, kind, value, limit))
+
+
+def observe_request(
+    method: str, route: str, status_code: int, elapsed: float
+) -> None:
+    key = (method, route, status_code)
+    metrics = _http_metrics.get(key)
+    if metrics is None:
+        metrics = _http_metrics[key] = (
+            HTTP_REQUESTS.labels(method, route, str(status_code)),
+            HTTP_REQUEST_DURATION.labels(method, route),
+        )
+    requests, duration = metrics
+    requests.inc()
+    duration.observe(elapsed)
+
+
+class RequestStatsMiddleware:
+    """
+    Collects request stats, reports them in a Server-Timing header,
+    checks them against the route budget and records request metrics
+    by route template.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status_code = 500
+        observed = False
+
+        def observe(finished: RequestStats) -> None:
+            nonlocal observed
+            observed = True
+            route = scope.get("route")
+            observe_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status_code,
+                finished.elapsed,
+            )
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing())
+            await send(message)
+            response_done = message["type"] == "http.response.body"
+            if response_done and not message.get("more_body", False):
+                # Background tasks run after this and are not budgeted.
+                finished = replace(stats, finished=time.perf_counter())
+                self.check(scope, finished)
+                observe(finished)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception:
+            # The error middleware answers 500 outside of this one.
+            if not observed:
+                observe(replace(stats, finished=time.perf_counter()))
+            raise
+        finally:
+            current_request_stats.reset(token)
+
+    @staticmethod
+    def check(scope: Scope, stats: RequestStats) -> None:
+        route = scope.get("route")
+        if route is not None:
+            key = (scope["method"], route.path)
+            budget = ROUTE_BUDGETS.get(key, DEFAULT_BUDGET)
+            check_budget(" ".join(key), budget, stats)
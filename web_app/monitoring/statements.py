@@ -0,0 +1,137 @@
+import logging
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from web_app.db.config import settings
+from web_app.monitoring.metrics import DB_STATEMENT_DURATION
+from web_app.monitoring.request_stats import record_statement
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = re.compile(r"\$\d+(::[A-Z][A-Z0-9_ ]*(\[\])?)?")
+PLACEHOLDER_LIST = re.compile(r"\?(\s*,\s*\?)+")
+ROW_LIST = re.compile(r"\(\?\)(\s*,\s*\(\?\))+")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Replaces bind parameters with ? and collapses parameter and VALUES
+    lists, so statements differing only in list length share one entry.
+    """
+    statement = PLACEHOLDER.sub("?", statement)
+    statement = PLACEHOLDER_LIST.sub("?", statement)
+    statement = ROW_LIST.sub("(?)", statement)
+    return WHITESPACE.sub(" ", statement).strip()
+
+
+def fingerprint(statement: str) -> str:
+    return f"{zlib.crc32(statement.encode()):08x}"
+
+
+@lru_cache(maxsize=4096)
+def statement_key(statement: str) -> tuple[str, str]:
+    """
+    Returns the fingerprint and normalized text of a statement.
+    """
+    normalized = normalize_statement(statement)
+    return fingerprint(normalized), normalized
+
+
+def redact(parameters) -> object:
+    """
+    Keeps the shape of statement parameters and drops their values.
+    """
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"<{len(parameters)} parameter sets>"
+        return tuple(type(value).__name__ for value in parameters)
+    return type(parameters).__name__
+
+
+@dataclass
+class StatementStats:
+    statement: str
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class StatementTimings:
+    """
+    Per-statement latency aggregates of this process, keyed by the
+    fingerprint of the normalized statement.
+    """
+
+    def __init__(self, slow_threshold: float, max_statements: int) -> None:
+        self.slow_threshold = slow_threshold
+        self.max_statements = max_statements
+        self.stats: dict[str, StatementStats] = {}
+
+    def record(self, statement: str, parameters, duration: float) -> None:
+        key, normalized = statement_key(statement)
+
+        stats = self.stats.get(key)
+        if stats is None and len(self.stats) < self.max_statements:
+            stats = self.stats[key] = StatementStats(normalized)
+        if stats is not None:
+            stats.count += 1
+            stats.total += duration
+            stats.max = max(stats.max, duration)
+            DB_STATEMENT_DURATION.labels(key).observe(duration)
+
+        if duration >= self.slow_threshold:
+            logger.warning(
+                "Slow statement %s took %.1f ms: %s parameters=%s",
+                key,
+                duration * 1000,
+                normalized,
+                redact(parameters),
+            )
+
+    def slowest(self, limit: int) -> list[tuple[str, StatementStats]]:
+        """
+        Returns the limit statements with the highest maximum latency.
+        """
+        ranked = sorted(
+            self.stats.items(), key=lambda item: item[1].max, reverse=True
+        )
+        return ranked[:limit]
+
+    def reset(self) -> None:
+        self.stats.clear()
+
+    def instrument(self, engine: AsyncEngine) -> None:
+        """
+        Times every cursor execution of the engine.
+        """
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def start_timer(conn, cursor, statement, parameters, context, many):
+            context._statement_started = time.perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def stop_timer(conn, cursor, statement, parameters, context, many):
+            started = getattr(context, "_statement_started", None)
+            if started is not None:
+                duration = time.perf_counter() - started
+                record_statement(duration)
+                self.record(statement, parameters, duration)
+
+
+statement_timings = StatementTimings(
+    settings.slow_statement_threshold, settings.statement_stats_limit
+)
@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+
+
+class StatementStatsS(BaseModel):
+    """
+    Schema for latency aggregates of one normalized SQL statement.
+    """
+
+    fingerprint: str
+    statement: str
+    count: int
+    mean_ms: float
+    max_ms: float
+    total_ms: float
+
+
+class BlockedCallSiteS(BaseModel):
+    """
+    Schema for event loop blocks aggregated by call site.
+    """
+
+    site: str
+    count: int
+    mean_ms: float
+    max_ms: float
+    total_ms: float
+    stack: list[str]
@@ -10,8 +10,11 @@ from pydantic import (
     Field,
     constr,
     field_validator,
+    model_validator,
 )
 
+from web_app.services.auth.utils import normalize_email
+
 
 class UserCreateS(BaseModel):
     """
@@ -44,16 +47,33 @@ class UserCreateS(BaseModel):
             )
         return v
 
+    @field_validator("email")
+    def validate_email(cls, value):
+        return normalize_email(value)
+
     @field_validator("first_name", "last_name", mode="before")
     def validate_names(cls, value, field):
         if value and not re.match(r"^[A-Za-z]+$", value):
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=f"{field.name} must only contain alphabetic characters.",
+                detail=f"{field.field_name} must only contain "
+                "alphabetic characters.",
             )
         return value
 
 
+class UserCreateResultS(BaseModel):
+    """
+    Schema for the outcome of one item of a bulk user creation.
+    """
+
+    index: int
+    email: Optional[str] = None
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
 class UserUpdateS(BaseModel):
     """
     Schema for user update.
@@ -70,7 +90,8 @@ class UserUpdateS(BaseModel):
         if value and not re.match(r"^[A-Za-z]+$", value):
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=f"{field.name} must only contain alphabetic characters.",
+                detail=f"{field.field_name} must only contain "
+                "alphabetic characters.",
             )
         return value
 
@@ -114,7 +135,21 @@ class BalanceUpdateS(BaseModel):
     Schema for updating user's balance.
     """
 
-    balance: Optional[int] = Field(None, ge=0)
+    balance: int = Field(ge=0)
+
+
+class BalanceAdjustS(BaseModel):
+    """
+    Schema for applying a signed delta to user's balance.
+    """
+
+    delta: int
+
+    @field_validator("delta")
+    def validate_delta(cls, value):
+        if value == 0:
+            raise ValueError("Delta must not be zero.")
+        return value
 
 
 class UserFilterS(BaseModel):
@@ -133,7 +168,7 @@ class UserFilterS(BaseModel):
     def validate_names(cls, value, field):
         if value and not re.match(r"^[A-Za-z]+$", value):
             raise ValueError(
-                f"{field.name} must only contain alphabetic characters."
+                f"{field.field_name} must only contain alphabetic characters."
             )
         return value
 
@@ -150,3 +185,30 @@ class UserFilterS(BaseModel):
         if not re.match(r"^(asc|desc)$", value):
             raise ValueError("Sort order must be either 'asc' or 'desc'.")
         return value
+
+
+class UserBulkActionS(BaseModel):
+    """
+    Schema for selecting users of a bulk action by ids or by filters.
+    """
+
+    ids: Optional[list[int]] = Field(None, min_length=1, max_length=100_000)
+    filters: Optional[UserFilterS] = None
+
+    @model_validator(mode="after")
+    def validate_selection(self):
+        if (self.ids is None) == (self.filters is None):
+            raise ValueError("Exactly one of ids or filters must be given.")
+        return self
+
+
+class BulkJobS(BaseModel):
+    """
+    Schema for bulk action progress.
+    """
+
+    job_id: Optional[str] = None
+    action: str
+    status: str
+    total: Optional[int] = None
+    processed: int
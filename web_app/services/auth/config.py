@@ -1,16 +1,16 @@
 from pathlib import Path
 
-import redis.asyncio as redis
 from aiocache import Cache
 from aiocache.serializers import JsonSerializer
 from pydantic import BaseModel
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent
+from web_app.monitoring.request_stats import InstrumentedRedis
+from web_app.services.auth.keys import PRIVATE_KEY_PATH, PUBLIC_KEY_PATH
 
 
 class AuthJWT(BaseModel):
-    private_key_path: Path = BASE_DIR / "certs" / "jwt-private.pem"
-    public_key_path: Path = BASE_DIR / "certs" / "jwt-public.pem"
+    private_key_path: Path = PRIVATE_KEY_PATH
+    public_key_path: Path = PUBLIC_KEY_PATH
     algorithm: str = "RS256"
     access_token_expire_minutes: int = 15
     refresh_token_expire_days: int = 30
@@ -26,7 +26,7 @@ BLOCK_TIME_SECONDS = 300
 
 REDIS_URL = "redis://redis:6379/0"
 
-redis_client = redis.from_url(
+redis_client = InstrumentedRedis.from_url(
     REDIS_URL, encoding="utf-8", decode_responses=True
 )
 
@@ -0,0 +1,56 @@
+import os
+import sys
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent
+CERTS_DIR = BASE_DIR / "certs"
+PRIVATE_KEY_PATH = CERTS_DIR / "jwt-private.pem"
+PUBLIC_KEY_PATH = CERTS_DIR / "jwt-public.pem"
+KEY_SIZE = 2048
+
+
+def generate_keypair(
+    private_path: Path = PRIVATE_KEY_PATH,
+    public_path: Path = PUBLIC_KEY_PATH,
+) -> None:
+    """
+    Writes a new RSA keypair for signing JWTs, the private key
+    readable by the owner only.
+    """
+    key = rsa.generate_private_key(public_exponent=65537, key_size=KEY_SIZE)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    private_path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(private_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as file:
+        file.write(private_pem)
+    public_path.write_bytes(public_pem)
+
+
+def ensure_keypair(
+    private_path: Path = PRIVATE_KEY_PATH,
+    public_path: Path = PUBLIC_KEY_PATH,
+) -> bool:
+    """
+    Generates the keypair unless both keys exist.
+    Returns whether a new one was written.
+    """
+    if private_path.exists() and public_path.exists():
+        return False
+    generate_keypair(private_path, public_path)
+    return True
+
+
+if __name__ == "__main__":
+    if ensure_keypair():
+        print(f"JWT keypair written to {CERTS_DIR}.", file=sys.stderr)
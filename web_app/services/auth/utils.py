@@ -58,6 +58,13 @@ def decode_jwt(
         )
 
 
+def normalize_email(email: str) -> str:
+    """
+    Returns the canonical form emails are stored and looked up in.
+    """
+    return email.strip().lower()
+
+
 def hash_password(password: str) -> bytes:
     salt = bcrypt.gensalt()
     pwd_bytes = password.encode()
@@ -0,0 +1,333 @@
+import asyncio
+import logging
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, insert, literal, select, true, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web_app.db.db_helper import db_helper
+from web_app.models import BalanceTransaction, User
+
+logger = logging.getLogger(__name__)
+
+# First key of the two-key advisory lock serializing balance writes
+# per user. Credits take it shared, debits and absolute sets exclusive.
+LEDGER_LOCK_NAMESPACE = 28_001
+
+
+def pending_delta():
+    """
+    Returns a scalar subquery summing ledger entries of User
+    that are not yet folded into the users.balance snapshot.
+    """
+    return (
+        select(func.coalesce(func.sum(BalanceTransaction.delta), 0))
+        .where(
+            BalanceTransaction.user_id == User.id,
+            BalanceTransaction.applied_at.is_(None),
+        )
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+
+def effective_balance():
+    """
+    Returns an expression for the balance of User: snapshot plus
+    pending ledger entries.
+    """
+    return User.balance + pending_delta()
+
+
+def balance_version():
+    """
+    Returns an expression for the id of the latest ledger entry of User,
+    used as the balance version in ETag/If-Match headers.
+    """
+    return (
+        select(func.coalesce(func.max(BalanceTransaction.id), 0))
+        .where(BalanceTransaction.user_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+
+async def lock_user_balance(
+    user_id: int, session: AsyncSession, shared: bool = False
+) -> None:
+    """
+    Serializes balance writes of one user that read the balance until the
+    transaction ends, without locking the users row. Credits only need
+    the shared lock: they run concurrently with each other, but never
+    between the read and the write of a debit or an absolute set.
+    """
+    lock = (
+        func.pg_advisory_xact_lock_shared
+        if shared
+        else func.pg_advisory_xact_lock
+    )
+    await session.execute(select(lock(LEDGER_LOCK_NAMESPACE, user_id)))
+
+
+async def append_transactions(
+    entries: list[dict], session: AsyncSession
+) -> list[int]:
+    """
+    Appends ledger entries with one multi-row INSERT.
+    Each entry is a dict with user_id, delta and reason. Callers hold the
+    balance lock of every user, shared for credits.
+    """
+    if not entries:
+        return []
+    query = (
+        insert(BalanceTransaction)
+        .values(entries)
+        .returning(BalanceTransaction.id)
+    )
+    result = await session.execute(query)
+    return list(result.scalars())
+
+
+async def get_balance(user_id: int, session: AsyncSession) -> int | None:
+    """
+    Returns the user's balance or None if the user does not exist.
+    """
+    query = select(effective_balance()).where(User.id == user_id)
+    result = await session.execute(query)
+    return result.scalar()
+
+
+async def raise_balance_conflict(
+    user_id: int, expected_version: int | None, session: AsyncSession
+):
+    """
+    Explains why a conditional balance write appended no entry.
+    Only runs on the failure path.
+    """
+    query = select(User.role, balance_version().label("version")).where(
+        User.id == user_id, User.is_deleted.is_(False)
+    )
+    result = await session.execute(query)
+    row = result.first()
+
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    if expected_version is not None and row.version != expected_version:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="User balance was modified concurrently",
+        )
+    if row.role == "admin":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Admins cannot have an active balance",
+        )
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT, detail="Insufficient balance"
+    )
+
+
+async def adjust_balance(
+    user_id: int, delta: int, reason: str, session: AsyncSession
+) -> tuple[User, int, int]:
+    """
+    Appends a signed delta to the user's ledger in a single statement.
+    Returns the user, the new balance and the new balance version.
+    Raises HTTP 409 if the balance would become negative.
+    """
+    await lock_user_balance(user_id, session, shared=delta > 0)
+
+    conditions = [User.id == user_id, User.is_deleted.is_(False)]
+    if delta > 0:
+        conditions.append(User.role != "admin")
+
+    target = (
+        select(User.id, effective_balance().label("balance"))
+        .where(*conditions)
+        .cte("target")
+    )
+    entry = (
+        insert(BalanceTransaction)
+        .from_select(
+            ["user_id", "delta", "reason"],
+            select(target.c.id, literal(delta), literal(reason)).where(
+                target.c.balance + delta >= 0
+            ),
+        )
+        .returning(BalanceTransaction.id)
+        .cte("entry")
+    )
+    query = (
+        select(
+            User,
+            (target.c.balance + delta).label("balance"),
+            entry.c.id.label("version"),
+        )
+        .select_from(entry)
+        .join(target, true())
+        .join(User, User.id == target.c.id)
+    )
+    result = await session.execute(query)
+    row = result.first()
+
+    if row is None:
+        await raise_balance_conflict(user_id, None, session)
+
+    return row.User, row.balance, row.version
+
+
+async def set_balance(
+    user_id: int,
+    balance: int,
+    session: AsyncSession,
+    expected_version: int | None = None,
+    allow_credit: bool = True,
+) -> tuple[User, int, int]:
+    """
+    Sets the user's balance by appending the difference to the ledger.
+    With expected_version the write only applies to that balance version.
+    Without allow_credit, raising the balance fails with HTTP 403.
+    Returns the user, the new balance and the new balance version.
+    """
+    await lock_user_balance(user_id, session)
+
+    query = select(
+        User,
+        effective_balance().label("balance"),
+        balance_version().label("version"),
+    ).where(User.id == user_id, User.is_deleted.is_(False))
+    result = await session.execute(query)
+    row = result.first()
+
+    if row is None:
+        await raise_balance_conflict(user_id, expected_version, session)
+    stale = expected_version not in (None, row.version)
+    if stale or (row.User.role == "admin" and balance > 0):
+        await raise_balance_conflict(user_id, expected_version, session)
+    if not allow_credit and balance > row.balance:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform this action",
+        )
+
+    version = row.version
+    if balance != row.balance:
+        [version] = await append_transactions(
+            [
+                {
+                    "user_id": user_id,
+                    "delta": balance - row.balance,
+                    "reason": "set",
+                }
+            ],
+            session,
+        )
+
+    return row.User, balance, version
+
+
+def fold_entries(ids):
+    """
+    Returns a statement that marks the ledger entries with ids as
+    applied, adds their deltas to users.balance and selects their count.
+    """
+    applied = (
+        update(BalanceTransaction)
+        .where(BalanceTransaction.id.in_(ids))
+        .values(applied_at=func.now())
+        .returning(BalanceTransaction.user_id, BalanceTransaction.delta)
+        .cte("applied")
+    )
+    totals = (
+        select(applied.c.user_id, func.sum(applied.c.delta).label("delta"))
+        .group_by(applied.c.user_id)
+        .cte("totals")
+    )
+    snapshot = (
+        update(User)
+        .where(User.id == totals.c.user_id)
+        .values(balance=User.balance + totals.c.delta)
+        .returning(User.id)
+        .cte("snapshot")
+    )
+    return select(func.count()).select_from(applied).add_cte(snapshot)
+
+
+async def refresh_snapshots(
+    batch_size: int, session: AsyncSession, skipped: set[int] | None = None
+) -> int:
+    """
+    Folds up to batch_size pending ledger entries into users.balance
+    in one statement. If a snapshot violates a constraint, the batch is
+    folded one user at a time instead; the entries of failing users stay
+    pending, so their balances remain correct, and the users are added
+    to skipped, which later batches leave out.
+    Returns the number of entries applied.
+    """
+    skipped = set() if skipped is None else skipped
+    pending = (
+        select(BalanceTransaction.id, BalanceTransaction.user_id)
+        .where(
+            BalanceTransaction.applied_at.is_(None),
+            BalanceTransaction.user_id.not_in(list(skipped)),
+        )
+        .order_by(BalanceTransaction.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    try:
+        result = await session.execute(
+            fold_entries(
+                pending.with_only_columns(
+                    BalanceTransaction.id
+                ).scalar_subquery()
+            )
+        )
+        entries = result.scalar_one()
+        await session.commit()
+        return entries
+    except DBAPIError:
+        await session.rollback()
+
+    by_user: dict[int, list[int]] = {}
+    for entry_id, user_id in (await session.execute(pending)).all():
+        by_user.setdefault(user_id, []).append(entry_id)
+    entries = 0
+    for user_id, ids in by_user.items():
+        try:
+            async with session.begin_nested():
+                result = await session.execute(fold_entries(ids))
+                entries += result.scalar_one()
+        except DBAPIError:
+            logger.exception(
+                f"Balance snapshot of user {user_id} failed; "
+                "its ledger entries stay pending."
+            )
+            skipped.add(user_id)
+    await session.commit()
+    return entries
+
+
+async def run_snapshot_refresher(interval: float, batch_size: int) -> None:
+    """
+    Periodically folds pending ledger entries into users.balance
+    on every shard until cancelled.
+    """
+    # Users whose snapshot failed, retried after a restart.
+    skipped: set[int] = set()
+    while True:
+        try:
+            async with db_helper.session_factory() as session:
+                for shard in range(db_helper.shard_count):
+                    db_helper.use_shard(session, shard)
+                    applied = batch_size
+                    while applied == batch_size:
+                        applied = await refresh_snapshots(
+                            batch_size, session, skipped
+                        )
+        except Exception:
+            logger.exception("Balance snapshot refresh failed.")
+        await asyncio.sleep(interval)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, Integer, column, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web_app.db.db_helper import db_helper
+from web_app.db.sharding import shard_for_id
+from web_app.models.user import User
+from web_app.monitoring.metrics import (
+    ACTIVITY_FLUSH_BATCH_SIZE,
+    ACTIVITY_FLUSH_INTERVAL,
+    ACTIVITY_FLUSH_LAG,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityTracker:
+    """
+    Collects last activity timestamps in memory and writes them
+    to users.last_activity_at in batches.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[int, datetime] = {}
+        self._oldest: float | None = None
+
+    def touch(self, user_id: int | None) -> None:
+        """
+        Records activity of a user. Does no I/O.
+        """
+        if user_id is None:
+            return
+        if not self._pending:
+            self._oldest = time.monotonic()
+        self._pending[user_id] = datetime.now(timezone.utc)
+
+    def _restore(self, pending: dict[int, datetime], oldest: float) -> None:
+        """
+        Puts back entries of a failed flush, keeping newer timestamps.
+        """
+        for user_id, timestamp in pending.items():
+            if self._pending.get(user_id, timestamp) <= timestamp:
+                self._pending[user_id] = timestamp
+        self._oldest = min(self._oldest or oldest, oldest)
+
+    async def flush(self, session: AsyncSession, batch_size: int) -> int:
+        """
+        Writes pending timestamps with one UPDATE ... FROM (VALUES ...)
+        per batch_size users. Returns the number of users written.
+        """
+        if not self._pending:
+            return 0
+        pending, oldest = self._pending, self._oldest
+        self._pending, self._oldest = {}, None
+
+        shards: dict[int, list[tuple[int, datetime]]] = {}
+        for user_id, timestamp in pending.items():
+            shard = shard_for_id(user_id, db_helper.shard_count)
+            shards.setdefault(shard, []).append((user_id, timestamp))
+
+        try:
+            for shard, items in shards.items():
+                db_helper.use_shard(session, shard)
+                await self._write(session, items, batch_size)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            self._restore(pending, oldest)
+            raise
+
+        ACTIVITY_FLUSH_LAG.observe(time.monotonic() - oldest)
+        return len(pending)
+
+    @staticmethod
+    async def _write(
+        session: AsyncSession,
+        items: list[tuple[int, datetime]],
+        batch_size: int,
+    ) -> None:
+        for start in range(0, len(items), batch_size):
+            end = start + batch_size
+            batch = items[start:end]
+            activity = values(
+                column("id", Integer),
+                column("last_activity_at", DateTime(timezone=True)),
+                name="activity",
+            ).data(batch)
+            query = (
+                update(User)
+                .where(
+                    User.id == activity.c.id,
+                    User.last_activity_at < activity.c.last_activity_at,
+                )
+                .values(last_activity_at=activity.c.last_activity_at)
+                .execution_options(synchronize_session=False)
+            )
+            await session.execute(query)
+            ACTIVITY_FLUSH_BATCH_SIZE.observe(len(batch))
+
+    async def run(self, interval: float, batch_size: int) -> None:
+        """
+        Flushes pending timestamps every interval seconds until cancelled,
+        then flushes once more.
+        """
+        ACTIVITY_FLUSH_INTERVAL.set(interval)
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self._flush_logged(batch_size)
+        finally:
+            await self._flush_logged(batch_size)
+
+    async def _flush_logged(self, batch_size: int) -> None:
+        try:
+            async with db_helper.session_factory() as session:
+                await self.flush(session, batch_size)
+        except Exception:
+            logger.exception("Failed to flush user activity.")
+
+
+activity_tracker = ActivityTracker()
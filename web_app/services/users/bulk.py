@@ -0,0 +1,411 @@
+import asyncio
+import json
+import logging
+import os
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import Integer, any_, bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web_app.api.v1.routers.auth.router import (
+    delete_users_from_redis,
+    get_redis_client,
+)
+from web_app.db.db_helper import db_helper
+from web_app.db.sharding import shard_for_email, shard_for_id
+from web_app.models.user import User
+from web_app.monitoring.metrics import BCRYPT_QUEUE_DEPTH
+from web_app.schemas.user import UserCreateResultS, UserCreateS, UserFilterS
+from web_app.services.auth import utils
+from web_app.services.users.queries import apply_user_filters
+
+logger = logging.getLogger(__name__)
+
+BulkAction = t.Literal["block", "unblock", "delete"]
+BulkJobAction = t.Literal["block", "unblock", "delete", "create"]
+
+BULK_CHUNK_SIZE = 1000
+BULK_SYNC_LIMIT = 1000
+BULK_JOB_TTL_SECONDS = 24 * 60 * 60
+# Every user costs a bcrypt hash, so only this many are created while
+# the request waits; larger batches run as a background job.
+BULK_CREATE_SYNC_LIMIT = 500
+BULK_CREATE_LIMIT = 50_000
+# Rows per INSERT; the next chunk is hashed while one is inserted.
+BULK_CREATE_CHUNK_SIZE = 100
+
+# bcrypt releases the GIL, so threads hash in parallel off the event loop.
+HASH_WORKERS = os.cpu_count() or 1
+hash_executor = ThreadPoolExecutor(HASH_WORKERS, thread_name_prefix="bcrypt")
+
+Progress = t.Callable[[int], t.Awaitable[t.Any]]
+
+
+def action_values(action: BulkAction) -> dict:
+    """
+    Returns the column values a bulk action writes.
+    """
+    if action == "block":
+        return {"block_status": True, "block_at": func.now()}
+    if action == "unblock":
+        return {"block_status": False, "block_at": None}
+    return {"is_deleted": True}
+
+
+async def update_chunk(
+    action: BulkAction, condition, session: AsyncSession
+) -> list[t.Any]:
+    """
+    Applies the action to live users matching condition in one statement,
+    commits, and drops the touched users from the cache.
+    Returns the (id, email) rows that were updated.
+    """
+    query = (
+        update(User)
+        .where(condition, User.is_deleted.is_(False))
+        .values(**action_values(action))
+        .returning(User.id, User.email)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(query)
+    rows = result.all()
+    await session.commit()
+    await delete_users_from_redis([row.email for row in rows])
+    return rows
+
+
+async def count_matching(filters: UserFilterS, session: AsyncSession) -> int:
+    """
+    Counts live users matching the filters on every shard.
+    """
+    query = select(func.count()).where(User.is_deleted.is_(False))
+    query = apply_user_filters(query, filters)
+    total = 0
+    for shard in range(db_helper.shard_count):
+        db_helper.use_shard(session, shard)
+        result = await session.execute(query)
+        total += result.scalar_one()
+    return total
+
+
+def ids_by_shard(ids: list[int]) -> dict[int, list[int]]:
+    shards: dict[int, list[int]] = {}
+    for user_id in ids:
+        shard = shard_for_id(user_id, db_helper.shard_count)
+        shards.setdefault(shard, []).append(user_id)
+    return shards
+
+
+async def run_bulk_action(
+    action: BulkAction,
+    session: AsyncSession,
+    ids: list[int] | None = None,
+    filters: UserFilterS | None = None,
+    progress: Progress | None = None,
+) -> int:
+    """
+    Applies the action to users selected by ids or filters in chunks of
+    BULK_CHUNK_SIZE, one UPDATE and one commit per chunk, shard by shard.
+    Returns the number of users updated.
+    """
+    processed = 0
+
+    if ids is not None:
+        for shard, shard_ids in ids_by_shard(ids).items():
+            db_helper.use_shard(session, shard)
+            for start in range(0, len(shard_ids), BULK_CHUNK_SIZE):
+                end = start + BULK_CHUNK_SIZE
+                chunk = shard_ids[start:end]
+                condition = User.id == any_(
+                    bindparam("ids", chunk, type_=ARRAY(Integer))
+                )
+                rows = await update_chunk(action, condition, session)
+                processed += len(rows)
+                if progress:
+                    await progress(processed)
+        return processed
+
+    for shard in range(db_helper.shard_count):
+        db_helper.use_shard(session, shard)
+        last_id = 0
+        while True:
+            selection = select(User.id).where(
+                User.id > last_id, User.is_deleted.is_(False)
+            )
+            selection = (
+                apply_user_filters(selection, filters)
+                .order_by(User.id)
+                .limit(BULK_CHUNK_SIZE)
+            )
+            condition = User.id.in_(selection.scalar_subquery())
+            rows = await update_chunk(action, condition, session)
+            if not rows:
+                break
+            processed += len(rows)
+            last_id = max(row.id for row in rows)
+            if progress:
+                await progress(processed)
+    return processed
+
+
+def job_key(job_id: str) -> str:
+    return f"bulk_job:{job_id}"
+
+
+def job_results_key(job_id: str) -> str:
+    return f"bulk_job:{job_id}:results"
+
+
+async def create_job(job_id: str, action: BulkJobAction, total: int) -> dict:
+    """
+    Registers a bulk job and its progress in Redis.
+    """
+    job = {
+        "job_id": job_id,
+        "action": action,
+        "status": "running",
+        "total": total,
+        "processed": 0,
+    }
+    redis = get_redis_client()
+    await redis.hset(job_key(job_id), mapping=job)
+    await redis.expire(job_key(job_id), BULK_JOB_TTL_SECONDS)
+    return job
+
+
+async def get_job(job_id: str) -> dict | None:
+    """
+    Gets bulk job progress from Redis.
+    Returns None if no job is found.
+    """
+    return await get_redis_client().hgetall(job_key(job_id)) or None
+
+
+async def run_bulk_job(
+    job_id: str,
+    action: BulkAction,
+    ids: list[int] | None = None,
+    filters: UserFilterS | None = None,
+) -> None:
+    """
+    Runs a bulk action in the background, recording progress in Redis.
+    """
+    redis = get_redis_client()
+    key = job_key(job_id)
+
+    async def progress(processed: int) -> None:
+        await redis.hset(key, "processed", processed)
+
+    try:
+        async with db_helper.session_factory() as session:
+            processed = await run_bulk_action(
+                action, session, ids=ids, filters=filters, progress=progress
+            )
+    except Exception:
+        logger.exception(f"Bulk {action} job {job_id} failed.")
+        await redis.hset(key, "status", "failed")
+        return
+
+    logger.info(f"Bulk {action} job {job_id} updated {processed} users.")
+    await redis.hset(key, "status", "completed")
+
+
+def split(items: list, size: int) -> list[list]:
+    parts = []
+    for start in range(0, len(items), size):
+        end = start + size
+        parts.append(items[start:end])
+    return parts
+
+
+def parse_ndjson(body: bytes) -> list:
+    return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+
+def validate_new_users(
+    items: list,
+) -> tuple[list[tuple[int, UserCreateS]], list[UserCreateResultS]]:
+    """
+    Validates items as UserCreateS. Returns the valid users with their
+    index, and results for invalid items and repeated emails.
+    """
+    valid: list[tuple[int, UserCreateS]] = []
+    results: list[UserCreateResultS] = []
+    seen: set[str] = set()
+    for index, item in enumerate(items):
+        try:
+            user = UserCreateS.model_validate(item)
+        except ValidationError as error:
+            detail = "; ".join(e["msg"] for e in error.errors())
+        except HTTPException as error:
+            detail = error.detail
+        else:
+            if user.email in seen:
+                results.append(
+                    UserCreateResultS(
+                        index=index,
+                        email=user.email,
+                        status="duplicate",
+                        detail="Email repeated in the request",
+                    )
+                )
+            else:
+                seen.add(user.email)
+                valid.append((index, user))
+            continue
+        results.append(
+            UserCreateResultS(index=index, status="invalid", detail=detail)
+        )
+    return valid, results
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    hashes = []
+    for password in passwords:
+        hashes.append(utils.hash_password(password).decode("utf-8"))
+        BCRYPT_QUEUE_DEPTH.dec()
+    return hashes
+
+
+async def hash_chunk(users: list[UserCreateS]) -> list[str]:
+    """
+    Hashes the passwords of users across hash_executor, keeping order.
+    When cancelled, parts no thread has started are dropped.
+    """
+    passwords = [user.password for user in users]
+    BCRYPT_QUEUE_DEPTH.inc(len(passwords))
+    parts = split(passwords, -(-len(passwords) // HASH_WORKERS))
+    futures = [hash_executor.submit(hash_passwords, part) for part in parts]
+    try:
+        hashed = await asyncio.gather(*map(asyncio.wrap_future, futures))
+    except asyncio.CancelledError:
+        for future, part in zip(futures, parts):
+            if future.cancel():
+                BCRYPT_QUEUE_DEPTH.dec(len(part))
+        raise
+    return [password for part in hashed for password in part]
+
+
+async def insert_new_users(
+    users: list[UserCreateS], hashes: list[str], session: AsyncSession
+) -> dict[str, int]:
+    """
+    Inserts users with one multi-row INSERT per shard, skipping emails
+    of existing live users, and commits.
+    Returns the ids of the inserted users by email.
+    """
+    rows_by_shard: dict[int, list[dict]] = {}
+    for user, hashed in zip(users, hashes):
+        shard = shard_for_email(user.email, db_helper.shard_count)
+        rows_by_shard.setdefault(shard, []).append(
+            {
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "email": user.email,
+                "password": hashed,
+            }
+        )
+
+    created: dict[str, int] = {}
+    for shard, rows in rows_by_shard.items():
+        db_helper.use_shard(session, shard)
+        query = (
+            insert(User)
+            .values(rows)
+            .on_conflict_do_nothing(
+                index_elements=[func.lower(User.email)],
+                index_where=User.is_deleted.is_(False),
+            )
+            .returning(User.email, User.id)
+        )
+        result = await session.execute(query)
+        created.update(result.tuples().all())
+        await session.commit()
+    return created
+
+
+async def create_users(
+    items: list, session: AsyncSession, progress: Progress | None = None
+) -> list[UserCreateResultS]:
+    """
+    Registers users in chunks of BULK_CREATE_CHUNK_SIZE. The passwords
+    of the next chunk are hashed while the current one is inserted.
+    progress is called with the number of items handled after each chunk.
+    Returns one result per item, in item order.
+    """
+    valid, results = validate_new_users(items)
+    chunks = split(valid, BULK_CREATE_CHUNK_SIZE)
+
+    def hash_next(index: int) -> asyncio.Future | None:
+        if index >= len(chunks):
+            return None
+        users = [user for _, user in chunks[index]]
+        return asyncio.ensure_future(hash_chunk(users))
+
+    hashing = hash_next(0)
+    try:
+        for index, chunk in enumerate(chunks):
+            hashes = await hashing
+            hashing = hash_next(index + 1)
+            users = [user for _, user in chunk]
+            created = await insert_new_users(users, hashes, session)
+            for item_index, user in chunk:
+                user_id = created.get(user.email)
+                results.append(
+                    UserCreateResultS(
+                        index=item_index,
+                        email=user.email,
+                        status="created" if user_id else "exists",
+                        id=user_id,
+                    )
+                )
+            if progress:
+                await progress(len(results))
+    finally:
+        # A failed insert leaves the next chunk hashing.
+        if hashing is not None:
+            hashing.cancel()
+            await asyncio.gather(hashing, return_exceptions=True)
+
+    return sorted(results, key=lambda result: result.index)
+
+
+async def get_job_results(job_id: str) -> list[UserCreateResultS]:
+    """
+    Gets the per-item results of a completed bulk create job.
+    """
+    results = await get_redis_client().lrange(job_results_key(job_id), 0, -1)
+    return [UserCreateResultS.model_validate_json(r) for r in results]
+
+
+async def run_bulk_create_job(job_id: str, items: list) -> None:
+    """
+    Registers users in the background, recording progress in Redis and
+    the per-item results in a list next to the job.
+    """
+    redis = get_redis_client()
+    key = job_key(job_id)
+
+    async def progress(processed: int) -> None:
+        await redis.hset(key, "processed", processed)
+
+    try:
+        async with db_helper.session_factory() as session:
+            results = await create_users(items, session, progress)
+    except Exception:
+        logger.exception(f"Bulk create job {job_id} failed.")
+        await redis.hset(key, "status", "failed")
+        return
+
+    results_key = job_results_key(job_id)
+    for chunk in split(results, BULK_CHUNK_SIZE):
+        await redis.rpush(results_key, *(r.model_dump_json() for r in chunk))
+    await redis.expire(results_key, BULK_JOB_TTL_SECONDS)
+
+    created = sum(result.status == "created" for result in results)
+    logger.info(f"Bulk create job {job_id} created {created} users.")
+    await redis.hset(key, "status", "completed")
@@ -0,0 +1,298 @@
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import os
+import re
+import time
+import typing as t
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from web_app.db.db_helper import db_helper
+from web_app.db.sharding import shard_for_email
+from web_app.models.user import ROLE_CODES, User, UserStatus
+from web_app.schemas.user import UserCreateS
+from web_app.services.auth import utils
+
+logger = logging.getLogger(__name__)
+
+IMPORT_COLUMNS = (
+    "first_name",
+    "last_name",
+    "email",
+    "password",
+    "role",
+    "balance",
+    "status",
+)
+CREATE_IMPORT_TABLE = (
+    "CREATE TEMP TABLE users_import (first_name varchar(50), "
+    "last_name varchar(50), email varchar, password varchar, "
+    "role smallint, balance bigint, status smallint) ON COMMIT DROP"
+)
+# Emails that already have an active user are skipped, so a chunk
+# replayed after a crash does not duplicate rows.
+INSERT_IMPORTED = (
+    f"INSERT INTO users ({', '.join(IMPORT_COLUMNS)}) "
+    f"SELECT {', '.join(IMPORT_COLUMNS)} FROM users_import "
+    "ON CONFLICT (lower(email)) WHERE ((status & 2) != 0) IS false "
+    "DO NOTHING"
+)
+SEPARATORS = re.compile(r"[\s,]*")
+USER_FIELDS = ("first_name", "last_name", "email", "password")
+NAME_MAX_LENGTH = User.first_name.type.length
+BIGINT_MAX = 2**63 - 1
+
+Row = tuple[str | None, str | None, str, str, int, int, int]
+
+
+def read_ndjson(file: t.TextIO) -> t.Iterator[dict]:
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_json_array(
+    file: t.TextIO, buffer_size: int = 1 << 16
+) -> t.Iterator[dict]:
+    """
+    Yields the items of the first array in a JSON document, either a bare
+    array or {"users": [...]}, reading buffer_size characters at a time.
+    """
+    buffer = ""
+    while "[" not in buffer:
+        chunk = file.read(buffer_size)
+        if not chunk:
+            return
+        buffer = buffer[-1:] + chunk
+
+    decoder = json.JSONDecoder()
+    position = buffer.index("[") + 1
+    eof = False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith("]", position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(buffer_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def read_users(path: str) -> t.Iterator[dict]:
+    """
+    Streams user records from NDJSON (.ndjson, .jsonl) or JSON files.
+    """
+    with open(path, "r") as file:
+        if path.endswith((".ndjson", ".jsonl")):
+            yield from read_ndjson(file)
+        else:
+            yield from read_json_array(file)
+
+
+def invalid_reason(record: dict) -> str | None:
+    """
+    Returns why record cannot be inserted, or None if it can.
+    Applies the rules of UserCreateS and mirrors the column limits and
+    the user_admin_balance constraint of users, so a bad record is
+    reported instead of aborting the COPY of its chunk.
+    """
+    fields = {name: record.get(name) for name in USER_FIELDS}
+    for name, value in fields.items():
+        if value is not None and not isinstance(value, str):
+            return f"{name} must be a string"
+    try:
+        user = UserCreateS.model_validate(fields)
+    except ValidationError as error:
+        return "; ".join(e["msg"] for e in error.errors())
+    except HTTPException as error:
+        return error.detail
+    for name in ("first_name", "last_name"):
+        value = getattr(user, name)
+        if value is not None and len(value) > NAME_MAX_LENGTH:
+            return f"{name} is longer than {NAME_MAX_LENGTH} characters"
+
+    role = record.get("role", "user")
+    if role not in ROLE_CODES:
+        return f"unknown role {role!r}"
+    balance = record.get("balance", 0)
+    if not isinstance(balance, int) or isinstance(balance, bool):
+        return f"balance {balance!r} is not an integer"
+    if not 0 <= balance <= BIGINT_MAX:
+        return f"balance {balance} is out of range"
+    if role == "admin" and balance > 0:
+        return "admins cannot have a positive balance"
+    return None
+
+
+def prepare_rows(records: list[dict]) -> list[Row | None]:
+    """
+    Normalizes and hashes records into users_import rows.
+    Invalid records are logged and become None, so one bad record
+    does not abort the COPY of its chunk.
+    Runs in worker processes.
+    """
+    rows: list[Row | None] = []
+    for record in records:
+        reason = invalid_reason(record)
+        if reason is not None:
+            logger.warning(f"Skipping user {record.get('email')!r}: {reason}.")
+            rows.append(None)
+            continue
+        status = 0
+        if record.get("block_status"):
+            status |= UserStatus.BLOCKED
+        if record.get("is_deleted"):
+            status |= UserStatus.DELETED
+        password = utils.hash_password(record["password"]).decode("utf-8")
+        rows.append(
+            (
+                record.get("first_name"),
+                record.get("last_name"),
+                utils.normalize_email(record["email"]),
+                password,
+                ROLE_CODES[record.get("role", "user")],
+                record.get("balance", 0),
+                int(status),
+            )
+        )
+    return rows
+
+
+def batched(items: t.Iterable, size: int) -> t.Iterator[list]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+async def hash_chunk(
+    pool: Executor, records: list[dict], workers: int
+) -> list[Row | None]:
+    """
+    Prepares a chunk in up to workers parallel parts, keeping order.
+    """
+    size = -(-len(records) // workers)
+    parts = await asyncio.gather(
+        *(
+            asyncio.wrap_future(pool.submit(prepare_rows, part))
+            for part in batched(records, size)
+        )
+    )
+    return list(itertools.chain.from_iterable(parts))
+
+
+async def copy_rows(engine: AsyncEngine, rows: list[Row]) -> int:
+    """
+    Loads rows into one shard with COPY in a single transaction.
+    Returns the number of users inserted.
+    The temporary table changes every transaction, so its statements
+    run unprepared on the driver connection.
+    """
+    async with engine.begin() as conn:
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        await driver.execute(CREATE_IMPORT_TABLE)
+        await driver.copy_records_to_table(
+            "users_import", records=rows, columns=IMPORT_COLUMNS
+        )
+        status = await driver.execute(INSERT_IMPORTED)
+        return int(status.split()[-1])
+
+
+def load_checkpoint(path: str) -> int:
+    try:
+        with open(path, "r") as file:
+            return json.load(file)["records"]
+    except FileNotFoundError:
+        return 0
+
+
+def save_checkpoint(path: str, records: int) -> None:
+    """
+    Writes the checkpoint atomically, so a crash leaves the old one.
+    """
+    with open(f"{path}.tmp", "w") as file:
+        json.dump({"records": records}, file)
+    os.replace(f"{path}.tmp", path)
+
+
+async def import_users(
+    path: str,
+    chunk_size: int = 5000,
+    workers: int | None = None,
+    checkpoint: str | None = None,
+) -> int:
+    """
+    Streams users from path into their shards in chunks of chunk_size.
+    Passwords of the next chunk are hashed by a pool of worker processes
+    while the current one is copied. After every chunk the number of
+    records consumed is written to checkpoint, and a rerun resumes after
+    it. Invalid records are skipped with a warning.
+    Returns the number of users inserted.
+    """
+    workers = workers or os.cpu_count() or 1
+    checkpoint = checkpoint or f"{path}.checkpoint"
+    done = load_checkpoint(checkpoint)
+    if done:
+        logger.info(f"Resuming after {done} records.")
+
+    records = itertools.islice(read_users(path), done, None)
+    chunks = batched(records, chunk_size)
+    shard_count = db_helper.shard_count
+    inserted = processed = skipped = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(workers) as pool:
+
+        def hash_next() -> asyncio.Task | None:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return None
+            return asyncio.ensure_future(hash_chunk(pool, chunk, workers))
+
+        hashing = hash_next()
+        while hashing is not None:
+            rows = await hashing
+            hashing = hash_next()
+
+            by_shard: list[list[Row]] = [[] for _ in range(shard_count)]
+            for row in rows:
+                if row is None:
+                    skipped += 1
+                    continue
+                by_shard[shard_for_email(row[2], shard_count)].append(row)
+            counts = await asyncio.gather(
+                *(
+                    copy_rows(engine, shard_rows)
+                    for engine, shard_rows in zip(
+                        db_helper.shard_engines, by_shard
+                    )
+                    if shard_rows
+                )
+            )
+            inserted += sum(counts)
+            done += len(rows)
+            processed += len(rows)
+            save_checkpoint(checkpoint, done)
+
+            rate = processed / (time.perf_counter() - started)
+            logger.info(
+                f"{done} records read, {inserted} users inserted, "
+                f"{skipped} skipped, {rate:.0f} rows/s"
+            )
+
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(checkpoint)
+    return inserted
@@ -0,0 +1,60 @@
+import heapq
+
+from sqlalchemy import Select, StatementLambdaElement, func, lambda_stmt
+from sqlalchemy.future import select
+
+from web_app.models.user import User
+from web_app.schemas.user import UserFilterS
+
+
+def apply_user_filters(query: Select, filters: UserFilterS) -> Select:
+    """
+    Narrows a query over User to the rows matching the filters.
+    Sorting options of the filters are not applied.
+    """
+    if filters.id is not None:
+        query = query.where(User.id == filters.id)
+    if filters.first_name is not None:
+        query = query.where(User.first_name == filters.first_name)
+    if filters.last_name is not None:
+        query = query.where(User.last_name == filters.last_name)
+    if filters.block_status is not None:
+        query = query.where(User.block_status == filters.block_status)
+    return query
+
+
+def user_by_email(email: str) -> StatementLambdaElement:
+    """
+    Selects the live user with the email, which must be normalized.
+    The statement is built and compiled once; email is bound per call.
+    """
+    return lambda_stmt(
+        lambda: select(User).where(
+            func.lower(User.email) == email, User.is_deleted.is_(False)
+        )
+    )
+
+
+def profile_by_email(email: str) -> StatementLambdaElement:
+    """
+    Selects the live user with the email who has filled in a name.
+    """
+    return user_by_email(email) + (
+        lambda query: query.where(
+            User.first_name.isnot(None), User.last_name.isnot(None)
+        )
+    )
+
+
+def merge_sorted(
+    chunks: list[list[User]], sort_by: str, descending: bool = False
+) -> list[User]:
+    """
+    Merges per-shard results, each ordered by sort_by and then id,
+    into one list in the same order.
+    """
+
+    def key(user: User):
+        return getattr(user, sort_by), user.id
+
+    return list(heapq.merge(*chunks, key=key, reverse=descending))
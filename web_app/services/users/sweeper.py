@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, exists, insert, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from web_app.api.v1.routers.auth.router import delete_users_from_redis
+from web_app.db.db_helper import db_helper
+from web_app.models import BalanceTransaction, User, UserArchive
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_COLUMNS = [column.name for column in User.__table__.columns]
+
+
+async def archive_batch(
+    session: AsyncSession,
+    inactive_before: datetime,
+    deleted_before: datetime,
+    after: tuple[datetime, int] | None,
+    batch_size: int,
+) -> list:
+    """
+    Moves the next batch of expired users, in user_last_activity_at order,
+    into users_archive with one INSERT ... SELECT over DELETE ... RETURNING.
+    Users with ledger entries not yet in the balance snapshot are skipped.
+    Soft-deleted users have no deletion timestamp, so their retention
+    period is counted from last_activity_at, which stops advancing once
+    they can no longer log in.
+    Returns the (last_activity_at, id, email) of the moved users.
+    """
+    horizon = max(inactive_before, deleted_before)
+    batch = (
+        select(User.id)
+        .where(
+            User.last_activity_at < horizon,
+            or_(
+                User.last_activity_at < inactive_before,
+                User.is_deleted.is_(True),
+            ),
+            ~exists().where(
+                BalanceTransaction.user_id == User.id,
+                BalanceTransaction.applied_at.is_(None),
+            ),
+        )
+        .order_by(User.last_activity_at, User.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    if after is not None:
+        batch = batch.where(tuple_(User.last_activity_at, User.id) > after)
+
+    moved = (
+        delete(User)
+        .where(User.id.in_(batch.scalar_subquery()))
+        .returning(*User.__table__.columns)
+        .cte("moved")
+    )
+    query = (
+        insert(UserArchive)
+        .from_select(
+            ARCHIVED_COLUMNS,
+            select(*(moved.c[name] for name in ARCHIVED_COLUMNS)),
+        )
+        .returning(
+            UserArchive.last_activity_at, UserArchive.id, UserArchive.email
+        )
+    )
+    result = await session.execute(query)
+    moved_users = result.all()
+    await session.commit()
+    return moved_users
+
+
+async def sweep_users(
+    session: AsyncSession,
+    inactive_days: int,
+    deleted_days: int,
+    batch_size: int,
+    max_rate: float,
+) -> int:
+    """
+    Archives users inactive for inactive_days and soft-deleted users
+    inactive for deleted_days, shard by shard, one bounded transaction
+    per batch, moving at most max_rate users per second. Archived users
+    are dropped from the cache, so tokens cached for them stop working.
+    Returns the number of users archived.
+    """
+    now = datetime.now(timezone.utc)
+    inactive_before = now - timedelta(days=inactive_days)
+    deleted_before = now - timedelta(days=deleted_days)
+
+    archived = 0
+    for shard in range(db_helper.shard_count):
+        db_helper.use_shard(session, shard)
+        after = None
+        while True:
+            started = time.monotonic()
+            moved_users = await archive_batch(
+                session, inactive_before, deleted_before, after, batch_size
+            )
+            if not moved_users:
+                break
+            await delete_users_from_redis([user.email for user in moved_users])
+
+            archived += len(moved_users)
+            after = max((user[0], user[1]) for user in moved_users)
+            logger.info(f"Archived {archived} users.")
+
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(len(moved_users) / max_rate - elapsed, 0))
+    return archived
+
+
+async def run_sweeper(
+    interval: float,
+    inactive_days: int,
+    deleted_days: int,
+    batch_size: int,
+    max_rate: float,
+) -> None:
+    """
+    Runs the retention sweep every interval seconds until cancelled.
+    """
+    while True:
+        try:
+            async with db_helper.session_factory() as session:
+                await sweep_users(
+                    session, inactive_days, deleted_days, batch_size, max_rate
+                )
+        except Exception:
+            logger.exception("User retention sweep failed.")
+        await asyncio.sleep(interval)